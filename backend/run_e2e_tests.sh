@@ -40,8 +40,19 @@ curl -s $BASE/documents/$DOC_ID/sentences/
 echo ""
 
 echo ""
-echo "➡️ 4. Running Ollama analysis..."
-curl -s -X POST $BASE/documents/$DOC_ID/analyze/
+echo "➡️ 4. Queueing Ollama analysis..."
+JOB_RESPONSE=$(curl -s -X POST $BASE/documents/$DOC_ID/analyze/)
+echo "Job response: $JOB_RESPONSE"
+
+JOB_ID=$(echo $JOB_RESPONSE | python3 -c "import sys,json; d=json.load(sys.stdin); print(d.get('job_id'))")
+
+JOB_STATUS="queued"
+while [ "$JOB_STATUS" = "queued" ] || [ "$JOB_STATUS" = "running" ]; do
+  sleep 2
+  JOB_STATUS=$(curl -s $BASE/jobs/$JOB_ID/ | python3 -c "import sys,json; print(json.load(sys.stdin).get('status'))")
+  echo "Job $JOB_ID: $JOB_STATUS"
+done
+curl -s $BASE/jobs/$JOB_ID/
 echo ""
 
 echo ""
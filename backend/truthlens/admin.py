@@ -1,6 +1,6 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin
-from .models import User, Document, Sentence, Correction
+from .models import User, Document, Sentence, Correction, VerdictCacheEntry, AnalysisJob
 
 @admin.register(User)
 class UserAdmin(ModelAdmin):
@@ -20,4 +20,14 @@ class SentenceAdmin(ModelAdmin):
 @admin.register(Correction)
 class CorrectionAdmin(ModelAdmin):
     list_display = ('correction_id', 'sentence_id', 'created_at', 'updated_at')
-    search_fields = ('suggested_correction', 'reasoning', 'sources')
\ No newline at end of file
+    search_fields = ('suggested_correction', 'reasoning', 'sources')
+
+@admin.register(VerdictCacheEntry)
+class VerdictCacheEntryAdmin(ModelAdmin):
+    list_display = ('entry_id', 'model', 'prompt_version', 'label', 'confidence', 'last_used_at')
+    search_fields = ('sentence',)
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(ModelAdmin):
+    list_display = ('job_id', 'document_id', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""Routing Ollama requests across several model servers.
+
+Each request leases the backend with the fewest outstanding requests
+relative to its concurrency limit. Backends are health-checked passively:
+a transport error, timeout or 5xx response counts as a failure, and
+``eject_after`` consecutive failures open the backend's circuit for a
+backoff that doubles on every ejection in a row. When the backoff expires
+one probe request is let through (half-open); success closes the circuit,
+failure ejects the backend again. Only the probe's own lease decides:
+requests that were already in flight when the backend was ejected are
+counted as errors but neither extend the backoff nor end the probe.
+
+When every backend is ejected, ``acquire`` raises ``BackendUnavailable``
+at once instead of letting callers wait out request timeouts. When the
+backends are merely busy it waits for a slot: every lease is held by a
+request with its own timeout, so a slot frees up in bounded time. An
+``acquire_timeout`` caps that wait; by default there is none.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import httpx
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackendUnavailable(ValidationError):
+    """No Ollama backend can take the request right now."""
+
+
+def is_backend_failure(exc: BaseException) -> bool:
+    """Errors that say something about the server's health (not about the request)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+@dataclass
+class Backend:
+    url: str
+    max_concurrency: int
+    outstanding: int = 0
+    # Consecutive failures since the last success.
+    failures: int = 0
+    # Consecutive ejections; drives the backoff and marks the half-open state.
+    ejections: int = 0
+    ejected_until: float = 0.0
+    probing: bool = False
+    requests: int = 0
+    errors: int = 0
+
+    def state(self, now: float) -> str:
+        if self.ejected_until > now:
+            return "open"
+        if self.ejections:
+            return "half_open"
+        return "closed"
+
+    def has_slot(self, now: float) -> bool:
+        state = self.state(now)
+        if state == "open" or (state == "half_open" and self.probing):
+            return False
+        return self.outstanding < self.max_concurrency
+
+
+@dataclass
+class Lease:
+    """A slot held on ``backend``; ``probe`` marks the half-open trial request."""
+
+    backend: Backend
+    probe: bool = False
+
+    @property
+    def url(self) -> str:
+        return self.backend.url
+
+
+class BackendPool:
+    def __init__(
+        self,
+        backends: Iterable[Backend],
+        *,
+        eject_after: int = 3,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        acquire_timeout: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.backends = list(backends)
+        if not self.backends:
+            raise ValueError("a backend pool needs at least one backend")
+
+        self.eject_after = eject_after
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._rotation = itertools.count()
+
+    @classmethod
+    def from_settings(cls, urls: Iterable | None = None) -> "BackendPool":
+        """
+        Build the pool from ``OLLAMA_BACKENDS``: server roots, or dicts with
+        ``url`` and ``max_concurrency``. ``urls`` overrides the setting.
+        """
+        default_concurrency = getattr(settings, "OLLAMA_BACKEND_MAX_CONCURRENCY", 2)
+        entries = urls if urls is not None else getattr(settings, "OLLAMA_BACKENDS", None)
+        if not entries:
+            entries = [getattr(settings, "OLLAMA_URL", "http://host.docker.internal:11434")]
+
+        backends = []
+        for entry in entries:
+            if isinstance(entry, dict):
+                url, concurrency = entry["url"], entry.get("max_concurrency", default_concurrency)
+            else:
+                url, concurrency = entry, default_concurrency
+            backends.append(Backend(url=_base_url(url), max_concurrency=int(concurrency)))
+
+        return cls(
+            backends,
+            eject_after=getattr(settings, "OLLAMA_BACKEND_EJECT_AFTER", 3),
+            backoff=getattr(settings, "OLLAMA_BACKEND_BACKOFF_SECONDS", 5.0),
+            max_backoff=getattr(settings, "OLLAMA_BACKEND_MAX_BACKOFF_SECONDS", 300.0),
+            acquire_timeout=getattr(settings, "OLLAMA_BACKEND_ACQUIRE_TIMEOUT_SECONDS", None),
+        )
+
+    @property
+    def capacity(self) -> int:
+        return sum(backend.max_concurrency for backend in self.backends)
+
+    def _pick(self, now: float, exclude) -> Backend | None:
+        # Rotate the starting point so ties are spread over the backends.
+        start = next(self._rotation) % len(self.backends)
+        ordered = self.backends[start:] + self.backends[:start]
+        candidates = [
+            backend for backend in ordered
+            if backend.url not in exclude and backend.has_slot(now)
+        ]
+        return min(
+            candidates,
+            key=lambda backend: backend.outstanding / backend.max_concurrency,
+            default=None,
+        )
+
+    def acquire(self, *, exclude: Iterable[str] = ()) -> Lease:
+        """Reserve a slot on the least loaded healthy backend."""
+        exclude = set(exclude)
+        deadline = None if self.acquire_timeout is None else self.clock() + self.acquire_timeout
+
+        with self._condition:
+            while True:
+                now = self.clock()
+                backend = self._pick(now, exclude)
+                if backend is not None:
+                    backend.outstanding += 1
+                    backend.requests += 1
+                    probe = backend.state(now) == "half_open"
+                    if probe:
+                        backend.probing = True
+                    return Lease(backend, probe=probe)
+
+                usable = [backend for backend in self.backends if backend.url not in exclude]
+                closed = [backend for backend in usable if backend.state(now) != "open"]
+                if not closed:
+                    reopen = min((backend.ejected_until for backend in usable), default=now)
+                    raise BackendUnavailable(
+                        f"all Ollama backends are ejected; next retry in {max(reopen - now, 0):.0f}s"
+                    )
+
+                # Wake up for released slots, or when an ejected backend may be probed.
+                waits = [backend.ejected_until - now for backend in usable if backend.state(now) == "open"]
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise BackendUnavailable(
+                            f"no Ollama backend had a free slot within {self.acquire_timeout:.0f}s"
+                        )
+                    waits.append(remaining)
+                self._condition.wait(min(waits, default=None))
+
+    def release(self, lease: Lease, *, healthy: bool) -> None:
+        backend = lease.backend
+        with self._condition:
+            backend.outstanding -= 1
+            if lease.probe:
+                backend.probing = False
+
+            if not healthy:
+                backend.errors += 1
+
+            if lease.probe and healthy:
+                backend.failures = 0
+                backend.ejections = 0
+                backend.ejected_until = 0.0
+            elif backend.ejections and not lease.probe:
+                # Sent before the ejection; says nothing about the backend since.
+                pass
+            elif healthy:
+                backend.failures = 0
+            else:
+                backend.failures += 1
+                # A failed probe re-ejects at once; a closed backend after a streak.
+                if lease.probe or backend.failures >= self.eject_after:
+                    backend.ejections += 1
+                    delay = min(self.max_backoff, self.backoff * 2 ** (backend.ejections - 1))
+                    backend.ejected_until = self.clock() + delay
+                    backend.failures = 0
+                    logger.warning("Ejecting Ollama backend %s for %.0fs", backend.url, delay)
+
+            self._condition.notify_all()
+
+    @contextmanager
+    def lease(self, *, exclude: Iterable[str] = ()):
+        """Hold a backend slot for the duration of a request."""
+        lease = self.acquire(exclude=exclude)
+        healthy = True
+        try:
+            yield lease
+        except BaseException as exc:
+            healthy = not is_backend_failure(exc)
+            raise
+        finally:
+            self.release(lease, healthy=healthy)
+
+    def snapshot(self) -> list[dict]:
+        """Per-backend state, for status pages and metrics."""
+        with self._condition:
+            now = self.clock()
+            return [
+                {
+                    "url": backend.url,
+                    "state": backend.state(now),
+                    "outstanding": backend.outstanding,
+                    "max_concurrency": backend.max_concurrency,
+                    "requests": backend.requests,
+                    "errors": backend.errors,
+                }
+                for backend in self.backends
+            ]
+
+
+def _base_url(url: str) -> str:
+    """Server root; older settings point ``OLLAMA_URL`` at ``/api/generate``."""
+    url = url.rstrip("/")
+    for suffix in ("/api/generate", "/api/chat"):
+        if url.endswith(suffix):
+            return url[: -len(suffix)]
+    return url
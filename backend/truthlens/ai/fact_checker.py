@@ -1,13 +1,13 @@
-import json
+from truthlens.ai.json_stream import extract_object
 from truthlens.ai.ollama_client import ask_ollama
 
 
-FACT_CHECK_PROMPT = """
+# The instructions are sent as a fixed system message so the server can
+# reuse their prefill; only the sentence changes between calls.
+FACT_CHECK_SYSTEM_PROMPT = """
 You are an expert AI fact-checking system.
 
-Analyze the following sentence:
-
-"{sentence}"
+Analyze the sentence you are given.
 
 Return JSON ONLY in this format:
 
@@ -19,14 +19,19 @@ Return JSON ONLY in this format:
 }
 """
 
+FACT_CHECK_PROMPT = """
+Analyze the following sentence:
+
+"{sentence}"
+"""
+
 
 def analyze_sentence_llm(sentence: str) -> dict:
     prompt = FACT_CHECK_PROMPT.format(sentence=sentence)
-    raw = ask_ollama(prompt)
+    raw = ask_ollama(prompt, system=FACT_CHECK_SYSTEM_PROMPT)
 
-    try:
-        parsed = json.loads(raw)
-    except:
+    parsed = extract_object(raw)
+    if parsed is None:
         parsed = {
             "is_flagged": False,
             "correction": "",
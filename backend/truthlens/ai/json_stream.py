@@ -0,0 +1,191 @@
+"""Incremental extraction of JSON objects from (possibly streamed) model output.
+
+Model replies are not guaranteed to be clean JSON: they may be wrapped in
+Markdown fences, preceded by chatter, or cut off mid-object. Everything here
+scans the text once, keeps every object that did complete, and reports what
+was lost instead of raising.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+LABELS = ("true", "false", "uncertain")
+
+
+class SentenceStreamParser:
+    """
+    Feed model output as it arrives and get back each completed object of
+    the ``"sentences"`` array as soon as its closing brace is seen.
+
+    Only objects whose direct parent is an array are emitted, which for the
+    analysis schema means the sentence items themselves. Top-level objects
+    are collected separately in ``top_level``.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._item_start: int | None = None
+        self._item_depth = 0
+        self._root_start: int | None = None
+        self._length = 0
+        self.top_level: List[dict] = []
+        self.malformed = 0
+
+    def feed(self, chunk: str) -> List[dict]:
+        completed = []
+
+        for char in chunk:
+            self._buffer.append(char)
+            position = self._length
+            self._length += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                # Quotes outside any object/array are prose, not JSON.
+                self._in_string = bool(self._stack)
+            elif char in "{[":
+                if not self._stack:
+                    self._root_start = position
+                if char == "{" and self._stack and self._stack[-1] == "[" and self._item_start is None:
+                    self._item_start = position
+                    self._item_depth = len(self._stack)
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+
+                if char == "}" and self._item_start is not None and len(self._stack) == self._item_depth:
+                    item = self._decode(self._item_start, position)
+                    self._item_start = None
+                    if isinstance(item, dict):
+                        completed.append(item)
+
+                if not self._stack and self._root_start is not None:
+                    root = self._decode(self._root_start, position) if char == "}" else None
+                    self._root_start = None
+                    if isinstance(root, dict):
+                        self.top_level.append(root)
+
+        return completed
+
+    def _decode(self, start: int, end: int):
+        try:
+            return json.loads("".join(self._buffer[start:end + 1]))
+        except ValueError:
+            self.malformed += 1
+            return None
+
+    @property
+    def complete(self) -> bool:
+        """True once a top-level value has been closed and nothing is left open."""
+        return bool(self.top_level) and not self._stack
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return "".join(self._buffer)
+
+
+def validate_sentence_item(item) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Check one analysis item against the schema and normalise its fields.
+
+    Returns ``(item, None)`` when usable, otherwise ``(None, reason)``.
+    """
+    if not isinstance(item, dict):
+        return None, "item is not an object"
+
+    sentence = item.get("sentence")
+    if not isinstance(sentence, str) or not sentence.strip():
+        return None, "missing sentence"
+
+    label = str(item.get("label", "")).strip().lower()
+    if label not in LABELS:
+        return None, f"invalid label {item.get('label')!r}"
+
+    try:
+        confidence = float(item.get("confidence", 0))
+    except (TypeError, ValueError):
+        return None, f"invalid confidence {item.get('confidence')!r}"
+    if confidence > 1:
+        # Some models answer in percent.
+        confidence /= 100
+    confidence = min(max(confidence, 0.0), 1.0)
+
+    sources = item.get("sources") or []
+    if isinstance(sources, str):
+        sources = [sources]
+    if not isinstance(sources, list):
+        return None, "invalid sources"
+
+    normalized = {
+        "sentence": sentence,
+        "label": label,
+        "confidence": confidence,
+        "suggested_correction": str(item.get("suggested_correction") or "").strip(),
+        "reasoning": str(item.get("reasoning") or "").strip(),
+        "sources": [str(source) for source in sources],
+    }
+
+    # The sentence number from the prompt, when the model echoed a usable one.
+    try:
+        number = int(item.get("id"))
+    except (TypeError, ValueError):
+        number = None
+    if number is not None:
+        normalized["id"] = number
+
+    return normalized, None
+
+
+@dataclass
+class ExtractionResult:
+    """Outcome of pulling analysis items out of a model reply."""
+
+    items: List[dict] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    complete: bool = False
+
+    @property
+    def partial(self) -> bool:
+        """Some output was truncated or rejected."""
+        return not self.complete or bool(self.errors)
+
+
+def extract_sentence_items(raw: str) -> ExtractionResult:
+    """Recover every valid sentence item from a complete model reply."""
+    parser = SentenceStreamParser()
+    result = ExtractionResult()
+
+    for item in parser.feed(raw or ""):
+        valid, error = validate_sentence_item(item)
+        if valid is not None:
+            result.items.append(valid)
+        else:
+            result.errors.append(error)
+
+    if parser.malformed:
+        result.errors.append(f"{parser.malformed} malformed object(s)")
+    result.complete = parser.complete
+    return result
+
+
+def extract_object(raw: str) -> Optional[dict]:
+    """First complete top-level JSON object in the reply, if any."""
+    parser = SentenceStreamParser()
+    parser.feed(raw or "")
+    return parser.top_level[0] if parser.top_level else None
@@ -0,0 +1,321 @@
+"""Process-wide metrics for model calls, in the Prometheus text format.
+
+Every Ollama call records its wall time, Ollama's token counts and
+durations, and the bytes sent and received; analyses add how their replies
+parsed, how their verdicts were matched to sentence rows and how the
+verdict cache answered. ``render()`` is served at
+``/metrics`` (and by ``run_analysis_worker --metrics-port``, since each
+process keeps its own registry).
+
+Useful queries::
+
+    histogram_quantile(0.95, sum by (model, le) (rate(truthlens_llm_request_duration_seconds_bucket[5m])))
+    rate(truthlens_llm_completion_tokens_total[5m]) / rate(truthlens_llm_eval_seconds_total[5m])
+    sum(rate(truthlens_analysis_items_matched_total[5m]))
+      / (sum(rate(truthlens_analysis_items_matched_total[5m])) + rate(truthlens_analysis_items_unmatched_total[5m]))
+
+``LLMUsage`` collects the same figures for a single analysis run; its
+``report()`` is stored with the analysis result.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import Counter as _Tally
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (last slot is +Inf), sum.
+        self._values: dict[tuple, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[slot] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self._values.get(self._key(labels)) or ([0], 0.0)
+        return sum(counts)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        lines = self.header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), **kwargs) -> Histogram:
+        metric = Histogram(name, help, labels, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], list[str]]) -> None:
+        """Register a callable returning exposition lines computed at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "truthlens_llm_request_duration_seconds",
+    "Wall time of Ollama calls, including queueing for a backend.",
+    ["model", "outcome"],
+)
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    "truthlens_llm_prompt_tokens_total", "Prompt tokens evaluated by Ollama (prompt_eval_count).", ["model"]
+)
+LLM_PREFILL_SECONDS = REGISTRY.counter(
+    "truthlens_llm_prefill_seconds_total", "Time Ollama spent evaluating prompts.", ["model"]
+)
+LLM_COMPLETION_TOKENS = REGISTRY.counter(
+    "truthlens_llm_completion_tokens_total", "Tokens generated by Ollama (eval_count).", ["model"]
+)
+LLM_EVAL_SECONDS = REGISTRY.counter(
+    "truthlens_llm_eval_seconds_total", "Time Ollama spent generating tokens (eval_duration).", ["model"]
+)
+LLM_LOAD_SECONDS = REGISTRY.counter(
+    "truthlens_llm_load_seconds_total", "Time Ollama spent loading models.", ["model"]
+)
+LLM_REQUEST_BYTES = REGISTRY.counter(
+    "truthlens_llm_request_bytes_total", "Bytes sent to Ollama.", ["model"]
+)
+LLM_RESPONSE_BYTES = REGISTRY.counter(
+    "truthlens_llm_response_bytes_total", "Bytes received from Ollama.", ["model"]
+)
+LLM_PARSE = REGISTRY.counter(
+    "truthlens_llm_parse_total", "Analysis replies by parse outcome (ok, partial, failed).", ["outcome"]
+)
+ANALYSIS_ITEMS_MATCHED = REGISTRY.counter(
+    "truthlens_analysis_items_matched_total",
+    "Model verdicts tied to a sentence row, by match method (id, text, fuzzy).",
+    ["method"],
+)
+ANALYSIS_ITEMS_UNMATCHED = REGISTRY.counter(
+    "truthlens_analysis_items_unmatched_total", "Model verdicts that matched no sentence row and were dropped."
+)
+VERDICT_CACHE_LOOKUPS = REGISTRY.counter(
+    "truthlens_verdict_cache_lookups_total", "Verdict cache lookups by result (hot, cold, similar, miss).", ["result"]
+)
+
+
+def observe_call(result) -> None:
+    """Record a successful call; ``result`` is an ``ollama_client.ChatResult``."""
+    model, timings = result.model, result.timings
+    LLM_REQUEST_SECONDS.observe(result.wall, model=model, outcome="ok")
+    LLM_PROMPT_TOKENS.inc(timings.prefill_tokens, model=model)
+    LLM_PREFILL_SECONDS.inc(timings.prefill, model=model)
+    LLM_COMPLETION_TOKENS.inc(timings.eval_tokens, model=model)
+    LLM_EVAL_SECONDS.inc(timings.eval, model=model)
+    LLM_LOAD_SECONDS.inc(timings.load, model=model)
+    LLM_REQUEST_BYTES.inc(result.bytes_sent, model=model)
+    LLM_RESPONSE_BYTES.inc(result.bytes_received, model=model)
+
+
+def observe_failure(model: str, wall: float) -> None:
+    LLM_REQUEST_SECONDS.observe(wall, model=model, outcome="error")
+
+
+def observe_parse(outcome: str) -> None:
+    LLM_PARSE.inc(outcome=outcome)
+
+
+def observe_matching(stats: dict) -> None:
+    """``stats`` maps id/text/fuzzy/unmatched to a number of items (``ItemMatcher.stats``)."""
+    for method in ("id", "text", "fuzzy"):
+        if stats.get(method):
+            ANALYSIS_ITEMS_MATCHED.inc(stats[method], method=method)
+    if stats.get("unmatched"):
+        ANALYSIS_ITEMS_UNMATCHED.inc(stats["unmatched"])
+
+
+def observe_cache(counts: dict) -> None:
+    """``counts`` maps hot/cold/similar/miss to a number of sentences."""
+    for result, count in counts.items():
+        if count:
+            VERDICT_CACHE_LOOKUPS.inc(count, result=result)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, host: str = "") -> ThreadingHTTPServer:
+    """Serve ``render()`` on ``port`` from a daemon thread, for processes without a web server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+class LLMUsage:
+    """Model calls, parse outcomes and cache use of one analysis run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = _Tally()
+        self.seconds = _Tally()
+        self.slowest = 0.0
+
+    def record_call(self, result) -> None:
+        timings = result.timings
+        with self._lock:
+            self.counts.update(
+                calls=1,
+                prompt_tokens=timings.prefill_tokens,
+                completion_tokens=timings.eval_tokens,
+                bytes_sent=result.bytes_sent,
+                bytes_received=result.bytes_received,
+            )
+            self.counts[f"calls:{result.model}"] += 1
+            self.seconds.update(wall=result.wall, prefill=timings.prefill, eval=timings.eval, load=timings.load)
+            self.slowest = max(self.slowest, result.wall)
+
+    def record_failure(self, wall: float) -> None:
+        with self._lock:
+            self.counts["failed"] += 1
+            self.seconds["wall"] += wall
+            self.slowest = max(self.slowest, wall)
+
+    def record_parse(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[f"parse:{outcome}"] += 1
+
+    def record_cache(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.counts.update(cache_hits=hits, cache_misses=misses)
+
+    def report(self) -> dict:
+        counts, seconds = self.counts, self.seconds
+        lookups = counts["cache_hits"] + counts["cache_misses"]
+        return {
+            "calls": counts["calls"],
+            "failed": counts["failed"],
+            "models": {
+                key.split(":", 1)[1]: count for key, count in sorted(counts.items()) if key.startswith("calls:")
+            },
+            "prompt_tokens": counts["prompt_tokens"],
+            "completion_tokens": counts["completion_tokens"],
+            "tokens_per_second": round(counts["completion_tokens"] / seconds["eval"], 2) if seconds["eval"] else 0.0,
+            "wall_seconds": round(seconds["wall"], 3),
+            "slowest_call_seconds": round(self.slowest, 3),
+            "prefill_seconds": round(seconds["prefill"], 3),
+            "eval_seconds": round(seconds["eval"], 3),
+            "load_seconds": round(seconds["load"], 3),
+            "bytes_sent": counts["bytes_sent"],
+            "bytes_received": counts["bytes_received"],
+            "parse": {outcome: counts[f"parse:{outcome}"] for outcome in ("ok", "partial", "failed")},
+            "cache": {
+                "hits": counts["cache_hits"],
+                "misses": counts["cache_misses"],
+                "hit_rate": round(counts["cache_hits"] / lookups, 4) if lookups else 0.0,
+            },
+        }
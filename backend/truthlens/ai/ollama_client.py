@@ -1,37 +1,480 @@
+import asyncio
+import hashlib
 import json
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import Callable, Iterable
+
 import httpx
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
-OLLAMA_URL = "http://host.docker.internal:11434/api/generate"
-DEFAULT_MODEL = "gpt-oss:20b"   # <-- change to your installed model
+from truthlens.ai import metrics
+from truthlens.ai.backend_pool import BackendPool, is_backend_failure
+
+DEFAULT_MODEL = getattr(settings, "OLLAMA_MODEL", "gpt-oss:20b")   # <-- change to your installed model
+
+CHAT_PATH = "/api/chat"
+
+# Failing before the request was sent; safe to retry on another backend.
+_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OllamaTimings:
+    """Timings Ollama reports with the last chunk of a reply, in seconds."""
+
+    total: float = 0.0
+    load: float = 0.0
+    prefill_tokens: int = 0
+    prefill: float = 0.0
+    eval_tokens: int = 0
+    eval: float = 0.0
+
+    @classmethod
+    def from_response(cls, data: dict) -> "OllamaTimings":
+        def seconds(name):
+            return (data.get(name) or 0) / 1e9
+
+        return cls(
+            total=seconds("total_duration"),
+            load=seconds("load_duration"),
+            prefill_tokens=data.get("prompt_eval_count") or 0,
+            prefill=seconds("prompt_eval_duration"),
+            eval_tokens=data.get("eval_count") or 0,
+            eval=seconds("eval_duration"),
+        )
 
+    def as_dict(self) -> dict:
+        return asdict(self)
 
-def ask_ollama(prompt: str, model: str = DEFAULT_MODEL) -> str:
+    def __str__(self) -> str:
+        return (
+            f"load {self.load:.2f}s, prefill {self.prefill_tokens} tok in {self.prefill:.2f}s, "
+            f"eval {self.eval_tokens} tok in {self.eval:.2f}s, total {self.total:.2f}s"
+        )
+
+
+@dataclass(frozen=True)
+class ChatResult:
+    text: str
+    timings: OllamaTimings
+    model: str = ""
+    # Wall time of the call as the caller saw it, queueing for a backend included.
+    wall: float = 0.0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+
+class OllamaClient:
     """
-    Calls Ollama and returns raw text.
-    DEBUG PRINT ENABLED.
+    Reusable Ollama client backed by pooled, keep-alive httpx clients.
+
+    Requests go to ``/api/chat`` with the fixed instructions as a separate
+    system message, so consecutive calls share a prompt prefix that the
+    server can reuse instead of prefilling it again. Every request carries
+    ``keep_alive`` so the model stays loaded between calls.
+
+    Requests are spread over the servers of a ``BackendPool``
+    (``OLLAMA_BACKENDS``); one that cannot be reached is retried on the next
+    backend.
+
+    Identical prompts that are already in flight are coalesced: concurrent
+    callers wait on the first request instead of issuing their own.
     """
 
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "temperature": 0
-    }
+    def __init__(
+        self,
+        *,
+        url: str | None = None,
+        pool: BackendPool | None = None,
+        keep_alive: str | int | None = None,
+        timeout: float | None = None,
+        connect_timeout: float | None = None,
+        max_connections: int | None = None,
+        max_keepalive_connections: int | None = None,
+        keepalive_expiry: float | None = None,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        self.pool = pool or BackendPool.from_settings([url] if url else None)
+        self.keep_alive = keep_alive if keep_alive is not None else getattr(settings, "OLLAMA_KEEP_ALIVE", "30m")
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else getattr(settings, "OLLAMA_TIMEOUT_SECONDS", 60),
+            connect=connect_timeout if connect_timeout is not None
+            else getattr(settings, "OLLAMA_CONNECT_TIMEOUT_SECONDS", 5),
+        )
+        # One connection pool serves every backend; it must not cap the pool's slots.
+        self.limits = httpx.Limits(
+            max_connections=max_connections if max_connections is not None
+            else max(getattr(settings, "OLLAMA_MAX_CONNECTIONS", 8), self.pool.capacity),
+            max_keepalive_connections=max_keepalive_connections if max_keepalive_connections is not None
+            else max(getattr(settings, "OLLAMA_MAX_KEEPALIVE_CONNECTIONS", 8), self.pool.capacity),
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None
+            else getattr(settings, "OLLAMA_KEEPALIVE_EXPIRY_SECONDS", 60),
+        )
+
+        self.transport = transport
 
-    try:
-        response = httpx.post(OLLAMA_URL, json=payload, timeout=60)
+        self._lock = threading.Lock()
+        self._client: httpx.Client | None = None
+        self._inflight: dict[str, Future] = {}
+
+        # AsyncClient and asyncio futures are bound to the loop that created them.
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_inflight = weakref.WeakKeyDictionary()
+
+    # ------------------------------------------------------------------
+    # helpers
+
+    def _payload(self, prompt: str, model: str, system: str | None = None) -> dict:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        return {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": 0},
+        }
+
+    @staticmethod
+    def _key(prompt: str, model: str, system: str | None = None) -> str:
+        return hashlib.sha256(f"{model}\x00{system or ''}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _extract(response: httpx.Response) -> ChatResult:
         response.raise_for_status()
         data = response.json()
-    except Exception as exc:
-        raise ValidationError(f"Ollama request failed: {exc}")
+        if data.get("error"):
+            raise ValidationError(data["error"])
+
+        raw = (data.get("message") or {}).get("content")
+        timings = OllamaTimings.from_response(data)
+        logger.debug("Raw Ollama output: %s", raw)
+        logger.debug("Ollama %s: %s", data.get("model"), timings)
+        return ChatResult(
+            text=raw,
+            timings=timings,
+            model=data.get("model") or "",
+            bytes_sent=len(response.request.content),
+            bytes_received=len(response.content),
+        )
+
+    @staticmethod
+    def _finish(result: ChatResult, model: str, started: float) -> ChatResult:
+        """Stamp the call's wall time and requested model, and record it in the metrics."""
+        result = replace(result, model=model, wall=time.perf_counter() - started)
+        metrics.observe_call(result)
+        return result
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, limits=self.limits, transport=self.transport)
+            return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._async_clients[loop] = client
+        return client
+
+    def _send(self, payload: dict) -> ChatResult:
+        """POST a chat request to the least loaded backend, failing over on connect errors."""
+        tried = set()
+        while True:
+            try:
+                with self.pool.lease(exclude=tried) as lease:
+                    return self._extract(self._sync_client().post(lease.url + CHAT_PATH, json=payload))
+            except _CONNECT_ERRORS:
+                tried.add(lease.url)
+                if len(tried) == len(self.pool.backends):
+                    raise
+
+    async def _asend(self, payload: dict) -> ChatResult:
+        """Async counterpart of :meth:`_send`."""
+        tried = set()
+        while True:
+            lease = await asyncio.to_thread(self.pool.acquire, exclude=tried)
+            healthy = True
+            try:
+                return self._extract(await self._async_client().post(lease.url + CHAT_PATH, json=payload))
+            except BaseException as exc:
+                healthy = not is_backend_failure(exc)
+                if not isinstance(exc, _CONNECT_ERRORS) or len(tried) + 1 == len(self.pool.backends):
+                    raise
+                tried.add(lease.url)
+            finally:
+                self.pool.release(lease, healthy=healthy)
+
+    # ------------------------------------------------------------------
+    # sync API
+
+    def chat(self, prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> ChatResult:
+        """Send a prompt (after an optional system message); return the reply text and its timings."""
+        key = self._key(prompt, model, system)
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._inflight[key] = pending
+
+        if not owner:
+            return pending.result()
+
+        started = time.perf_counter()
+        try:
+            result = self._finish(self._send(self._payload(prompt, model, system)), model, started)
+        except Exception as exc:
+            metrics.observe_failure(model, time.perf_counter() - started)
+            error = ValidationError(f"Ollama request failed: {exc}")
+            pending.set_exception(error)
+            raise error
+        else:
+            pending.set_result(result)
+            return result
+        finally:
+            if not pending.done():
+                pending.set_exception(ValidationError("Ollama request was interrupted"))
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def generate(self, prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> str:
+        """Send a prompt and return the raw model text."""
+        return self.chat(prompt, model, system=system).text
+
+    def stream(
+        self,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        *,
+        system: str | None = None,
+        on_timings: Callable[[OllamaTimings], None] | None = None,
+        on_result: Callable[[ChatResult], None] | None = None,
+    ):
+        """Yield response text fragments as Ollama generates them.
+
+        ``on_timings`` is called with the reply's timings once the final
+        chunk arrives, ``on_result`` with the whole reply (text, timings,
+        wall time and bytes).
+        """
+        payload = self._payload(prompt, model, system)
+        payload["stream"] = True
+
+        started = time.perf_counter()
+        received = 0
+        text = []
+        try:
+            with self.pool.lease() as lease:
+                with self._sync_client().stream("POST", lease.url + CHAT_PATH, json=payload) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        received += len(line.encode("utf-8")) + 1
+                        if not line:
+                            continue
+
+                        data = json.loads(line)
+                        if data.get("error"):
+                            raise ValidationError(f"Ollama request failed: {data['error']}")
+
+                        fragment = (data.get("message") or {}).get("content")
+                        if fragment:
+                            text.append(fragment)
+                            yield fragment
+
+                        if data.get("done"):
+                            timings = OllamaTimings.from_response(data)
+                            logger.debug("Ollama %s (streamed): %s", model, timings)
+                            result = self._finish(
+                                ChatResult(
+                                    text="".join(text),
+                                    timings=timings,
+                                    bytes_sent=len(response.request.content),
+                                    bytes_received=received,
+                                ),
+                                model,
+                                started,
+                            )
+                            if on_timings is not None:
+                                on_timings(timings)
+                            if on_result is not None:
+                                on_result(result)
+                            break
+        except (httpx.HTTPError, ValueError) as exc:
+            metrics.observe_failure(model, time.perf_counter() - started)
+            raise ValidationError(f"Ollama request failed: {exc}")
+        except ValidationError:
+            metrics.observe_failure(model, time.perf_counter() - started)
+            raise
+
+    def warmup(
+        self,
+        model: str = DEFAULT_MODEL,
+        *,
+        systems: Iterable[str] = (),
+    ) -> dict[str, list[OllamaTimings]]:
+        """
+        Load ``model`` and prefill each system prompt on every backend.
+
+        A chat request without messages only loads the model; each system
+        prompt is then sent with a one-token reply so its prefix is cached.
+        Returns the timings per backend URL; backends that fail are logged
+        and left out, and only a warmup that fails everywhere raises.
+        """
+        client = self._sync_client()
+        requests = [{"model": model, "messages": [], "keep_alive": self.keep_alive}]
+        for system in systems:
+            payload = self._payload("", model, system)
+            payload["options"] = {**payload["options"], "num_predict": 1}
+            requests.append(payload)
+
+        def warm(backend):
+            try:
+                return [self._extract(client.post(backend.url + CHAT_PATH, json=payload)).timings for payload in requests]
+            except Exception as exc:
+                logger.warning("Ollama warmup of %s failed: %s", backend.url, exc)
+                return None
+
+        backends = self.pool.backends
+        with ThreadPoolExecutor(max_workers=len(backends)) as executor:
+            results = dict(zip((backend.url for backend in backends), executor.map(warm, backends)))
+
+        warmed = {url: timings for url, timings in results.items() if timings is not None}
+        if not warmed:
+            raise ValidationError("Ollama warmup failed on every backend")
+        return warmed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    # ------------------------------------------------------------------
+    # async API
+
+    async def achat(self, prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> ChatResult:
+        """Async counterpart of :meth:`chat`."""
+        loop = asyncio.get_running_loop()
+        inflight = self._async_inflight.setdefault(loop, {})
+        key = self._key(prompt, model, system)
+
+        pending = inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = loop.create_future()
+        inflight[key] = pending
+
+        started = time.perf_counter()
+        try:
+            result = self._finish(await self._asend(self._payload(prompt, model, system)), model, started)
+        except Exception as exc:
+            metrics.observe_failure(model, time.perf_counter() - started)
+            error = ValidationError(f"Ollama request failed: {exc}")
+            pending.set_exception(error)
+            # Mark retrieved so waiter-less failures do not log warnings.
+            pending.exception()
+            raise error
+        else:
+            pending.set_result(result)
+            return result
+        finally:
+            if not pending.done():
+                pending.cancel()
+            inflight.pop(key, None)
+
+    async def agenerate(self, prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> str:
+        """Async counterpart of :meth:`generate`."""
+        return (await self.achat(prompt, model, system=system)).text
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+_default_client: OllamaClient | None = None
+_default_client_lock = threading.Lock()
+
+
+def _backend_metrics() -> list[str]:
+    """Backend pool gauges for ``/metrics``; empty until this process has made a call."""
+    client = _default_client
+    if client is None:
+        return []
+
+    snapshot = client.pool.snapshot()
+    series = [
+        ("truthlens_ollama_backend_up", "gauge", "1 unless the backend is ejected.",
+         lambda backend: int(backend["state"] != "open")),
+        ("truthlens_ollama_backend_outstanding", "gauge", "Requests in flight on the backend.",
+         lambda backend: backend["outstanding"]),
+        ("truthlens_ollama_backend_max_concurrency", "gauge", "Concurrent requests allowed on the backend.",
+         lambda backend: backend["max_concurrency"]),
+        ("truthlens_ollama_backend_requests_total", "counter", "Requests leased to the backend.",
+         lambda backend: backend["requests"]),
+        ("truthlens_ollama_backend_errors_total", "counter", "Failed requests on the backend.",
+         lambda backend: backend["errors"]),
+    ]
+    lines = []
+    for name, kind, help, value in series:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{url="{backend["url"]}"}} {value(backend)}' for backend in snapshot]
+    return lines
+
+
+metrics.REGISTRY.add_collector(_backend_metrics)
+
+
+def get_client() -> OllamaClient:
+    """Process-wide shared client, created on first use."""
+    global _default_client
+
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
+
+
+def backend_capacity() -> int:
+    """Requests the shared client can have in flight at once (slots over all backends)."""
+    return get_client().pool.capacity
+
+
+def ask_ollama(prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> str:
+    """
+    Calls Ollama and returns raw text.
+    """
+    return get_client().generate(prompt, model, system=system)
+
+
+def chat_ollama(prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> ChatResult:
+    """Like :func:`ask_ollama`, but also returns Ollama's timings for the call."""
+    return get_client().chat(prompt, model, system=system)
+
+
+def stream_ollama(prompt: str, model: str = DEFAULT_MODEL, **kwargs):
+    """Stream raw text fragments from Ollama."""
+    return get_client().stream(prompt, model, **kwargs)
 
-    raw = data.get("response")
 
-    print("\n\n====================")
-    print("RAW OLLAMA OUTPUT:")
-    print(raw)
-    print("====================\n\n")
+async def aask_ollama(prompt: str, model: str = DEFAULT_MODEL, *, system: str | None = None) -> str:
+    """Async variant of :func:`ask_ollama`."""
+    return await get_client().agenerate(prompt, model, system=system)
 
-    return raw
 
+def warmup_ollama(model: str = DEFAULT_MODEL, *, systems: Iterable[str] = ()) -> dict[str, list[OllamaTimings]]:
+    return get_client().warmup(model, systems=systems)
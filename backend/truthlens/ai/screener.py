@@ -0,0 +1,184 @@
+"""Deciding which model, if any, a sentence is worth.
+
+Sentences are scored locally for how much checkable claim they carry:
+
+* ``skip``  – only what cannot be a claim: empty text, questions, one- or
+  two-word fragments and headings ending in ``:``; answered here with an
+  ``uncertain`` verdict and no model call;
+* ``small`` – plain declarative sentences: sent to the small model
+  (``OLLAMA_SCREENER_MODEL``) and escalated to the large one unless its
+  verdict is ``true``/``false`` with at least
+  ``SCREENER_SMALL_MIN_CONFIDENCE``;
+* ``large`` – sentences with figures, names or superlatives, and everything
+  in the small tier when no small model is configured.
+
+``SCREENER_LARGE_FROM`` is the score cut-off between the model tiers. The
+skip rules are deliberately narrow: a leading "Note that" or "Thanks to",
+or a missing full stop, says nothing about whether the rest is true, and a
+false claim must never be passed without a model looking at it.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+
+SKIP, SMALL, LARGE = "skip", "small", "large"
+
+_WORD = re.compile(r"[^\W_]+(?:['’-][^\W_]+)*")
+_NUMBER = re.compile(r"\d")
+_OPINION = re.compile(
+    r"\b(i|we) (think|believe|feel|hope|guess|love|like|prefer)\b|\bin my (opinion|view)\b|\bmaybe\b|\bperhaps\b",
+    re.IGNORECASE,
+)
+_FACT_VERBS = frozenset(
+    """
+    is are was were be been has have had contains contain consists founded invented discovered located
+    born died caused causes produces produced built wrote won lies lie equals orbits measures weighs
+    """.split()
+)
+_DEGREE = frozenset(
+    "first last only most least largest smallest biggest highest lowest longest oldest newest fastest "
+    "more less than every all never always".split()
+)
+
+
+@dataclass(frozen=True)
+class Screening:
+    tier: str
+    score: float
+    reason: str
+
+
+def non_claim_reason(text: str) -> Optional[str]:
+    """Why ``text`` cannot carry a claim, or ``None`` when it might."""
+    stripped = text.strip()
+    if not stripped:
+        return "empty"
+    if stripped.endswith("?"):
+        return "question"
+    if stripped.endswith(":"):
+        return "heading"
+    if len(_WORD.findall(stripped)) < 3:
+        return "too short"
+    return None
+
+
+def claim_score(text: str) -> tuple[float, str]:
+    """How much checkable claim ``text`` carries, from 0 (none) to 1, with the main reason."""
+    reason = non_claim_reason(text)
+    if reason is not None:
+        return 0.0, reason
+
+    stripped = text.strip()
+    words = _WORD.findall(stripped)
+    lowered = [word.lower() for word in words]
+    has_figures = bool(_NUMBER.search(stripped))
+    has_fact_verb = any(word in _FACT_VERBS for word in lowered)
+
+    score, reasons = 0.3, ["statement"]
+    if has_figures:
+        score += 0.35
+        reasons.append("figures")
+    if any(word[0].isupper() for word in words[1:]):
+        score += 0.25
+        reasons.append("names")
+    if has_fact_verb:
+        score += 0.25
+        reasons.append("factual verb")
+    if any(word in _DEGREE or word.endswith("est") for word in lowered):
+        score += 0.15
+        reasons.append("degree")
+    if _OPINION.search(stripped):
+        score -= 0.2
+        reasons.append("opinion")
+
+    # Anything that might be a claim stays above zero: only non_claim_reason skips.
+    return round(min(max(score, 0.05), 1.0), 2), ", ".join(reasons)
+
+
+class ClaimScreener:
+    def __init__(
+        self,
+        *,
+        large_from: float = 0.7,
+        small_model: Optional[str] = None,
+        small_min_confidence: float = 0.85,
+        enabled: bool = True,
+    ):
+        self.large_from = large_from
+        self.small_model = small_model
+        self.small_min_confidence = small_min_confidence
+        self.enabled = enabled
+
+    @classmethod
+    def from_settings(cls) -> "ClaimScreener":
+        return cls(
+            large_from=getattr(settings, "SCREENER_LARGE_FROM", 0.7),
+            small_model=getattr(settings, "OLLAMA_SCREENER_MODEL", None),
+            small_min_confidence=getattr(settings, "SCREENER_SMALL_MIN_CONFIDENCE", 0.85),
+            enabled=getattr(settings, "SCREENER_ENABLED", True),
+        )
+
+    def screen(self, text: str) -> Screening:
+        if not self.enabled:
+            return Screening(LARGE, 1.0, "screener disabled")
+
+        score, reason = claim_score(text)
+        if score == 0.0:
+            return Screening(SKIP, score, reason)
+        if score >= self.large_from or not self.small_model:
+            return Screening(LARGE, score, reason)
+        return Screening(SMALL, score, reason)
+
+    def accepts(self, item: dict) -> bool:
+        """Whether a small-model verdict is confident enough to keep."""
+        return item.get("label") in ("true", "false") and item.get("confidence", 0) >= self.small_min_confidence
+
+    @staticmethod
+    def skip_item(sentence) -> dict:
+        """The verdict for a sentence with no checkable claim: analyzed, never flagged."""
+        return {
+            "sentence": sentence.content,
+            "sentence_id": sentence.sentence_id,
+            "label": "uncertain",
+            "confidence": 0.0,
+            "suggested_correction": "",
+            "reasoning": "",
+            "sources": [],
+        }
+
+
+class TierStats:
+    """Where screened sentences ended up, for logs and analysis summaries."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, other: "TierStats") -> None:
+        self.counts.update(other.counts)
+
+    def report(self) -> dict:
+        screened = self.counts["screened"]
+        small = self.counts["small"]
+        large = self.counts["large"] + self.counts["escalated"]
+
+        def rate(part, whole):
+            return round(part / whole, 4) if whole else 0.0
+
+        return {
+            "screened": screened,
+            "skipped": self.counts["skip"],
+            "small": small,
+            "small_accepted": self.counts["small_accepted"],
+            "escalated": self.counts["escalated"],
+            "large": large,
+            "skip_rate": rate(self.counts["skip"], screened),
+            "small_hit_rate": rate(self.counts["small_accepted"], small),
+            "large_rate": rate(large, screened),
+        }
@@ -1,34 +1,148 @@
-from django.http import JsonResponse
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
-from asgiref.sync import async_to_sync
 
-from truthlens.services.analysis.analysis_service import analyze_document
+from truthlens.services.analysis.analysis_service import stream_document_analysis
+from truthlens.services.jobs.job_service import (
+    enqueue_analysis,
+    enqueue_batch_analysis,
+    get_job,
+    resolve_batch_documents,
+)
+
+
+def _flag(value, name: str) -> bool:
+    """A JSON boolean, or one of the strings the query parameters accept."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("1", "true", "yes"):
+        return True
+    if isinstance(value, str) and value.lower() in ("", "0", "false", "no"):
+        return False
+    raise ValidationError(f"{name} must be true or false")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
 
 
 @csrf_exempt
 def analyze_document_api(request, doc_id: int):
     """
     POST /documents/<doc_id>/analyze/
-    Runs the AI analysis pipeline and returns structured results.
+    Queues the AI analysis pipeline and returns the job to poll.
+    Pass ?incremental=true to only analyze sentences changed since the last run.
     """
 
     if request.method != "POST":
         return JsonResponse({"error": "Only POST allowed"}, status=405)
 
     try:
-        # Run async function inside sync Django context
-        result = analyze_document(doc_id)
+        incremental = request.GET.get("incremental", "").lower() in ("1", "true", "yes")
+        job = enqueue_analysis(doc_id, incremental=incremental)
 
         return JsonResponse(
-            {"status": "ok", "analysis": result},
-            status=200,
-            safe=False
+            {"job_id": job.job_id, "status": job.status},
+            status=202,
         )
 
     except ValidationError as exc:
-        return JsonResponse({"error": str(exc)}, status=400)
+        return JsonResponse({"error": str(exc)}, status=404)
 
     except Exception as exc:
         return JsonResponse({"error": f"Unexpected error: {exc}"}, status=500)
 
+
+@csrf_exempt
+def analyze_documents_batch_api(request):
+    """
+    POST /documents/analyze/batch/
+    Body: {"document_ids": [...]} or {"user_id": ...}, optional "incremental".
+    Queues one job that analyzes every document, judging sentences shared
+    between documents once. Poll /jobs/<job_id>/ for progress.
+    """
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST allowed"}, status=405)
+
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "invalid JSON body"}, status=400)
+    if not isinstance(body, dict):
+        return JsonResponse({"error": "invalid JSON body"}, status=400)
+
+    try:
+        document_ids = resolve_batch_documents(
+            document_ids=body.get("document_ids"),
+            user_id=body.get("user_id"),
+        )
+        job = enqueue_batch_analysis(document_ids, incremental=_flag(body.get("incremental", False), "incremental"))
+    except ValidationError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse(
+        {"job_id": job.job_id, "status": job.status, "documents": len(document_ids)},
+        status=202,
+    )
+
+
+def get_analysis_job_api(request, job_id: int):
+    """
+    GET /jobs/<job_id>/
+    Returns the job status, plus the analysis once it has finished.
+    """
+
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET allowed"}, status=405)
+
+    try:
+        job = get_job(job_id)
+    except ValidationError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+
+    return JsonResponse(
+        {
+            "job_id": job.job_id,
+            "document_id": job.document_id_id,
+            "document_ids": job.document_ids,
+            "status": job.status,
+            "progress": job.progress,
+            "incremental": job.incremental,
+            "analysis": job.result,
+            "error": job.error or None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+    )
+
+
+@csrf_exempt
+def stream_document_analysis_api(request, doc_id: int):
+    """
+    POST /documents/<doc_id>/analyze/stream/
+    Runs the analysis in this request and pushes each verdict as a
+    Server-Sent Event (``sentence``), followed by ``done``. The verdicts
+    are saved together once the run finishes.
+    """
+
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST allowed"}, status=405)
+
+    try:
+        incremental = request.GET.get("incremental", "").lower() in ("1", "true", "yes")
+        events = stream_document_analysis(doc_id, incremental=incremental)
+    except ValidationError as exc:
+        return JsonResponse({"error": str(exc)}, status=404)
+
+    response = StreamingHttpResponse(
+        (_sse(event, data) for event, data in events),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -2,23 +2,25 @@ from django.db import transaction
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from truthlens.models import Sentence
+from django.core.exceptions import ValidationError
+
+from truthlens.models import Document, Sentence
 from truthlens.services.corrections.correction_services import (
+    apply_corrections,
     get_corrections_for_sentence,
 )
-from truthlens.services.sentences.sentence_service import sync_document_sentences
+from truthlens.services.sentences.offsets import replace_text
+from truthlens.services.sentences.sentence_service import get_current_sentences
 
 
 @api_view(["GET"])
 def get_sentence_corrections(request, sentence_id):
     """Get all corrections for a sentence."""
-    try:
-        Sentence.objects.get(sentence_id=sentence_id)
-    except Sentence.DoesNotExist:
+    corrections = list(get_corrections_for_sentence(sentence_id))
+    # Only an empty result needs telling apart from a missing sentence.
+    if not corrections and not Sentence.objects.filter(sentence_id=sentence_id).exists():
         return Response({"error": "Sentence not found"}, status=404)
 
-    corrections = get_corrections_for_sentence(sentence_id)
-
     return Response(
         [
             {
@@ -38,7 +40,7 @@ def apply_correction(request, sentence_id, correction_id):
     from truthlens.models import Sentence, Correction
 
     try:
-        sentence = Sentence.objects.get(sentence_id=sentence_id)
+        sentence = Sentence.objects.select_related("document_id").get(sentence_id=sentence_id)
     except Sentence.DoesNotExist:
         return Response({"error": "Sentence not found"}, status=404)
 
@@ -55,26 +57,56 @@ def apply_correction(request, sentence_id, correction_id):
 
     try:
         with transaction.atomic():
-            before = doc.content[:sentence.start_index]
-            after = doc.content[sentence.end_index:]
-            new_text = f"{before}{replacement}{after}"
-
-            doc.content = new_text
-            doc.save(update_fields=["content"])
-
-            sentence.content = replacement
-            sentence.end_index = sentence.start_index + len(replacement)
-            sentence.flags = False
-            sentence.confidence_scores = 100
-            sentence.save(update_fields=["content", "end_index", "flags", "confidence_scores"])
+            # Make sure the sentence offsets describe the current text.
+            if doc.sentences_revision != doc.revision:
+                get_current_sentences(doc)
+                sentence.refresh_from_db(fields=["start_index", "end_index"])
+
+            # Only the sentences around the replacement are re-segmented;
+            # later ones are shifted by the length delta.
+            edit = replace_text(doc.document_id, sentence.start_index, sentence.end_index, replacement)
+            doc = edit.document
+
+            Sentence.objects.filter(
+                document_id=doc,
+                start_index__gte=sentence.start_index,
+                end_index__lte=sentence.start_index + len(replacement),
+            ).update(flags=False, confidence_scores=100)
 
             correction.delete()
+    except Sentence.DoesNotExist:
+        return Response({"error": "Sentence not found"}, status=404)
     except Exception as exc:  # pragma: no cover - defensive
         return Response({"error": str(exc)}, status=500)
 
-    sync_document_sentences(document=doc, text=doc.content)
+    return Response({
+        "document_id": doc.document_id,
+        "content": doc.content,
+    })
+
+
+@api_view(["POST"])
+def apply_corrections_api(request, doc_id):
+    """Apply many corrections to a document in one rewrite ("accept all")."""
+    if not Document.objects.filter(document_id=doc_id).exists():
+        return Response({"error": "Document not found"}, status=404)
+
+    items = request.data.get("corrections")
+    if not isinstance(items, list):
+        return Response({"error": "corrections must be a list"}, status=400)
+
+    try:
+        pairs = [(int(item["sentence_id"]), int(item["correction_id"])) for item in items]
+    except (KeyError, TypeError, ValueError):
+        return Response({"error": "each correction needs sentence_id and correction_id"}, status=400)
+
+    try:
+        doc = apply_corrections(doc_id, pairs)
+    except ValidationError as e:
+        return Response({"error": str(e)}, status=400)
 
     return Response({
         "document_id": doc.document_id,
         "content": doc.content,
-    })
\ No newline at end of file
+        "applied": len(pairs),
+    })
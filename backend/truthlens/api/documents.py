@@ -1,5 +1,9 @@
 # truthlens/api/documents.py
 
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -14,7 +18,31 @@ from truthlens.services.documents.document_service import (
     list_documents,
     get_document,
 )
-from truthlens.services.sentences.sentence_service import sync_document_sentences
+from truthlens.services.documents.snapshot_service import (
+    ETAG_FIELDS,
+    get_document_snapshot,
+    is_current,
+    serialize_snapshot,
+    snapshot_etag,
+)
+from truthlens.services.sentences.offsets import (
+    RevisionConflict,
+    delete_text,
+    insert_text,
+    replace_text,
+)
+from truthlens.services.sentences.sentence_service import get_current_sentences
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8")
 
 
 @api_view(["POST"])
@@ -34,23 +62,40 @@ def create_document_api(request):
 
 @api_view(["GET"])
 def list_documents_api(request):
-    """List documents, optionally filtered by user id."""
+    """List documents newest first, one keyset page at a time, optionally filtered by user id."""
     user_id = request.query_params.get("user_id")
+    limit = request.query_params.get("limit")
     try:
-        docs = list_documents(user_id=int(user_id)) if user_id is not None else list_documents()
+        user_id = int(user_id) if user_id is not None else None
     except ValueError:
         return Response({"error": "invalid user_id"}, status=400)
+    try:
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return Response({"error": "invalid limit"}, status=400)
+
+    try:
+        docs, next_cursor = list_documents(
+            user_id=user_id,
+            limit=limit,
+            cursor=request.query_params.get("cursor"),
+        )
+    except ValidationError as e:
+        return Response({"error": str(e)}, status=400)
 
     return Response(
-        [
-            {
-                "document_id": d.document_id,
-                "title": d.title,
-                "updated_at": d.updated_at,
-                "user_id": d.user_id_id,
-            }
-            for d in docs
-        ]
+        {
+            "results": [
+                {
+                    "document_id": d["document_id"],
+                    "title": d["title"],
+                    "updated_at": d["updated_at"],
+                    "user_id": d["user_id"],
+                }
+                for d in docs
+            ],
+            "next_cursor": next_cursor,
+        }
     )
 
 
@@ -72,6 +117,39 @@ def get_document_api(request, doc_id):
     )
 
 
+def get_document_snapshot_api(request, doc_id):
+    """
+    GET /documents/<doc_id>/snapshot/
+    The document, its sentences and every sentence's corrections in one
+    response. Send the returned ETag as If-None-Match to get 304 Not
+    Modified while nothing changed.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Only GET allowed"}, status=405)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        try:
+            doc = Document.objects.only(*ETAG_FIELDS).get(document_id=doc_id)
+        except Document.DoesNotExist:
+            return JsonResponse({"error": "Document not found"}, status=404)
+        if is_current(doc, if_none_match.strip()):
+            response = HttpResponseNotModified()
+            response["ETag"] = snapshot_etag(doc)
+            return response
+
+    try:
+        doc, sentences = get_document_snapshot(doc_id)
+    except ValidationError as e:
+        return JsonResponse({"error": str(e)}, status=404)
+
+    response = HttpResponse(_dumps(serialize_snapshot(doc, sentences)), content_type="application/json")
+    response["ETag"] = snapshot_etag(doc)
+    # Let browsers keep the body but revalidate it on every use.
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @api_view(["PUT"])
 def update_document_api(request, doc_id):
     """Update title/content and auto-sync sentences."""
@@ -82,14 +160,68 @@ def update_document_api(request, doc_id):
             content=request.data.get("content"),
         )
 
-        # sync sentences because content may have changed
-        sync_document_sentences(document=doc)
+        # sync sentences if the content changed
+        get_current_sentences(doc)
 
         return Response({"message": "Document updated"}, status=200)
     except ValidationError as e:
         return Response({"error": str(e)}, status=400)
 
 
+@api_view(["POST"])
+def edit_document_api(request, doc_id):
+    """Insert, delete or replace text at an offset, updating only nearby sentences.
+
+    Body: {"op": "insert"|"delete"|"replace", "offset": int, "length": int,
+    "text": str, "revision": int (optional)}.
+    """
+    op = request.data.get("op")
+    text = request.data.get("text", "")
+    revision = request.data.get("revision")
+    try:
+        offset = int(request.data.get("offset"))
+        length = int(request.data.get("length", 0))
+        revision = int(revision) if revision is not None else None
+    except (TypeError, ValueError):
+        return Response({"error": "offset, length and revision must be integers"}, status=400)
+    if not isinstance(text, str):
+        return Response({"error": "text must be a string"}, status=400)
+
+    try:
+        if op == "insert":
+            edit = insert_text(doc_id, offset, text, revision=revision)
+        elif op == "delete":
+            edit = delete_text(doc_id, offset, length, revision=revision)
+        elif op == "replace":
+            edit = replace_text(doc_id, offset, offset + length, text, revision=revision)
+        else:
+            return Response({"error": "op must be insert, delete or replace"}, status=400)
+    except RevisionConflict as e:
+        return Response({"error": str(e)}, status=409)
+    except ValidationError as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response(
+        {
+            "document_id": edit.document.document_id,
+            "revision": edit.document.revision,
+            "delta": edit.delta,
+            "resynced": edit.resynced,
+            "sentences": [
+                {
+                    "sentence_id": s.sentence_id,
+                    "content": s.content,
+                    "start_index": s.start_index,
+                    "end_index": s.end_index,
+                    "flags": s.flags,
+                    "confidence": s.confidence_scores,
+                }
+                for s in edit.sentences
+            ],
+        }
+    )
+
+
 @api_view(["DELETE"])
 def delete_document_api(request, doc_id):
     """Delete a document."""
@@ -5,18 +5,23 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from truthlens.models import Document, Sentence
-from truthlens.services.sentences.sentence_service import sync_document_sentences
+from truthlens.services.sentences.sentence_service import get_current_sentences
 
 
 @api_view(["GET"])
 def get_document_sentences(request, doc_id):
-    """Return sentences, auto-syncing first."""
+    """Return sentences, auto-syncing first if the text changed since the last sync.
+
+    ``?flagged=true`` returns only flagged sentences.
+    """
     try:
-        doc = Document.objects.get(document_id=doc_id)
+        # content is deferred: it is only loaded when a sync is needed.
+        doc = Document.objects.only("document_id", "revision", "sentences_revision").get(document_id=doc_id)
     except Document.DoesNotExist:
         return Response({"error": "Document not found"}, status=404)
 
-    sentences = sync_document_sentences(document=doc)
+    flagged_only = request.query_params.get("flagged", "").lower() in ("1", "true", "yes")
+    sentences = get_current_sentences(doc, flagged_only=flagged_only)
 
     return Response(
         [
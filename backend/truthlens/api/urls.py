@@ -11,12 +11,19 @@ from .documents import (
     create_document_api,
     list_documents_api,
     get_document_api,
+    get_document_snapshot_api,
     update_document_api,
+    edit_document_api,
     delete_document_api,
 )
-from .analysis import analyze_document_api
+from .analysis import (
+    analyze_document_api,
+    analyze_documents_batch_api,
+    get_analysis_job_api,
+    stream_document_analysis_api,
+)
 from .sentences import get_document_sentences
-from .corrections import get_sentence_corrections , apply_correction
+from .corrections import get_sentence_corrections , apply_correction, apply_corrections_api
 from django.http import HttpResponse
 
 urlpatterns = [
@@ -34,15 +41,21 @@ urlpatterns = [
     path("documents/", list_documents_api),
     path("documents/create/", create_document_api),
     path("documents/<int:doc_id>/", get_document_api),
+    path("documents/<int:doc_id>/snapshot/", get_document_snapshot_api),
     path("documents/<int:doc_id>/update/", update_document_api),
+    path("documents/<int:doc_id>/edit/", edit_document_api),
     path("documents/<int:doc_id>/delete/", delete_document_api),
 
     # Analysis
+    path("documents/analyze/batch/", analyze_documents_batch_api),
     path("documents/<int:doc_id>/analyze/", analyze_document_api),
+    path("documents/<int:doc_id>/analyze/stream/", stream_document_analysis_api),
+    path("jobs/<int:job_id>/", get_analysis_job_api),
 
     # Sentences + corrections
     path("documents/<int:doc_id>/sentences/", get_document_sentences),
     path("sentences/<int:sentence_id>/corrections/", get_sentence_corrections),
     path("sentences/<int:sentence_id>/apply/<int:correction_id>/",apply_correction,),
+    path("documents/<int:doc_id>/apply-corrections/", apply_corrections_api),
 
 ]
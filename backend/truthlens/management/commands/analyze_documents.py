@@ -0,0 +1,62 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from truthlens.services.analysis.batch_service import analyze_documents
+from truthlens.services.jobs.job_service import enqueue_batch_analysis, resolve_batch_documents
+
+
+class Command(BaseCommand):
+    help = "Analyze many documents in one batch, judging sentences shared between them once."
+
+    def add_arguments(self, parser):
+        parser.add_argument("document_ids", nargs="*", type=int)
+        parser.add_argument("--user", type=int, help="Analyze every document of this user.")
+        parser.add_argument("--incremental", action="store_true")
+        parser.add_argument("--workers", type=int, help="Concurrent Ollama requests.")
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Queue a batch job for run_analysis_worker instead of running here.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            document_ids = resolve_batch_documents(
+                document_ids=options["document_ids"] or None,
+                user_id=options["user"],
+            )
+        except ValidationError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options["enqueue"]:
+            job = enqueue_batch_analysis(document_ids, incremental=options["incremental"])
+            self.stdout.write(f"Queued job {job.job_id} for {len(document_ids)} documents")
+            return
+
+        def progress(snapshot: dict) -> None:
+            self.stdout.write(
+                f"\rdocuments {snapshot['documents_done']}/{snapshot['documents_total']}  "
+                f"requests {snapshot['requests_done']}/{snapshot['requests_total']}",
+                ending="",
+            )
+            self.stdout.flush()
+
+        result = analyze_documents(
+            document_ids,
+            incremental=options["incremental"],
+            max_workers=options["workers"],
+            progress=progress,
+        )
+        self.stdout.write("")
+
+        for outcome in result["documents"]:
+            line = f"document {outcome['document_id']}: {outcome['status']} ({outcome['analyzed']}/{outcome['total']})"
+            if outcome["error"]:
+                line += f" {outcome['error']}"
+            self.stdout.write(line)
+
+        self.stdout.write(
+            f"{result['sentences']} sentences, {result['cached']} cached, "
+            f"{result['unique_sentences']} judged in {result['requests_total']} requests "
+            f"({result['requests_failed']} failed)"
+        )
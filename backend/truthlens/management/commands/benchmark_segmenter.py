@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from truthlens.services.sentences.segmenter import RegexSegmenter, RuleBasedSegmenter, get_segmenter
+
+
+_SENTENCES = [
+    "Dr. Smith measured a pH of 7.4 in the sample.",
+    "The U.S. economy grew by 2.5% in 2023, e.g. in manufacturing.",
+    'She said "The results are final." Nobody objected.',
+    "See fig. 3 for the full data set, collected by J. Doe et al. in March.",
+    "Is this claim accurate?",
+    "Water boils at 100 degrees Celsius at sea level!",
+    "Prices rose sharply... Then they fell.",
+    "Mitochondria are the powerhouse of the cell.",
+]
+
+
+def _make_text(characters: int, seed: int) -> str:
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < characters:
+        sentence = rng.choice(_SENTENCES)
+        separator = "\n" if rng.random() < 0.1 else " "
+        parts.append(sentence + separator)
+        length += len(sentence) + 1
+    return "".join(parts)
+
+
+class Command(BaseCommand):
+    help = "Measure sentence segmenter throughput in characters per second."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chars", type=int, default=5_000_000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        text = _make_text(options["chars"], options["seed"])
+
+        segmenters = [
+            ("regex (legacy)", RegexSegmenter()),
+            ("rule-based", RuleBasedSegmenter()),
+            (f"configured: {type(get_segmenter()).__name__}", get_segmenter()),
+        ]
+
+        self.stdout.write(f"{len(text):,} characters")
+        for name, segmenter in segmenters:
+            best = float("inf")
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                slices = segmenter.segment(text)
+                best = min(best, time.perf_counter() - started)
+
+            self.stdout.write(
+                f"{name:>30}: {len(text) / best / 1e6:7.1f} M chars/s  {len(slices):8,d} sentences"
+            )
@@ -0,0 +1,68 @@
+import random
+import time
+from difflib import SequenceMatcher
+
+from django.core.management.base import BaseCommand
+
+from truthlens.services.sentences.alignment import align
+
+
+def _make_documents(count: int, distinct: int, edits: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = [f"Boilerplate sentence number {index} appears here." for index in range(distinct)]
+
+    old = [
+        rng.choice(vocabulary) if rng.random() < 0.5 else f"Unique claim {index} about the topic."
+        for index in range(count)
+    ]
+
+    new = list(old)
+    for edit in range(edits):
+        position = rng.randrange(len(new))
+        action = rng.random()
+        if action < 0.33:
+            new.insert(position, f"Inserted sentence {edit}.")
+        elif action < 0.66:
+            del new[position]
+        else:
+            new[position] = new[position].replace(".", ", slightly edited.")
+
+    return old, new
+
+
+def _matched(opcodes) -> int:
+    return sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal")
+
+
+class Command(BaseCommand):
+    help = "Compare sentence alignment against difflib.SequenceMatcher on large documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sentences", type=int, default=10000)
+        parser.add_argument("--distinct", type=int, default=200, help="Distinct repeated sentences.")
+        parser.add_argument("--edits", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        old, new = _make_documents(
+            options["sentences"], options["distinct"], options["edits"], options["seed"]
+        )
+
+        implementations = [
+            ("SequenceMatcher", lambda: SequenceMatcher(None, old, new).get_opcodes()),
+            ("patience/fingerprint", lambda: align(old, new)),
+        ]
+
+        self.stdout.write(f"{len(old)} -> {len(new)} sentences, {options['edits']} edits")
+        for name, run in implementations:
+            best = float("inf")
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                opcodes = run()
+                best = min(best, time.perf_counter() - started)
+
+            self.stdout.write(
+                f"{name:>22}: {best * 1000:9.1f} ms  "
+                f"{_matched(opcodes):6d} sentences kept, {len(opcodes)} opcodes"
+            )
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from truthlens.ai import metrics
+from truthlens.services.analysis.warmup import warm_up
+from truthlens.services.jobs.job_service import (
+    claim_next_job,
+    requeue_stale_jobs,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = "Process queued analysis jobs. Start more processes to add throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "ANALYSIS_WORKER_POLL_SECONDS", 1.0),
+            help="Seconds to sleep when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            "--no-warmup",
+            action="store_true",
+            help="Skip loading the model before claiming jobs (see OLLAMA_WARMUP).",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=getattr(settings, "ANALYSIS_WORKER_METRICS_PORT", None),
+            help="Serve this worker's Prometheus metrics on the given port.",
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=getattr(settings, "ANALYSIS_JOB_STALE_SECONDS", 600))
+        max_attempts = getattr(settings, "ANALYSIS_JOB_MAX_ATTEMPTS", 3)
+        requeue_every = getattr(settings, "ANALYSIS_JOB_REQUEUE_SECONDS", 60)
+
+        if options["metrics_port"]:
+            metrics.serve(options["metrics_port"])
+            self.stdout.write(f"Serving metrics on port {options['metrics_port']}")
+
+        if getattr(settings, "OLLAMA_WARMUP", True) and not options["no_warmup"]:
+            warm_up()
+
+        next_requeue = 0.0
+        while True:
+            # Every worker sweeps, so jobs of a crashed worker are picked up without a restart.
+            if time.monotonic() >= next_requeue:
+                requeued = requeue_stale_jobs(older_than=stale_after, max_attempts=max_attempts)
+                if requeued:
+                    self.stdout.write(f"Recovered {requeued} stale job(s)")
+                next_requeue = time.monotonic() + requeue_every
+
+            job = claim_next_job()
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            job = run_job(job)
+            target = f"{len(job.document_ids)} documents" if job.is_batch else f"document {job.document_id_id}"
+            self.stdout.write(f"Job {job.job_id} ({target}): {job.status}")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from truthlens.ai.ollama_client import DEFAULT_MODEL
+from truthlens.services.analysis.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = "Load the Ollama model and prefill the analysis system prompts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=DEFAULT_MODEL)
+
+    def handle(self, *args, **options):
+        timings = warm_up(options["model"])
+        if not timings:
+            self.stderr.write("Warmup failed; see the log for details.")
+            return
+
+        for url, backend_timings in timings.items():
+            self.stdout.write(f"{url}: model load {backend_timings[0].load:.2f}s")
+            for timing in backend_timings[1:]:
+                self.stdout.write(f"  system prompt: {timing.prefill_tokens} tokens prefilled in {timing.prefill:.2f}s")
@@ -0,0 +1,201 @@
+"""Per-request SQL accounting, query budgets and optional profiling.
+
+``QueryProfilingMiddleware`` counts and times every query a request runs.
+
+* Views listed in ``QUERY_BUDGETS`` (view function name -> max queries)
+  are checked on every request: going over is logged as a warning, or
+  raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT`` is on (tests).
+* With ``QUERY_PROFILING`` on, or an ``X-Profile`` request header when
+  ``QUERY_PROFILING_HEADER`` allows it, the request is also logged with its
+  query count and time, statements repeated ``QUERY_DUPLICATE_THRESHOLD``
+  times or more (the signature of a per-row query loop), and
+  ``X-Query-Count`` / ``X-Query-Time-Ms`` / ``Server-Timing`` headers.
+  ``X-Profile: cprofile`` (or ``pyinstrument``, when installed) also
+  profiles the view; stats are logged and, with ``QUERY_PROFILING_DIR``
+  set, written there.
+
+Savepoint statements are not counted: they only appear when a view runs
+inside an outer transaction (as every test does), so budgets hold the same
+in tests and in production. Streaming responses are measured up to the
+moment the response is returned, not while the body is generated.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_MODES = ("sql", "cprofile", "pyinstrument")
+
+# "IN (%s, %s, %s)" and "VALUES (%s, %s), (%s, %s)" differ only in batch size.
+_PLACEHOLDER_RUN = re.compile(r"%s(?:\s*,\s*%s)+")
+_ROW_RUN = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SAVEPOINT = re.compile(r"\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request or block ran more queries than its budget allows."""
+
+
+def statement_shape(sql: str) -> str:
+    """The statement with batch sizes collapsed, so repeats of one query loop compare equal."""
+    return _ROW_RUN.sub("(...)", _PLACEHOLDER_RUN.sub("...", sql))
+
+
+class QueryRecorder:
+    """Records the statements run through every database connection while active."""
+
+    def __init__(self):
+        self.queries: list[tuple[str, float]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if _SAVEPOINT.match(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statement shapes run at least ``threshold`` times, most repeated first."""
+        shapes = Counter(statement_shape(sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+def check_budget(label: str, recorder: QueryRecorder, budget: int) -> None:
+    """Warn (or raise, with ``QUERY_BUDGET_STRICT``) when ``recorder`` went over ``budget``."""
+    if recorder.count <= budget:
+        return
+
+    message = f"{label} ran {recorder.count} queries (budget {budget})"
+    repeated = recorder.repeated(2)
+    if repeated:
+        shape, count = repeated[0]
+        message += f"; most repeated ({count}x): {shape}"
+    if getattr(settings, "QUERY_BUDGET_STRICT", False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def query_budget(budget: int, label: str = "block"):
+    """Hold a block of code (a service call, say) to a query budget."""
+    recorder = QueryRecorder()
+    with recorder.record():
+        yield recorder
+    check_budget(label, recorder, budget)
+
+
+def _view_name(request) -> str | None:
+    """The view function's name; DRF's ``@api_view`` wrappers are all called ``view``."""
+    match = getattr(request, "resolver_match", None)
+    return match.view_name.rsplit(".", 1)[-1] if match is not None else None
+
+
+class QueryProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _mode(self, request) -> str | None:
+        requested = request.META.get(PROFILE_HEADER, "").strip().lower()
+        if requested and getattr(settings, "QUERY_PROFILING_HEADER", settings.DEBUG):
+            return requested if requested in PROFILE_MODES else "sql"
+        return "sql" if getattr(settings, "QUERY_PROFILING", False) else None
+
+    def __call__(self, request):
+        mode = self._mode(request)
+        recorder = QueryRecorder()
+        with recorder.record():
+            if mode in ("cprofile", "pyinstrument"):
+                response = self._profile(request, mode)
+            else:
+                response = self.get_response(request)
+
+        view = _view_name(request)
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(view)
+        if budget is not None:
+            check_budget(f"{request.method} {request.path} ({view})", recorder, budget)
+
+        if mode is not None:
+            self._report(request, response, view, recorder)
+        return response
+
+    def _report(self, request, response, view, recorder: QueryRecorder) -> None:
+        milliseconds = recorder.seconds * 1000
+        response["X-Query-Count"] = str(recorder.count)
+        response["X-Query-Time-Ms"] = f"{milliseconds:.1f}"
+        response["Server-Timing"] = f'db;dur={milliseconds:.1f};desc="{recorder.count} queries"'
+
+        logger.info(
+            "%s %s (%s): %d queries in %.1f ms",
+            request.method, request.path, view, recorder.count, milliseconds,
+        )
+        for shape, count in recorder.repeated(getattr(settings, "QUERY_DUPLICATE_THRESHOLD", 3)):
+            logger.warning("%s %s ran this %d times: %s", request.method, request.path, count, shape)
+
+    def _profile(self, request, mode: str):
+        if mode == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logger.info("pyinstrument is not installed; profiling with cProfile")
+            else:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    return self.get_response(request)
+                finally:
+                    profiler.stop()
+                    logger.info("Profile of %s %s:\n%s", request.method, request.path, profiler.output_text())
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return self.get_response(request)
+        finally:
+            profiler.disable()
+            self._save_profile(request, profiler)
+
+    @staticmethod
+    def _save_profile(request, profiler: cProfile.Profile) -> None:
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out).sort_stats("cumulative")
+        stats.print_stats(getattr(settings, "QUERY_PROFILING_TOP", 30))
+        logger.info("Profile of %s %s:\n%s", request.method, request.path, out.getvalue())
+
+        directory = getattr(settings, "QUERY_PROFILING_DIR", None)
+        if directory:
+            name = re.sub(r"[^\w]+", "-", request.path).strip("-") or "root"
+            path = os.path.join(directory, f"{name}-{time.time_ns()}.prof")
+            stats.dump_stats(path)
+            logger.info("Profile written to %s", path)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('truthlens', '0002_alter_correction_sentence_id_alter_document_user_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerdictCacheEntry',
+            fields=[
+                ('entry_id', models.AutoField(primary_key=True, serialize=False)),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('sentence', models.TextField()),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('label', models.CharField(max_length=20)),
+                ('confidence', models.FloatField()),
+                ('suggested_correction', models.TextField(blank=True)),
+                ('reasoning', models.TextField(blank=True)),
+                ('sources', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('truthlens', '0003_verdictcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentence',
+            name='analyzed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
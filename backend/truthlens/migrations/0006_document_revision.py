@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('truthlens', '0005_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='sentences_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:59
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('truthlens', '0006_document_revision'),
+    ]
+
+    # Composite indexes first, so the plain foreign key indexes they
+    # supersede are only dropped once a covering index exists.
+    operations = [
+        AddIndexConcurrently(
+            model_name='correction',
+            index=models.Index(fields=['sentence_id', '-created_at'], name='correction_sentence_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sentence',
+            index=models.Index(fields=['document_id', 'start_index', 'sentence_id'], name='sentence_doc_position_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='sentence',
+            index=models.Index(condition=models.Q(('flags', True)), fields=['document_id', 'start_index'], name='sentence_flagged_idx'),
+        ),
+        migrations.AlterField(
+            model_name='correction',
+            name='sentence_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='truthlens.sentence'),
+        ),
+        migrations.AlterField(
+            model_name='sentence',
+            name='document_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='truthlens.document'),
+        ),
+    ]
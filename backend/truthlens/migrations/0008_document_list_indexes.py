@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:00
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('truthlens', '0007_sentence_correction_indexes'),
+    ]
+
+    # Build the composite index before dropping the user_id index it supersedes.
+    operations = [
+        AddIndexConcurrently(
+            model_name='document',
+            index=models.Index(fields=['user_id', '-created_at', '-document_id'], name='document_user_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='document',
+            index=models.Index(fields=['-created_at', '-document_id'], name='document_recent_idx'),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='user_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='truthlens.user'),
+        ),
+    ]
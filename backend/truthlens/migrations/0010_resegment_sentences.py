@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def mark_unsynced(apps, schema_editor):
+    # Sentences were split with the old regex; re-segment each document lazily on its next read.
+    Document = apps.get_model("truthlens", "Document")
+    Document.objects.update(sentences_revision=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('truthlens', '0009_analysisjob_batch'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_unsynced, migrations.RunPython.noop),
+    ]
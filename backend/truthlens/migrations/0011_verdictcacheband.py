@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('truthlens', '0010_resegment_sentences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerdictCacheBand',
+            fields=[
+                ('band_id', models.AutoField(primary_key=True, serialize=False)),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('entry_id', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='truthlens.verdictcacheentry')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entry_id', 'key'), name='verdict_band_unique')],
+            },
+        ),
+    ]
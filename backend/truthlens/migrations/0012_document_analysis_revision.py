@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('truthlens', '0011_verdictcacheband'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='analysis_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
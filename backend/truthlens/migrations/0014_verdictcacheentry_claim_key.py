@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('truthlens', '0013_analysisjob_heartbeat_at'),
+    ]
+
+    # Entries cached before this have an empty claim_key: they still serve
+    # exact hits and pick up a key when next written or expire with the TTL.
+    operations = [
+        migrations.DeleteModel(
+            name='VerdictCacheBand',
+        ),
+        migrations.AddField(
+            model_name='verdictcacheentry',
+            name='claim_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        AddIndexConcurrently(
+            model_name='verdictcacheentry',
+            index=models.Index(fields=['claim_key'], name='verdict_cache_claim_idx'),
+        ),
+    ]
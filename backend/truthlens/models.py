@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 class User(models.Model):
@@ -18,31 +19,124 @@ class Document(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    user_id = models.ForeignKey(User, on_delete=models.CASCADE)
+    user_id = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    revision = models.PositiveIntegerField(default=1)
+    sentences_revision = models.PositiveIntegerField(default=0)
+    # Bumped whenever verdicts or corrections change; part of the snapshot ETag.
+    analysis_revision = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "-created_at", "-document_id"], name="document_user_recent_idx"),
+            models.Index(fields=["-created_at", "-document_id"], name="document_recent_idx"),
+        ]
 
     def __str__(self):
         return self.title
     
 class Sentence(models.Model):
     sentence_id = models.AutoField(primary_key=True)
-    document_id = models.ForeignKey(Document, on_delete=models.CASCADE)
+    document_id = models.ForeignKey(Document, on_delete=models.CASCADE, db_index=False)
     content = models.TextField()
     start_index = models.IntegerField()
     end_index = models.IntegerField()
     flags = models.BooleanField(default=False)
     confidence_scores = models.IntegerField()
+    analyzed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["document_id", "start_index", "sentence_id"], name="sentence_doc_position_idx"),
+            models.Index(
+                fields=["document_id", "start_index"],
+                name="sentence_flagged_idx",
+                condition=models.Q(flags=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Sentence {self.sentence_id} in Document {self.document_id}"
 
 class Correction(models.Model):
     correction_id = models.AutoField(primary_key=True)
-    sentence_id = models.ForeignKey(Sentence, on_delete=models.CASCADE)
+    sentence_id = models.ForeignKey(Sentence, on_delete=models.CASCADE, db_index=False)
     suggested_correction = models.TextField()
     reasoning = models.TextField()
     sources = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["sentence_id", "-created_at"], name="correction_sentence_recent_idx"),
+        ]
+
+    def __str__(self):
+        return f"Correction {self.correction_id} for Sentence {self.sentence_id}"
+
+class VerdictCacheEntry(models.Model):
+    entry_id = models.AutoField(primary_key=True)
+    cache_key = models.CharField(max_length=64, unique=True)
+    # Same digest over the sentence's content words only (similarity.claim_text).
+    claim_key = models.CharField(max_length=64, blank=True, default="")
+    sentence = models.TextField()
+    model = models.CharField(max_length=100)
+    prompt_version = models.CharField(max_length=20)
+    label = models.CharField(max_length=20)
+    confidence = models.FloatField()
+    suggested_correction = models.TextField(blank=True)
+    reasoning = models.TextField(blank=True)
+    sources = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["claim_key"], name="verdict_cache_claim_idx"),
+        ]
+
+    def __str__(self):
+        return f"Verdict {self.cache_key[:12]} ({self.model})"
+
+
+class AnalysisJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    job_id = models.AutoField(primary_key=True)
+    # Single-document jobs set document_id; batch jobs set document_ids instead.
+    document_id = models.ForeignKey(Document, on_delete=models.CASCADE, null=True, blank=True)
+    document_ids = models.JSONField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    progress = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a stale one means the worker died.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    @property
+    def is_batch(self) -> bool:
+        return self.document_ids is not None
+
     def __str__(self):
-        return f"Correction {self.correction_id} for Sentence {self.sentence_id}"
\ No newline at end of file
+        if self.is_batch:
+            return f"AnalysisJob {self.job_id} for {len(self.document_ids)} documents ({self.status})"
+        return f"AnalysisJob {self.job_id} for Document {self.document_id} ({self.status})"
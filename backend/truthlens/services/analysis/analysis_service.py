@@ -1,9 +1,31 @@
-import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from truthlens.models import Document
-from truthlens.ai.ollama_client import ask_ollama
+from truthlens.ai import metrics
+from truthlens.ai.json_stream import (
+    SentenceStreamParser,
+    extract_sentence_items,
+    validate_sentence_item,
+)
+from truthlens.ai.ollama_client import backend_capacity, chat_ollama, stream_ollama, DEFAULT_MODEL
+from truthlens.ai.screener import SKIP, SMALL, ClaimScreener, TierStats
+from truthlens.services.analysis.chunking import estimate_tokens, pack_windows
+from truthlens.services.analysis.item_matching import ItemMatcher, split_number_prefix
 from truthlens.services.analysis.persist_results import save_analysis_results
+from truthlens.services.analysis.verdict_cache import Verdict, VerdictCache, normalize_sentence
+from truthlens.services.sentences.sentence_service import get_current_sentences
+
+
+# Bump whenever ANALYSIS_SYSTEM_PROMPT changes so cached verdicts are not reused.
+ANALYSIS_PROMPT_VERSION = "2"
+
+logger = logging.getLogger(__name__)
 
 
 ANALYSIS_SYSTEM_PROMPT = """
@@ -14,6 +36,7 @@ You MUST return *only* a JSON object shaped like this:
 {
   "sentences": [
     {
+      "id": 1,
       "sentence": "...",
       "label": "true" | "false" | "uncertain",
       "confidence": 0.0,
@@ -29,47 +52,553 @@ Rules:
 - DO NOT add explanations.
 - DO NOT add any text before or after the JSON.
 - Reply ONLY with valid JSON.
+- Each sentence to analyze is prefixed with its number, like [1]. Put that
+  number in "id" and copy the sentence without the prefix into "sentence".
 """
 
 
-def analyze_document(document_id: int) -> dict:
+def _build_prompt(sentences: list[str], context: list[str] | None = None) -> str:
+    """The user message; ``ANALYSIS_SYSTEM_PROMPT`` goes separately as the system message."""
+    prompt = ""
+
+    if context:
+        prompt += (
+            "Surrounding context (for reference only, do NOT include it in the output):\n"
+            + "\n".join(context)
+            + "\n\n"
+        )
+
+    return (
+        prompt
+        + "Text to analyze:\n"
+        + "\n".join(f"[{number}] {sentence}" for number, sentence in enumerate(sentences, start=1))
+        + "\n\nReturn ONLY valid JSON."
+    )
+
+
+# The system prompt and the fixed parts of the user message, sent with every window.
+_PROMPT_TOKENS = estimate_tokens(ANALYSIS_SYSTEM_PROMPT) + estimate_tokens(_build_prompt([], [""]))
+
+
+def _window_context(sentences, members: list[int], carried: list[int]) -> list[str]:
+    """Neighbours of the window's sentences plus the overlap carried from the previous window."""
+    member_set = set(members)
+    context_indices = set(carried)
+    for index in members:
+        for neighbour in (index - 1, index + 1):
+            if 0 <= neighbour < len(sentences):
+                context_indices.add(neighbour)
+
+    return [sentences[index].content for index in sorted(context_indices - member_set)]
+
+
+def _attach_sentence_ids(items: list[dict], sentence_ids: list[int] | None) -> list[dict]:
+    """Turn the prompt numbers echoed as ``id`` (or left on the sentence) into the rows' ``sentence_id``."""
+    for item in items:
+        prefix, item["sentence"] = split_number_prefix(item["sentence"])
+        number = item.pop("id", None)
+        if number is None:
+            number = prefix
+        if sentence_ids and number is not None and 1 <= number <= len(sentence_ids):
+            item["sentence_id"] = sentence_ids[number - 1]
+    return items
+
+
+def _request_analysis(
+    sentences: list[str],
+    context: list[str] | None = None,
+    sentence_ids: list[int] | None = None,
+    model: str = DEFAULT_MODEL,
+    usage: metrics.LLMUsage | None = None,
+) -> dict:
+    """Ask the model to judge the given sentences.
+
+    Returns every valid sentence item that could be recovered, even from a
+    fenced or truncated reply; only a reply with nothing usable raises.
+    Items carry the ``sentence_id`` of their row when ``sentence_ids`` is
+    given and the model echoed the sentence's number. The call and how its
+    reply parsed are added to ``usage``.
     """
-    SYNC VERSION — correct for our Ollama client.
+
+    usage = usage or metrics.LLMUsage()
+    prompt = _build_prompt(sentences, context)
+
+    # SYNC call — correct for our Ollama client
+    started = time.perf_counter()
+    try:
+        reply = chat_ollama(prompt, model, system=ANALYSIS_SYSTEM_PROMPT)
+    except ValidationError:
+        usage.record_failure(time.perf_counter() - started)
+        raise
+    usage.record_call(reply)
+    ai_output = reply.text
+    logger.debug("Analysis window of %d sentence(s) on %s: %s", len(sentences), model, reply.timings)
+
+    extraction = extract_sentence_items(ai_output)
+
+    if not extraction.items and not extraction.complete:
+        _record_parse(usage, "failed")
+        logger.warning("Unparseable AI reply from %s: %s", model, ai_output)
+        raise ValidationError(f"AI returned invalid JSON: {ai_output}")
+
+    _record_parse(usage, "partial" if extraction.partial else "ok")
+    if extraction.partial:
+        logger.warning(
+            "Recovered %d sentence(s) from a partial AI reply (%s)",
+            len(extraction.items),
+            "; ".join(extraction.errors) or "truncated output",
+        )
+
+    return {
+        "sentences": _attach_sentence_ids(extraction.items, sentence_ids),
+        "timings": reply.timings.as_dict(),
+    }
+
+
+def _record_parse(usage: metrics.LLMUsage, outcome: str) -> None:
+    usage.record_parse(outcome)
+    metrics.observe_parse(outcome)
+
+
+def _windows(sentences, pending_indices: list[int]) -> list[tuple[list[int], list[int]]]:
+    """Pack pending sentences into windows; return (member indices, carried overlap indices) per window."""
+    def context_tokens(window) -> int:
+        members = pending_indices[window.start:window.end]
+        carried = pending_indices[window.context_start:window.start]
+        return sum(estimate_tokens(text) for text in _window_context(sentences, members, carried))
+
+    windows = pack_windows(
+        [sentences[index].content for index in pending_indices],
+        token_budget=getattr(settings, "ANALYSIS_CHUNK_TOKENS", 1500),
+        overlap=getattr(settings, "ANALYSIS_CHUNK_OVERLAP", 2),
+        reserved_tokens=_PROMPT_TOKENS,
+        context_tokens=context_tokens,
+    )
+    return [
+        (pending_indices[window.start:window.end], pending_indices[window.context_start:window.start])
+        for window in windows
+    ]
+
+
+def _window_request(
+    sentences,
+    members: list[int],
+    carried: list[int],
+    model: str = DEFAULT_MODEL,
+) -> tuple[list[str], list[str], list[int], str]:
+    """Arguments of ``_request_analysis`` for one window: (sentences, context, sentence ids, model)."""
+    return (
+        [sentences[index].content for index in members],
+        _window_context(sentences, members, carried),
+        [sentences[index].sentence_id for index in members],
+        model,
+    )
+
+
+def _window_requests(
+    sentences,
+    pending_indices: list[int],
+    model: str = DEFAULT_MODEL,
+) -> list[tuple[list[str], list[str], list[int], str]]:
+    """Pack pending sentences into windows; return (sentences, context, sentence ids, model) per window."""
+    return [
+        _window_request(sentences, members, carried, model)
+        for members, carried in _windows(sentences, pending_indices)
+    ]
+
+
+def _judge_window(
+    sentences,
+    members: list[int],
+    carried: list[int] = (),
+    model: str = DEFAULT_MODEL,
+    usage: metrics.LLMUsage | None = None,
+    *,
+    splits: int | None = None,
+    retry_missing: bool = True,
+) -> list[dict]:
+    """Analyze one window, recovering from replies that drop or garble entries.
+
+    A reply with nothing usable is retried as two halves, at most
+    ``ANALYSIS_WINDOW_SPLITS`` levels deep. Sentences a reply left out are
+    asked again once, on their own. Raises only when nothing in the window
+    could be judged.
+    """
+    if splits is None:
+        splits = getattr(settings, "ANALYSIS_WINDOW_SPLITS", 2)
+
+    try:
+        items = _request_analysis(*_window_request(sentences, members, list(carried), model), usage=usage)["sentences"]
+    except ValidationError:
+        if len(members) == 1 or splits <= 0:
+            raise
+        logger.info("Splitting a failed analysis window of %d sentence(s)", len(members))
+        middle = len(members) // 2
+        items, error = [], None
+        for half in (members[:middle], members[middle:]):
+            try:
+                items.extend(
+                    _judge_window(sentences, half, (), model, usage, splits=splits - 1, retry_missing=retry_missing)
+                )
+            except ValidationError as exc:
+                logger.warning("Analysis of %d sentence(s) failed after splitting: %s", len(half), exc)
+                error = exc
+        if not items and error is not None:
+            raise error
+        return items
+
+    if retry_missing:
+        matcher = ItemMatcher([sentences[index] for index in members])
+        answered = {row.sentence_id for item in items for row in matcher.match(item)}
+        missing = [index for index in members if sentences[index].sentence_id not in answered]
+        if missing:
+            logger.info("Asking again for %d sentence(s) missing from the reply", len(missing))
+            try:
+                items.extend(_judge_window(sentences, missing, (), model, usage, splits=splits, retry_missing=False))
+            except ValidationError as exc:
+                logger.warning("Retry of %d missing sentence(s) failed: %s", len(missing), exc)
+    return items
+
+
+def _analyze_in_windows(
+    sentences,
+    pending_indices: list[int],
+    model: str = DEFAULT_MODEL,
+    usage: metrics.LLMUsage | None = None,
+) -> list[dict]:
+    """Analyze the pending sentences in token-budgeted windows, concurrently.
+
+    Each window is judged by ``_judge_window``, which splits failed windows
+    and re-asks for sentences a reply left out. Windows that still fail are
+    logged and skipped so the other windows' verdicts are still persisted.
     """
+    windows = _windows(sentences, pending_indices)
+
+    def run(window):
+        members, carried = window
+        return _judge_window(sentences, members, carried, model, usage)
+
+    def run_safely(window):
+        try:
+            return run(window)
+        except ValidationError as exc:
+            logger.warning("Analysis window starting %r failed: %s", sentences[window[0][0]].content, exc)
+            return None
+
+    if len(windows) == 1:
+        results = [run(windows[0])]
+    else:
+        # More threads than backend slots would only queue for a lease.
+        max_workers = min(getattr(settings, "ANALYSIS_MAX_WORKERS", 4), len(windows), backend_capacity())
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(run_safely, windows))
+
+        if all(result is None for result in results):
+            raise ValidationError("AI analysis failed for every chunk of the document.")
+
+    # Merge in window order; the first verdict for a sentence wins.
+    merged = []
+    seen = set()
+    for result in results:
+        for item in result or []:
+            key = item.get("sentence_id") or normalize_sentence(str(item.get("sentence", "")))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+
+    return merged
+
+
+def _route_pending(plan, screener: ClaimScreener, tiers: TierStats) -> tuple[list[dict], list[int], list[int]]:
+    """Screen the pending sentences: verdicts for skipped ones, then small- and large-tier indices."""
+    skipped, small, large = [], [], []
+    for index in plan.pending.values():
+        sentence = plan.sentences[index]
+        tier = screener.screen(sentence.content).tier
+        tiers.counts["screened"] += 1
+        tiers.counts[tier] += 1
+        if tier == SKIP:
+            skipped.append(screener.skip_item(sentence))
+        elif tier == SMALL:
+            small.append(index)
+        else:
+            large.append(index)
+    return skipped, small, large
+
+
+def _keep_confident(
+    sentences,
+    indices: list[int],
+    items: list[dict],
+    screener: ClaimScreener,
+    tiers: TierStats,
+) -> tuple[list[dict], list[int]]:
+    """Small-model verdicts worth keeping, and the indices to escalate to the large model."""
+    matcher = ItemMatcher([sentences[index] for index in indices])
+    kept, answered = [], set()
+    for item in items:
+        rows = matcher.match(item)
+        if rows and screener.accepts(item):
+            kept.append({**item, "sentence_id": rows[0].sentence_id})
+            answered.update(row.sentence_id for row in rows)
+
+    escalate = [index for index in indices if sentences[index].sentence_id not in answered]
+    tiers.counts["small_accepted"] += len(indices) - len(escalate)
+    tiers.counts["escalated"] += len(escalate)
+    return kept, escalate
+
+
+@dataclass
+class _AnalysisPlan:
+    """What an analysis run has to do after syncing and consulting the cache."""
+
+    document: Document
+    sentences: list
+    targets: list[int]
+    cache: VerdictCache
+    cached_items: list[dict]
+    pending: dict[str, int]
 
+    @property
+    def target_sentences(self) -> list:
+        return [self.sentences[index] for index in self.targets]
+
+    def remember(self, fresh: list[dict]) -> None:
+        """Cache model verdicts for the sentences this run asked about."""
+        asked = {self.sentences[index].sentence_id: normalized for normalized, index in self.pending.items()}
+        new_verdicts = {}
+        for item in fresh:
+            # Key by the stored text rather than the model's echo of it.
+            normalized = asked.get(item.get("sentence_id")) or normalize_sentence(str(item.get("sentence", "")))
+            verdict = Verdict.from_item(item)
+            if normalized in self.pending and verdict is not None:
+                new_verdicts[normalized] = verdict
+        self.cache.put_many(new_verdicts)
+
+
+def _plan_analysis(document_id: int, incremental: bool) -> _AnalysisPlan:
     try:
         document = Document.objects.get(document_id=document_id)
     except Document.DoesNotExist:
         raise ValidationError("Document not found.")
 
-    prompt = (
-        ANALYSIS_SYSTEM_PROMPT
-        + "\n\nText to analyze:\n"
-        + document.content
-        + "\n\nReturn ONLY valid JSON."
+    sentences = get_current_sentences(document)
+
+    if incremental:
+        targets = [index for index, sentence in enumerate(sentences) if sentence.analyzed_at is None]
+    else:
+        targets = list(range(len(sentences)))
+
+    cache = VerdictCache(model=DEFAULT_MODEL, prompt_version=ANALYSIS_PROMPT_VERSION)
+    cached = cache.get_many(sentences[index].content for index in targets)
+
+    cached_items = []
+    pending: dict[str, int] = {}
+    answered = set()
+    for index in targets:
+        sentence = sentences[index]
+        normalized = normalize_sentence(sentence.content)
+        verdict = cached.get(normalized)
+        if verdict is not None:
+            if normalized not in answered:
+                answered.add(normalized)
+                cached_items.append({**verdict.as_item(sentence.content), "sentence_id": sentence.sentence_id})
+        else:
+            pending.setdefault(normalized, index)
+
+    return _AnalysisPlan(
+        document=document,
+        sentences=sentences,
+        targets=targets,
+        cache=cache,
+        cached_items=cached_items,
+        pending=pending,
     )
 
-    # SYNC call — correct for our Ollama client
-    ai_output = ask_ollama(prompt)
 
-    print("\n\n===== RAW OLLAMA OUTPUT =====")
-    print(ai_output)
-    print("===== END RAW OUTPUT =====\n\n")
+def analyze_document(document_id: int, *, incremental: bool = False) -> dict:
+    """
+    SYNC VERSION — correct for our Ollama client.
 
-    try:
-        analysis_json = json.loads(ai_output)
-    except Exception:
-        import re
-        match = re.search(r"\{.*\}", ai_output, re.DOTALL)
-        if not match:
-            raise ValidationError(f"AI returned invalid JSON: {ai_output}")
+    Sentences with a cached verdict for the current model and prompt version
+    are answered from the cache. The rest are screened (``ai/screener.py``):
+    sentences without a checkable claim are answered locally, plain ones go
+    to the small model when one is configured, and the others (plus any
+    small-model verdict that is not confident enough) go to the large model,
+    split into windows that are analyzed concurrently.
 
-        try:
-            analysis_json = json.loads(match.group())
-        except Exception as exc:
-            raise ValidationError(f"AI returned invalid JSON: {exc}")
+    With ``incremental=True`` only sentences that the last sync inserted or
+    rewrote (``analyzed_at`` is empty) are analyzed; everything else keeps
+    its current flags and corrections.
+    """
+
+    plan = _plan_analysis(document_id, incremental)
+
+    items = list(plan.cached_items)
+    tiers = TierStats()
+    usage = metrics.LLMUsage()
+    usage.record_cache(len(plan.cached_items), len(plan.pending))
+    if plan.pending:
+        screener = ClaimScreener.from_settings()
+        skipped, small, large = _route_pending(plan, screener, tiers)
+        items.extend(skipped)
+
+        fresh = []
+        if small:
+            try:
+                small_items = _analyze_in_windows(plan.sentences, small, screener.small_model, usage)
+            except ValidationError as exc:
+                logger.warning("Small-model analysis failed, escalating: %s", exc)
+                small_items = []
+            kept, escalate = _keep_confident(plan.sentences, small, small_items, screener, tiers)
+            # Small-model verdicts are used for this run only; the cache holds OLLAMA_MODEL verdicts.
+            items.extend(kept)
+            large = sorted(large + escalate)
+        if large:
+            fresh.extend(_analyze_in_windows(plan.sentences, large, usage=usage))
+
+        items.extend(fresh)
+        plan.remember(fresh)
+
+    analysis_json = {"sentences": items, "tiers": tiers.report(), "usage": usage.report()}
+    if plan.pending:
+        logger.info("Document %s model tiers: %s", document_id, analysis_json["tiers"])
+    logger.info("Document %s model usage: %s", document_id, analysis_json["usage"])
+
+    analysis_json["matching"] = save_analysis_results(
+        plan.document, analysis_json, sentences=plan.target_sentences
+    )
+
+    return analysis_json
+
+
+def _stream_payload(sentence, item: dict) -> dict:
+    """The verdict as it will be stored (see ``persist_results``), for display before the save."""
+    return {
+        "sentence_id": sentence.sentence_id,
+        "content": sentence.content,
+        "start_index": sentence.start_index,
+        "end_index": sentence.end_index,
+        "flags": item.get("label") == "false",
+        "confidence": int(float(item.get("confidence", 0)) * 100),
+        "label": item.get("label"),
+        "suggested_correction": item.get("suggested_correction", ""),
+        "reasoning": item.get("reasoning", ""),
+        "sources": item.get("sources", []),
+    }
+
+
+def stream_document_analysis(document_id: int, *, incremental: bool = False):
+    """
+    Run the analysis with a streamed model reply.
+
+    Syncing and cache lookups happen immediately (so a missing document
+    raises here); the returned generator yields ``(event, payload)`` pairs.
+    Each sentence is yielded as soon as its object is complete in the
+    stream, so the first flag arrives long before the last. Nothing is
+    written until the last window is done: the verdicts are then saved in
+    one transaction by ``save_analysis_results``, so a client that
+    disconnects midway leaves the previous flags and corrections untouched.
+    """
+
+    plan = _plan_analysis(document_id, incremental)
+    target_sentences = plan.target_sentences
+    matcher = ItemMatcher(target_sentences)
+    tiers = TierStats()
+    usage = metrics.LLMUsage()
+    usage.record_cache(len(plan.cached_items), len(plan.pending))
+
+    def events():
+        items = []
+
+        def persist(item: dict) -> list:
+            """Keep the item for the final save; return the rows it will apply to."""
+            items.append(item)
+            return matcher.match(item)
+
+        for item in plan.cached_items:
+            for sentence_obj in persist(item):
+                yield "sentence", _stream_payload(sentence_obj, item)
+
+        fresh = []
+        if plan.pending:
+            screener = ClaimScreener.from_settings()
+            skipped, small, large = _route_pending(plan, screener, tiers)
+            for item in skipped:
+                for sentence_obj in persist(item):
+                    yield "sentence", _stream_payload(sentence_obj, item)
+
+            if small:
+                # Small-model replies are short; they are judged whole before anything is kept.
+                small_items = []
+                for request in _window_requests(plan.sentences, small, screener.small_model):
+                    try:
+                        small_items.extend(_request_analysis(*request, usage=usage)["sentences"])
+                    except ValidationError as exc:
+                        logger.warning("Small-model window failed, escalating: %s", exc)
+                kept, escalate = _keep_confident(plan.sentences, small, small_items, screener, tiers)
+                # Not cached: the cache holds OLLAMA_MODEL verdicts only.
+                for item in kept:
+                    for sentence_obj in persist(item):
+                        yield "sentence", _stream_payload(sentence_obj, item)
+                large = sorted(large + escalate)
+
+            for members, carried in _windows(plan.sentences, large):
+                window_sentences, context, sentence_ids, model = _window_request(plan.sentences, members, carried)
+                parser = SentenceStreamParser()
+                answered = set()
+                started = time.perf_counter()
+                outcome = "ok"
+                try:
+                    for fragment in stream_ollama(
+                        _build_prompt(window_sentences, context),
+                        model,
+                        system=ANALYSIS_SYSTEM_PROMPT,
+                        on_result=usage.record_call,
+                    ):
+                        for raw_item in parser.feed(fragment):
+                            item, error = validate_sentence_item(raw_item)
+                            if item is None:
+                                logger.warning("Skipping streamed item: %s", error)
+                                outcome = "partial"
+                                continue
+                            _attach_sentence_ids([item], sentence_ids)
+                            fresh.append(item)
+                            for sentence_obj in persist(item):
+                                answered.add(sentence_obj.sentence_id)
+                                yield "sentence", _stream_payload(sentence_obj, item)
+                except ValidationError as exc:
+                    logger.warning("Streamed analysis window failed: %s", exc)
+                    usage.record_failure(time.perf_counter() - started)
+                    outcome = "failed"
+                _record_parse(usage, outcome)
+
+                # Sentences the stream left out (or all of them, if it failed) are asked again.
+                missing = [index for index in members if plan.sentences[index].sentence_id not in answered]
+                if not missing:
+                    continue
+                try:
+                    retried = _judge_window(plan.sentences, missing, (), model, usage, retry_missing=False)
+                except ValidationError as exc:
+                    yield "error", {"error": str(exc)}
+                    continue
+                for item in retried:
+                    fresh.append(item)
+                    for sentence_obj in persist(item):
+                        yield "sentence", _stream_payload(sentence_obj, item)
 
+        plan.remember(fresh)
+        matching = save_analysis_results(plan.document, {"sentences": items}, sentences=target_sentences)
+        logger.info("Document %s model usage: %s", plan.document.document_id, usage.report())
 
-    save_analysis_results(document, analysis_json)
+        yield "done", {
+            "document_id": plan.document.document_id,
+            "analyzed": sum(1 for sentence in target_sentences if sentence.analyzed_at is not None),
+            "total": len(target_sentences),
+            "match_rate": matching["match_rate"],
+            "tiers": tiers.report(),
+            "usage": usage.report(),
+        }
 
-    return analysis_json 
+    return events()
@@ -0,0 +1,269 @@
+"""Analysis of many documents in one run.
+
+Documents are planned (synced and checked against the verdict cache) a
+round at a time. Sentences that are still unanswered are deduplicated
+across the whole batch, so boilerplate shared by many documents is judged
+once. They are screened like single-document runs: sentences without a
+checkable claim are answered locally, and small-model verdicts that are
+not confident enough are escalated to the large model in a second pass.
+The remaining sentences are packed into windows taken from the first
+document they appear in, and all windows of a pass share one worker pool.
+Results are persisted per document with the usual bulk writes, and the
+model usage of the whole run is reported under ``usage``.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from truthlens.ai.metrics import LLMUsage
+from truthlens.ai.ollama_client import DEFAULT_MODEL, backend_capacity
+from truthlens.ai.screener import SKIP, SMALL, ClaimScreener, TierStats
+from truthlens.services.analysis.analysis_service import (
+    ANALYSIS_PROMPT_VERSION,
+    _judge_window,
+    _plan_analysis,
+    _windows,
+)
+from truthlens.services.analysis.persist_results import save_analysis_results
+from truthlens.services.analysis.verdict_cache import Verdict, VerdictCache, normalize_sentence
+
+
+logger = logging.getLogger(__name__)
+
+# Documents planned and held in memory at once.
+DOCUMENTS_PER_ROUND = 100
+
+ProgressCallback = Callable[[dict], None]
+
+
+def _outcome(document_id: int, status: str, *, analyzed: int = 0, total: int = 0, error: str = "") -> dict:
+    return {
+        "document_id": document_id,
+        "status": status,
+        "analyzed": analyzed,
+        "total": total,
+        "error": error or None,
+    }
+
+
+def _jobs(sentences, indices: list[int], model: str = DEFAULT_MODEL) -> list[tuple]:
+    """``_judge_window`` arguments for each window of ``indices``."""
+    return [(sentences, members, carried, model) for members, carried in _windows(sentences, indices)]
+
+
+def _judge(
+    requests: list,
+    asked: dict[int, str],
+    max_workers: int,
+    on_done: Callable[[], None],
+    usage: LLMUsage,
+) -> tuple[dict, int]:
+    """
+    Run the windows on a shared pool; return verdicts by normalized text and the failure count.
+
+    Each window goes through ``_judge_window``, so failed windows are split
+    and sentences a reply left out are asked again before it counts.
+
+    ``asked`` maps the ``sentence_id`` of every requested row to its
+    normalized text, so verdicts are keyed by what was stored rather than
+    by the model's echo of it.
+    """
+    judged: dict[str, dict] = {}
+    failed = 0
+    if not requests:
+        return judged, failed
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(requests), backend_capacity())) as pool:
+        futures = [
+            pool.submit(_judge_window, *job, usage=usage)
+            for job in requests
+        ]
+        for future in as_completed(futures):
+            try:
+                items = future.result()
+            except ValidationError as exc:
+                logger.warning("Batch analysis window failed: %s", exc)
+                failed += 1
+                items = []
+
+            for item in items:
+                normalized = asked.get(item.get("sentence_id")) or normalize_sentence(str(item.get("sentence", "")))
+                judged.setdefault(normalized, item)
+            on_done()
+
+    return judged, failed
+
+
+def _document_items(plan, judged: dict) -> list[dict]:
+    """Cached verdicts plus batch verdicts, re-keyed to this document's sentence text."""
+    items = list(plan.cached_items)
+    seen = set()
+    for sentence in plan.target_sentences:
+        content = sentence.content.strip()
+        if content in seen:
+            continue
+        seen.add(content)
+
+        normalized = normalize_sentence(sentence.content)
+        if normalized in plan.pending and normalized in judged:
+            items.append({**judged[normalized], "sentence": sentence.content, "sentence_id": sentence.sentence_id})
+    return items
+
+
+def analyze_documents(
+    document_ids: Iterable[int],
+    *,
+    incremental: bool = False,
+    max_workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> dict:
+    """
+    Analyze several documents, judging each distinct sentence once.
+
+    Returns per-document outcomes plus batch totals. A document whose
+    windows all failed is reported as ``failed``; one with only some
+    verdicts as ``partial``. ``progress`` is called with a snapshot of the
+    counters after every window and every persisted document.
+    """
+    document_ids = list(dict.fromkeys(document_ids))
+    max_workers = max_workers or getattr(settings, "ANALYSIS_BATCH_MAX_WORKERS", 8)
+    cache = VerdictCache(model=DEFAULT_MODEL, prompt_version=ANALYSIS_PROMPT_VERSION)
+    screener = ClaimScreener.from_settings()
+    tiers = TierStats()
+    usage = LLMUsage()
+
+    judged: dict[str, dict] = {}
+    outcomes = []
+    stats = {
+        "documents_total": len(document_ids),
+        "documents_done": 0,
+        "sentences": 0,
+        "cached": 0,
+        "unique_sentences": 0,
+        "requests_total": 0,
+        "requests_done": 0,
+        "requests_failed": 0,
+    }
+
+    def report():
+        if progress is not None:
+            progress(dict(stats))
+
+    def window_done():
+        stats["requests_done"] += 1
+        report()
+
+    for offset in range(0, len(document_ids), DOCUMENTS_PER_ROUND):
+        plans = []
+        for document_id in document_ids[offset:offset + DOCUMENTS_PER_ROUND]:
+            try:
+                plans.append(_plan_analysis(document_id, incremental))
+            except ValidationError as exc:
+                outcomes.append(_outcome(document_id, "not_found", error="; ".join(exc.messages)))
+                stats["documents_done"] += 1
+
+        # Each unanswered sentence is asked once, with context from the first document holding it.
+        requests = []
+        asked = {}
+        small_tier = []
+        claimed = set(judged)
+        for plan in plans:
+            stats["sentences"] += len(plan.targets)
+            usage.record_cache(len(plan.cached_items), len(plan.pending))
+            stats["cached"] += len(plan.targets) - sum(
+                1 for sentence in plan.target_sentences
+                if normalize_sentence(sentence.content) in plan.pending
+            )
+
+            small, large = [], []
+            for normalized, index in plan.pending.items():
+                if normalized in claimed:
+                    continue
+                claimed.add(normalized)
+                stats["unique_sentences"] += 1
+
+                sentence = plan.sentences[index]
+                tier = screener.screen(sentence.content).tier
+                tiers.counts["screened"] += 1
+                tiers.counts[tier] += 1
+                if tier == SKIP:
+                    judged[normalized] = screener.skip_item(sentence)
+                    continue
+                asked[sentence.sentence_id] = normalized
+                (small if tier == SMALL else large).append(index)
+
+            if small:
+                small_tier.append((plan, small))
+                requests.extend(_jobs(plan.sentences, sorted(small), screener.small_model))
+            if large:
+                requests.extend(_jobs(plan.sentences, sorted(large)))
+
+        stats["requests_total"] += len(requests)
+        report()
+
+        fresh, failed = _judge(requests, asked, max_workers, window_done, usage)
+        stats["requests_failed"] += failed
+
+        # Small-model verdicts below the confidence bar go to the large model.
+        escalations = []
+        small_kept = set()
+        for plan, small in small_tier:
+            escalate = []
+            for index in small:
+                normalized = normalize_sentence(plan.sentences[index].content)
+                item = fresh.get(normalized)
+                if item is not None and screener.accepts(item):
+                    tiers.counts["small_accepted"] += 1
+                    small_kept.add(normalized)
+                else:
+                    fresh.pop(normalized, None)
+                    escalate.append(index)
+            tiers.counts["escalated"] += len(escalate)
+            if escalate:
+                escalations.extend(_jobs(plan.sentences, sorted(escalate)))
+
+        if escalations:
+            stats["requests_total"] += len(escalations)
+            report()
+            escalated, failed = _judge(escalations, asked, max_workers, window_done, usage)
+            stats["requests_failed"] += failed
+            fresh.update(escalated)
+        # Small-model verdicts answer this batch only; the cache holds OLLAMA_MODEL verdicts.
+        cache.put_many(
+            {
+                normalized: verdict
+                for normalized, verdict in ((key, Verdict.from_item(item)) for key, item in fresh.items())
+                if verdict is not None and normalized not in small_kept
+            }
+        )
+        for normalized, item in fresh.items():
+            judged.setdefault(normalized, item)
+
+        for plan in plans:
+            document_id = plan.document.document_id
+            try:
+                items = _document_items(plan, judged)
+                save_analysis_results(plan.document, {"sentences": items}, sentences=plan.target_sentences)
+            except Exception as exc:
+                logger.exception("Persisting batch analysis for document %s failed", document_id)
+                outcomes.append(_outcome(document_id, "failed", total=len(plan.targets), error=str(exc)))
+            else:
+                analyzed = sum(1 for sentence in plan.target_sentences if sentence.analyzed_at is not None)
+                if analyzed == len(plan.targets):
+                    status = "succeeded"
+                elif analyzed:
+                    status = "partial"
+                else:
+                    status = "failed"
+                outcomes.append(_outcome(document_id, status, analyzed=analyzed, total=len(plan.targets)))
+
+            stats["documents_done"] += 1
+            report()
+
+    order = {document_id: position for position, document_id in enumerate(document_ids)}
+    outcomes.sort(key=lambda outcome: order[outcome["document_id"]])
+    return {**stats, "tiers": tiers.report(), "usage": usage.report(), "documents": outcomes}
@@ -0,0 +1,75 @@
+"""Split sentence lists into token-budgeted analysis windows.
+
+Windows are packed over the sentences produced by
+``sentence_service._extract_sentence_slices`` (i.e. the document's synced
+Sentence rows), so chunk boundaries always fall between sentences.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+
+# Rough characters-per-token ratio for the English text we analyze.
+_CHARS_PER_TOKEN = 4
+
+
+@dataclass(frozen=True)
+class AnalysisWindow:
+    """Half-open range ``[start, end)`` of sentences sent in one request.
+
+    ``context_start`` points at the first overlapping sentence carried over
+    from the previous window; those are included as context only.
+    """
+
+    start: int
+    end: int
+    context_start: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate; good enough for packing, not for billing."""
+    return max(1, len(text) // _CHARS_PER_TOKEN)
+
+
+def pack_windows(
+    sentences: Sequence[str],
+    *,
+    token_budget: int,
+    overlap: int = 0,
+    reserved_tokens: int = 0,
+    context_tokens: Optional[Callable[[AnalysisWindow], int]] = None,
+) -> List[AnalysisWindow]:
+    """Greedily pack consecutive sentences into windows of at most ``token_budget`` tokens.
+
+    The budget covers the whole request: ``reserved_tokens`` (system prompt
+    and instructions), the window's sentences and its context. Each window
+    after the first carries up to ``overlap`` preceding sentences as context;
+    callers that send more context price it with ``context_tokens``, which
+    gets the candidate window. A sentence that does not fit on its own still
+    gets a window of its own.
+    """
+    if context_tokens is None:
+        def context_tokens(window: AnalysisWindow) -> int:
+            return sum(estimate_tokens(text) for text in sentences[window.context_start:window.start])
+
+    windows: List[AnalysisWindow] = []
+    start = 0
+
+    while start < len(sentences):
+        context_start = max(0, start - overlap) if windows else start
+        used = estimate_tokens(sentences[start])
+        end = start + 1
+        while end < len(sentences):
+            cost = estimate_tokens(sentences[end])
+            candidate = AnalysisWindow(start=start, end=end + 1, context_start=context_start)
+            if reserved_tokens + used + cost + context_tokens(candidate) > token_budget:
+                break
+            used += cost
+            end += 1
+
+        windows.append(AnalysisWindow(start=start, end=end, context_start=context_start))
+        start = end
+
+    return windows
@@ -0,0 +1,195 @@
+"""Matching model verdicts back to the sentence rows they describe.
+
+The prompt numbers every sentence, and the model is asked to echo that
+number as ``id``; ``_request_analysis`` turns it into the row's
+``sentence_id``. Items are matched, in order of preference:
+
+1. by ``sentence_id``, if the echoed text still resembles that row (a model
+   that shifts its numbering must not move verdicts onto neighbours);
+2. by normalized text (case, whitespace, typographic quotes and trailing
+   punctuation ignored);
+3. by bounded edit distance against the unmatched rows nearest to the last
+   match, since items come back in roughly the order they were asked.
+
+Rows repeating the matched row's text share its verdict, as before.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter, defaultdict
+from typing import List, Optional
+
+
+# Unmatched rows on each side of the last match considered by the fuzzy pass.
+FUZZY_WINDOW = 8
+
+_TYPOGRAPHY = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-", "…": "..."})
+_WHITESPACE = re.compile(r"\s+")
+# Models sometimes copy the "[3] " prefix from the prompt into the sentence.
+_NUMBER_PREFIX = re.compile(r"^\s*\[(\d+)\]\s*")
+
+
+def split_number_prefix(text: str) -> tuple[Optional[int], str]:
+    """``"[3] Text"`` -> ``(3, "Text")``; text without the prefix is returned as is."""
+    match = _NUMBER_PREFIX.match(text)
+    if match is None:
+        return None, text
+    return int(match.group(1)), text[match.end():]
+
+
+def match_key(text: str) -> str:
+    """The text a model echo and its source sentence should agree on."""
+    text = split_number_prefix(str(text or ""))[1]
+    text = _WHITESPACE.sub(" ", text.translate(_TYPOGRAPHY)).strip().casefold()
+    return text.rstrip(" .!?\"'")
+
+
+def bounded_distance(first: str, second: str, limit: int) -> Optional[int]:
+    """Levenshtein distance if it is at most ``limit``, else ``None``.
+
+    Only the diagonal band of width ``2 * limit + 1`` is filled, so the cost
+    is O(len * limit) rather than O(len²).
+    """
+    if abs(len(first) - len(second)) > limit:
+        return None
+    if len(first) > len(second):
+        first, second = second, first
+
+    beyond = limit + 1
+    previous = [column if column <= limit else beyond for column in range(len(second) + 1)]
+    for row in range(1, len(first) + 1):
+        low, high = max(1, row - limit), min(len(second), row + limit)
+        current = [beyond] * (len(second) + 1)
+        current[0] = row if row <= limit else beyond
+        best = current[0]
+        char = first[row - 1]
+        for column in range(low, high + 1):
+            value = min(
+                previous[column - 1] + (char != second[column - 1]),
+                previous[column] + 1,
+                current[column - 1] + 1,
+            )
+            current[column] = min(value, beyond)
+            best = min(best, current[column])
+        if best > limit:
+            return None
+        previous = current
+
+    distance = previous[len(second)]
+    return distance if distance <= limit else None
+
+
+def distance_limit(text: str) -> int:
+    """Edits tolerated between an echo and its sentence: about one per ten characters."""
+    return max(2, len(text) // 10)
+
+
+class ItemMatcher:
+    """Assigns analysis items to sentence rows, each row at most once."""
+
+    def __init__(self, sentences, *, window: int = FUZZY_WINDOW):
+        self.sentences = sorted(sentences, key=lambda sentence: sentence.start_index)
+        self.window = window
+        self.stats = Counter()
+
+        self._keys = [match_key(sentence.content) for sentence in self.sentences]
+        self._by_id = {sentence.sentence_id: position for position, sentence in enumerate(self.sentences)}
+        self._by_key = defaultdict(list)
+        for position, key in enumerate(self._keys):
+            self._by_key[key].append(position)
+        self._matched: set[int] = set()
+        self._cursor = 0
+
+    def match(self, item: dict) -> list:
+        """Rows this item's verdict applies to (empty when nothing matches)."""
+        key = match_key(item.get("sentence", ""))
+
+        position, method = self._by_sentence_id(item, key), "id"
+        if position is None:
+            position, method = self._by_text(key), "text"
+        if position is None:
+            position, method = self._by_distance(key), "fuzzy"
+        if position is None:
+            self.stats["unmatched"] += 1
+            return []
+
+        self.stats[method] += 1
+        self._cursor = position + 1
+        positions = [position] + [
+            other for other in self._by_key[self._keys[position]]
+            if other != position and other not in self._matched
+        ]
+        self._matched.update(positions)
+        return [self.sentences[index] for index in sorted(positions)]
+
+    def _by_sentence_id(self, item: dict, key: str) -> Optional[int]:
+        position = self._by_id.get(item.get("sentence_id"))
+        if position is None or position in self._matched:
+            return None
+        expected = self._keys[position]
+        if not key or key == expected or bounded_distance(key, expected, distance_limit(expected)) is not None:
+            return position
+        return None
+
+    def _by_text(self, key: str) -> Optional[int]:
+        for position in self._by_key.get(key, ()):
+            if position not in self._matched:
+                return position
+        return None
+
+    def _by_distance(self, key: str) -> Optional[int]:
+        if not key:
+            return None
+
+        best, best_distance = None, None
+        for position in self._candidates():
+            expected = self._keys[position]
+            limit = distance_limit(expected)
+            if best_distance is not None:
+                limit = min(limit, best_distance - 1)
+            if limit < 0:
+                break
+            distance = bounded_distance(key, expected, limit)
+            if distance is not None:
+                best, best_distance = position, distance
+        return best
+
+    def _candidates(self) -> List[int]:
+        """Unmatched rows closest to the cursor, nearest first, ``window`` on each side."""
+        after = []
+        position = self._cursor
+        while position < len(self.sentences) and len(after) < self.window:
+            if position not in self._matched:
+                after.append(position)
+            position += 1
+
+        before = []
+        position = self._cursor - 1
+        while position >= 0 and len(before) < self.window:
+            if position not in self._matched:
+                before.append(position)
+            position -= 1
+
+        ordered = []
+        for index in range(max(len(after), len(before))):
+            ordered.extend(side[index] for side in (after, before) if index < len(side))
+        return ordered
+
+    @property
+    def items(self) -> int:
+        return sum(self.stats.values())
+
+    @property
+    def match_rate(self) -> float:
+        return 1.0 if not self.items else (self.items - self.stats["unmatched"]) / self.items
+
+    def report(self) -> dict:
+        return {
+            "items": self.items,
+            "by_id": self.stats["id"],
+            "by_text": self.stats["text"],
+            "by_fuzzy": self.stats["fuzzy"],
+            "unmatched": self.stats["unmatched"],
+            "match_rate": round(self.match_rate, 4),
+        }
@@ -1,49 +1,144 @@
-from truthlens.models import Sentence, Correction
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from truthlens.ai import metrics
+from truthlens.models import Document, Sentence, Correction
+from truthlens.services.analysis.item_matching import ItemMatcher
 from truthlens.services.sentences.sentence_service import sync_document_sentences
 
 
-def save_analysis_results(document, analysis: dict):
+logger = logging.getLogger(__name__)
+
+VERDICT_FIELDS = ["flags", "confidence_scores", "analyzed_at"]
+
+
+def touch_analysis(document_ids) -> None:
+    """Bump ``analysis_revision`` so snapshot ETags change with verdicts and corrections."""
+    Document.objects.filter(pk__in=set(document_ids)).update(analysis_revision=F("analysis_revision") + 1)
+
+
+def _assign_verdict(sentence_obj, item: dict, analyzed_at) -> Correction | None:
+    """Set verdict fields on the row and return its (unsaved) correction, if any."""
+    label = item.get("label")
+    confidence = float(item.get("confidence", 0))
+    suggestion = item.get("suggested_correction", "").strip()
+    reasoning = item.get("reasoning", "").strip()
+    sources = item.get("sources", [])
+
+    sentence_obj.flags = (label == "false")
+    sentence_obj.confidence_scores = int(confidence * 100)
+    sentence_obj.analyzed_at = analyzed_at
+
+    if not (suggestion or reasoning):
+        return None
+
+    return Correction(
+        sentence_id=sentence_obj,
+        suggested_correction=suggestion,
+        reasoning=reasoning,
+        sources="\n".join(sources),
+    )
+
+
+def save_analysis_results(document, analysis: dict, sentences=None):
     """
     Saves AI analysis results:
     - Flags sentences
     - Adds corrections
+
+    ``sentences`` may be passed when the caller has already synced them.
+    Only those sentences are reset, so incremental runs can pass just the
+    changed rows and leave every other flag and correction in place.
+
+    The model is slow, so the rows may have changed since they were read.
+    The document is locked and the rows are re-read first: if the
+    document's revision moved, or a row was rewritten or deleted, those
+    rows are left alone (counted as ``stale`` in the report) rather than
+    given a verdict about text they no longer hold.
+
+    Everything is written in one transaction with a fixed number of
+    statements (bulk update + bulk insert), whatever the document size.
+
+    Items are matched to rows by ``ItemMatcher``; its report (including the
+    match rate) is returned.
     """
 
     sentences_data = analysis.get("sentences", [])
 
-    sentences = sync_document_sentences(document=document, text=document.content)
+    if sentences is None:
+        sentences = sync_document_sentences(document=document, text=document.content)
 
-    sentence_lookup = {sentence.content.strip(): sentence for sentence in sentences}
+    matcher = ItemMatcher(sentences)
+    matches = [(item, matcher.match(item)) for item in sentences_data]
 
-    sentence_ids = [sentence.sentence_id for sentence in sentences]
-    if sentence_ids:
-        Correction.objects.filter(sentence_id__in=sentence_ids).delete()
-        Sentence.objects.filter(sentence_id__in=sentence_ids).update(
-            flags=False,
-            confidence_scores=0,
+    with transaction.atomic():
+        revision = (
+            Document.objects.select_for_update()
+            .filter(pk=document.pk)
+            .values_list("revision", flat=True)
+            .first()
         )
-
-    for item in sentences_data:
-        content = item.get("sentence", "").strip()
-        label = item.get("label")
-        confidence = float(item.get("confidence", 0))
-        suggestion = item.get("suggested_correction", "").strip()
-        reasoning = item.get("reasoning", "").strip()
-        sources = item.get("sources", [])
-
-        # Match by sentence content
-        sentence_obj = sentence_lookup.get(content)
-        if not sentence_obj:
-            continue  # AI sentence doesn't match extracted sentence
-
-        sentence_obj.flags = (label == "false")
-        sentence_obj.confidence_scores = int(confidence * 100)
-        sentence_obj.save(update_fields=["flags", "confidence_scores"])
-
-        if suggestion or reasoning:
-            Correction.objects.create(
-                sentence_id=sentence_obj,  
-                suggested_correction=suggestion,
-                reasoning=reasoning,
-                sources="\n".join(sources),
+        live = {}
+        if sentences and revision == document.revision:
+            live = dict(
+                Sentence.objects.filter(pk__in=[s.sentence_id for s in sentences])
+                .values_list("sentence_id", "content")
             )
+        current = [s for s in sentences if live.get(s.sentence_id) == s.content]
+        current_ids = {s.sentence_id for s in current}
+
+        analyzed_at = timezone.now()
+        applied = set()
+        corrections = []
+
+        for item, rows in matches:
+            for sentence_obj in rows:
+                if sentence_obj.sentence_id not in current_ids:
+                    continue
+                applied.add(sentence_obj.sentence_id)
+                correction = _assign_verdict(sentence_obj, item, analyzed_at)
+                if correction is not None:
+                    corrections.append(correction)
+
+        # Rows the model skipped go back to the unanalyzed state.
+        for sentence_obj in current:
+            if sentence_obj.sentence_id not in applied:
+                sentence_obj.flags = False
+                sentence_obj.confidence_scores = 0
+                sentence_obj.analyzed_at = None
+
+        if current:
+            Correction.objects.filter(sentence_id__in=current_ids).delete()
+            Sentence.objects.bulk_update(current, VERDICT_FIELDS)
+        if corrections:
+            Correction.objects.bulk_create(corrections)
+        if revision is not None:
+            touch_analysis([document.pk])
+
+    stale = len(sentences) - len(current)
+    if stale:
+        logger.warning(
+            "Skipped %d of %d sentence(s) of document %s that changed during analysis",
+            stale,
+            len(sentences),
+            document.document_id,
+        )
+    metrics.observe_matching(matcher.stats)
+    log_match_report(document, matcher)
+    return {**matcher.report(), "stale": stale}
+
+
+def log_match_report(document, matcher: ItemMatcher) -> None:
+    if matcher.stats["unmatched"]:
+        logger.warning(
+            "Matched %d of %d analysis items for document %s (%d by id, %d by text, %d fuzzy)",
+            matcher.items - matcher.stats["unmatched"],
+            matcher.items,
+            document.document_id,
+            matcher.stats["id"],
+            matcher.stats["text"],
+            matcher.stats["fuzzy"],
+        )
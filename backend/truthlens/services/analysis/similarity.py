@@ -0,0 +1,37 @@
+"""Canonical wording of a claim, for reusing verdicts across rewordings.
+
+Two sentences make the same claim here when they have the same content
+words in the same order: case, punctuation, spacing and a few filler words
+("the", "also", "really", ...) are ignored, everything else counts. That
+is deliberately strict. A string similarity threshold would also match
+"approved"/"rejected" or "Lyon"/"Nice", which keep a long sentence about
+0.9 similar but turn the claim around.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List
+
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+# Words whose presence or absence does not change what a sentence claims.
+_FILLER_WORDS = frozenset("a an the also just really very actually indeed".split())
+
+
+def canonical(text: str) -> str:
+    text = (text or "").lower().replace("’", "'")
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(lambda match: "'" if match.group() == "'" else " ", text)).strip()
+
+
+def content_words(text: str) -> List[str]:
+    return [word for word in canonical(text).split() if word not in _FILLER_WORDS]
+
+
+def claim_text(text: str) -> str:
+    """
+    The words a rewording must keep: "boils at 100 degrees" and "boils at
+    90 degrees", or "approved by" and "rejected by", stay different.
+    """
+    return " ".join(content_words(text))
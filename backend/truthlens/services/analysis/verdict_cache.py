@@ -0,0 +1,327 @@
+"""Two-tier cache of sentence verdicts keyed by text, model and prompt version.
+
+On an exact miss the cache falls back to a cached sentence with the same
+content words, i.e. one that differs only in case, punctuation or filler
+words (see ``similarity.py``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from truthlens.ai import metrics
+from truthlens.models import VerdictCacheEntry
+from truthlens.services.analysis.similarity import claim_text
+
+
+_WHITESPACE = re.compile(r"\s+")
+_LABELS = {"true", "false", "uncertain"}
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def normalize_sentence(text: str) -> str:
+    """Canonical form used for cache keys: NFKC, collapsed whitespace."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def _digest(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def make_cache_key(text: str, model: str, prompt_version: str) -> str:
+    """Content address for a verdict produced by ``model`` under ``prompt_version``."""
+    return _digest(model, prompt_version, normalize_sentence(text))
+
+
+def make_claim_key(text: str, model: str, prompt_version: str) -> str:
+    """Like ``make_cache_key`` but over the content words only; empty if there are none."""
+    claim = claim_text(text)
+    return _digest(model, prompt_version, claim) if claim else ""
+
+
+@dataclass(frozen=True)
+class Verdict:
+    """Model judgement for a single sentence."""
+
+    label: str
+    confidence: float
+    suggested_correction: str = ""
+    reasoning: str = ""
+    sources: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_item(cls, item: dict) -> Optional["Verdict"]:
+        """Build a verdict from an analysis item, or ``None`` if it is unusable."""
+        label = str(item.get("label", "")).strip().lower()
+        if label not in _LABELS:
+            return None
+
+        try:
+            confidence = float(item.get("confidence", 0))
+        except (TypeError, ValueError):
+            return None
+
+        sources = item.get("sources") or []
+        if isinstance(sources, str):
+            sources = [sources]
+
+        return cls(
+            label=label,
+            confidence=confidence,
+            suggested_correction=str(item.get("suggested_correction") or "").strip(),
+            reasoning=str(item.get("reasoning") or "").strip(),
+            sources=tuple(str(source) for source in sources),
+        )
+
+    @classmethod
+    def from_row(cls, row: VerdictCacheEntry) -> "Verdict":
+        return cls(
+            label=row.label,
+            confidence=row.confidence,
+            suggested_correction=row.suggested_correction,
+            reasoning=row.reasoning,
+            sources=tuple(row.sources or ()),
+        )
+
+    def as_item(self, sentence: str) -> dict:
+        """Render the verdict in the ``{"sentences": [...]}`` item shape."""
+        return {
+            "sentence": sentence,
+            "label": self.label,
+            "confidence": self.confidence,
+            "suggested_correction": self.suggested_correction,
+            "reasoning": self.reasoning,
+            "sources": list(self.sources),
+        }
+
+
+class _HotTier:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Verdict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Verdict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, verdict = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return verdict
+
+    def put(self, key: str, verdict: Verdict) -> None:
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_prune_lock = threading.Lock()
+_writes_since_prune = 0
+
+_hot_tier = _HotTier(
+    max_entries=_setting("VERDICT_CACHE_HOT_MAX_ENTRIES", 5000),
+    ttl_seconds=_setting("VERDICT_CACHE_TTL_SECONDS", 60 * 60 * 24 * 30),
+)
+
+
+class VerdictCache:
+    """Verdict lookups for one model/prompt pair.
+
+    Reads go through the process-local hot tier first and fall back to the
+    ``VerdictCacheEntry`` table; cold hits are promoted into the hot tier.
+    """
+
+    def __init__(self, *, model: str, prompt_version: str):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.ttl = timedelta(seconds=_setting("VERDICT_CACHE_TTL_SECONDS", 60 * 60 * 24 * 30))
+        self.max_entries = _setting("VERDICT_CACHE_MAX_ENTRIES", 500000)
+        self.match_rewordings = _setting("VERDICT_CACHE_MATCH_REWORDINGS", True)
+        # Sentences answered from a reworded cached sentence by the last get_many call.
+        self.similar_hits = 0
+
+    def key_for(self, sentence: str) -> str:
+        return make_cache_key(sentence, self.model, self.prompt_version)
+
+    def get_many(self, sentences: Iterable[str]) -> Dict[str, Verdict]:
+        """Return cached verdicts keyed by normalised sentence text."""
+        wanted: Dict[str, str] = {}
+        found: Dict[str, Verdict] = {}
+        seen = set()
+
+        for sentence in sentences:
+            normalized = normalize_sentence(sentence)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+
+            key = self.key_for(normalized)
+            verdict = _hot_tier.get(key)
+            if verdict is not None:
+                found[normalized] = verdict
+            else:
+                wanted[key] = normalized
+
+        hot_hits = len(found)
+        if not wanted:
+            metrics.observe_cache({"hot": hot_hits})
+            return found
+
+        cutoff = timezone.now() - self.ttl
+        rows = VerdictCacheEntry.objects.filter(cache_key__in=list(wanted), created_at__gte=cutoff)
+
+        hit_ids = []
+        for row in rows:
+            verdict = Verdict.from_row(row)
+            _hot_tier.put(row.cache_key, verdict)
+            found[wanted.pop(row.cache_key)] = verdict
+            hit_ids.append(row.entry_id)
+
+        self.similar_hits = 0
+        if wanted and self.match_rewordings:
+            for key, (verdict, entry_id) in self._reworded_many(wanted, cutoff).items():
+                _hot_tier.put(key, verdict)
+                found[wanted[key]] = verdict
+                hit_ids.append(entry_id)
+                self.similar_hits += 1
+
+        if hit_ids:
+            VerdictCacheEntry.objects.filter(pk__in=hit_ids).update(last_used_at=timezone.now())
+
+        metrics.observe_cache({
+            "hot": hot_hits,
+            "cold": len(found) - hot_hits - self.similar_hits,
+            "similar": self.similar_hits,
+            "miss": len(wanted) - self.similar_hits,
+        })
+        return found
+
+    def _reworded_many(self, wanted: Dict[str, str], cutoff) -> Dict[str, Tuple[Verdict, int]]:
+        """The most recently used cached sentence with the same content words, per missed key."""
+        claims = {}
+        for key, normalized in wanted.items():
+            claim_key = make_claim_key(normalized, self.model, self.prompt_version)
+            if claim_key:
+                claims.setdefault(claim_key, []).append(key)
+        if not claims:
+            return {}
+
+        matches = {}
+        rows = VerdictCacheEntry.objects.filter(
+            claim_key__in=list(claims), created_at__gte=cutoff
+        ).order_by("-last_used_at")
+        for row in rows:
+            for key in claims.pop(row.claim_key, ()):
+                matches[key] = (Verdict.from_row(row), row.entry_id)
+        return matches
+
+    def put_many(self, verdicts: Dict[str, Verdict]) -> None:
+        """Store verdicts keyed by sentence text in both tiers."""
+        rows: Dict[str, VerdictCacheEntry] = {}
+        for sentence, verdict in verdicts.items():
+            normalized = normalize_sentence(sentence)
+            if not normalized:
+                continue
+
+            key = self.key_for(normalized)
+            _hot_tier.put(key, verdict)
+            rows[key] = VerdictCacheEntry(
+                cache_key=key,
+                claim_key=make_claim_key(normalized, self.model, self.prompt_version),
+                sentence=normalized,
+                model=self.model,
+                prompt_version=self.prompt_version,
+                label=verdict.label,
+                confidence=verdict.confidence,
+                suggested_correction=verdict.suggested_correction,
+                reasoning=verdict.reasoning,
+                sources=list(verdict.sources),
+            )
+
+        if not rows:
+            return
+
+        VerdictCacheEntry.objects.bulk_create(
+            list(rows.values()),
+            update_conflicts=True,
+            unique_fields=["cache_key"],
+            update_fields=[
+                "claim_key",
+                "label",
+                "confidence",
+                "suggested_correction",
+                "reasoning",
+                "sources",
+                "created_at",
+                "last_used_at",
+            ],
+        )
+        self._maybe_prune(len(rows))
+
+    def _maybe_prune(self, written: int) -> None:
+        global _writes_since_prune
+
+        with _prune_lock:
+            _writes_since_prune += written
+            if _writes_since_prune < _setting("VERDICT_CACHE_PRUNE_EVERY", 1000):
+                return
+            _writes_since_prune = 0
+
+        self.prune()
+
+    def prune(self) -> int:
+        """Drop expired rows, then least recently used rows beyond the size cap."""
+        label = VerdictCacheEntry._meta.label
+        _, counts = VerdictCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - self.ttl
+        ).delete()
+        deleted = counts.get(label, 0)
+
+        overflow = VerdictCacheEntry.objects.count() - self.max_entries
+        if overflow > 0:
+            stale = VerdictCacheEntry.objects.order_by("last_used_at").values_list("pk", flat=True)[:overflow]
+            _, counts = VerdictCacheEntry.objects.filter(pk__in=list(stale)).delete()
+            deleted += counts.get(label, 0)
+
+        return deleted
+
+
+def clear_hot_tier() -> None:
+    """Forget all process-local verdicts (the database tier is untouched)."""
+    _hot_tier.clear()
@@ -0,0 +1,33 @@
+"""Getting the model ready before the first real request."""
+
+import logging
+
+from django.core.exceptions import ValidationError
+
+from truthlens.ai.fact_checker import FACT_CHECK_SYSTEM_PROMPT
+from truthlens.ai.ollama_client import DEFAULT_MODEL, OllamaTimings, warmup_ollama
+from truthlens.services.analysis.analysis_service import ANALYSIS_SYSTEM_PROMPT
+
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPTS = (ANALYSIS_SYSTEM_PROMPT, FACT_CHECK_SYSTEM_PROMPT)
+
+
+def warm_up(model: str = DEFAULT_MODEL) -> dict[str, list[OllamaTimings]]:
+    """
+    Load the model and prefill every system prompt on each Ollama backend.
+
+    The analysis prompt goes last, so it is the prefix the server holds when
+    the first analysis request arrives. Failures are logged, not raised: a
+    cold model is slow, not broken.
+    """
+    try:
+        timings = warmup_ollama(model, systems=SYSTEM_PROMPTS[1:] + SYSTEM_PROMPTS[:1])
+    except ValidationError as exc:
+        logger.warning("Ollama warmup for %s failed: %s", model, exc)
+        return {}
+
+    for url, backend_timings in timings.items():
+        logger.info("Ollama %s loaded on %s in %.2fs", model, url, backend_timings[0].load)
+    return timings
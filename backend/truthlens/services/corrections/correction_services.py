@@ -1,4 +1,14 @@
-from truthlens.models import Correction
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from truthlens.models import Correction, Document, Sentence
+from truthlens.services.sentences.sentence_service import (
+    ends_sentence,
+    get_current_sentences,
+    is_single_sentence,
+    sync_document_sentences,
+)
 
 
 def get_corrections_for_sentence(sentence_id: int):
@@ -14,3 +24,102 @@ def create_correction(*, sentence_id, suggested_correction: str, reasoning: str,
         reasoning=reasoning,
         sources=sources,
     )
+
+
+def apply_corrections(document_id: int, pairs: list[tuple[int, int]]) -> Document:
+    """
+    Apply many corrections to one document in a single rewrite.
+
+    The edits are spliced into the text in one pass ordered by
+    ``start_index``; every sentence after an edit is shifted by the running
+    length delta instead of re-diffing the document. Everything is
+    committed in one transaction.
+
+    If every replacement is itself exactly one sentence the rows are
+    already what a sync would produce and the document is marked synced;
+    otherwise a single sync runs once all edits are applied.
+    """
+    if not pairs:
+        raise ValidationError("no corrections given")
+
+    sentence_ids = [sentence_id for sentence_id, _ in pairs]
+    if len(set(sentence_ids)) != len(sentence_ids):
+        raise ValidationError("only one correction per sentence can be applied")
+
+    corrections = Correction.objects.in_bulk([correction_id for _, correction_id in pairs])
+    replacements: dict[int, Correction] = {}
+    for sentence_id, correction_id in pairs:
+        correction = corrections.get(correction_id)
+        if correction is None:
+            raise ValidationError(f"correction {correction_id} not found")
+        if correction.sentence_id_id != sentence_id:
+            raise ValidationError(f"correction {correction_id} does not match sentence {sentence_id}")
+        replacements[sentence_id] = correction
+
+    with transaction.atomic():
+        try:
+            document = Document.objects.select_for_update().get(pk=document_id)
+        except Document.DoesNotExist as exc:
+            raise ValidationError("document not found") from exc
+
+        # Offsets must describe the current text before they can be rebased.
+        sentences = get_current_sentences(document)
+        if not replacements.keys() <= {sentence.sentence_id for sentence in sentences}:
+            raise ValidationError("sentence does not belong to this document")
+
+        content = document.content or ""
+        pieces = []
+        cursor = 0
+        delta = 0
+        changed = []
+        clean = True
+
+        previous = None
+        for sentence in sentences:
+            correction = replacements.get(sentence.sentence_id)
+            if correction is None:
+                if delta:
+                    sentence.start_index += delta
+                    sentence.end_index += delta
+                    changed.append(sentence)
+                previous = sentence
+                continue
+
+            replacement = correction.suggested_correction or ""
+            pieces.append(content[cursor:sentence.start_index])
+            pieces.append(replacement)
+            cursor = sentence.end_index
+
+            start = sentence.start_index + delta
+            delta += len(replacement) - (sentence.end_index - sentence.start_index)
+            # The previous sentence's boundary must not depend on the new first word either.
+            clean = clean and is_single_sentence(replacement) and (
+                previous is None or ends_sentence(previous.content)
+            )
+
+            sentence.content = replacement
+            sentence.start_index = start
+            sentence.end_index = start + len(replacement)
+            sentence.flags = False
+            sentence.confidence_scores = 100
+            changed.append(sentence)
+            previous = sentence
+
+        pieces.append(content[cursor:])
+        document.content = "".join(pieces)
+        document.revision = F("revision") + 1
+        document.save(update_fields=["content", "revision"])
+        document.refresh_from_db(fields=["revision"])
+
+        Sentence.objects.bulk_update(
+            changed, ["content", "start_index", "end_index", "flags", "confidence_scores"]
+        )
+        Correction.objects.filter(pk__in=[correction.pk for correction in replacements.values()]).delete()
+
+        if clean:
+            Document.objects.filter(pk=document.pk).update(sentences_revision=document.revision)
+            document.sentences_revision = document.revision
+        else:
+            sync_document_sentences(document=document)
+
+    return document
@@ -1,9 +1,15 @@
 """Document-related database operations."""
 
+import base64
+from datetime import datetime
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import transaction
+from django.db.models import F, Q
 
 from truthlens.models import Document, User
+from truthlens.services.sentences.segmenter import get_segmenter
 
 def create_document(user_id: int, title: str, content: str) -> Document:
     if not title:
@@ -24,11 +30,64 @@ def create_document(user_id: int, title: str, content: str) -> Document:
     return document
 
 
-def list_documents(user_id: int | None = None):
+LIST_FIELDS = ("document_id", "title", "created_at", "updated_at", "user_id")
+
+
+def encode_cursor(created_at: datetime, document_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{document_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, document_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(document_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValidationError("invalid cursor") from exc
+
+
+def list_documents(
+    user_id: int | None = None,
+    *,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    One page of documents, newest first, as dicts of ``LIST_FIELDS``.
+
+    Pages are keyed on ``(created_at, document_id)`` rather than offsets,
+    so each page is a single index range scan. Returns ``(rows, next_cursor)``;
+    ``next_cursor`` is ``None`` on the last page. ``content`` is never loaded.
+    """
+    default_limit = getattr(settings, "DOCUMENT_LIST_DEFAULT_LIMIT", 50)
+    max_limit = getattr(settings, "DOCUMENT_LIST_MAX_LIMIT", 200)
+    limit = default_limit if limit is None else limit
+    if limit < 1:
+        raise ValidationError("limit must be positive")
+    limit = min(limit, max_limit)
+
     queryset = Document.objects.all()
     if user_id is not None:
         queryset = queryset.filter(user_id=user_id)
-    return queryset.order_by("-created_at")
+
+    if cursor:
+        created_at, document_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, document_id__lt=document_id)
+        )
+
+    # One extra row tells whether another page follows.
+    rows = list(
+        queryset.order_by("-created_at", "-document_id").values(*LIST_FIELDS)[: limit + 1]
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["document_id"])
+
+    return rows, next_cursor
 
 
 def get_document(doc_id: int) -> Document:
@@ -47,20 +106,30 @@ def update_document(document_id: int, *, title: str | None = None, content: str
     except Document.DoesNotExist as exc:
         raise ValidationError("document not found") from exc
 
+    content_changed = content is not None and content != document.content
+
     if title is not None:
         document.title = title
     if content is not None:
         document.content = content
 
+    # updated_at is in the snapshot ETag; a title-only change must move it too.
     fields = [
         field for field, value in [
             ("title", title),
             ("content", content),
         ] if value is not None
-    ]
+    ] + ["updated_at"]
+
+    if content_changed:
+        document.revision = F("revision") + 1
+        fields.append("revision")
 
     with transaction.atomic():
-        document.save(update_fields=fields or ["updated_at"])
+        document.save(update_fields=fields)
+
+    if content_changed:
+        document.refresh_from_db(fields=["revision"])
 
     return document
 
@@ -76,17 +145,11 @@ def extract_sentences(text: str):
     Minimal helper that returns a list of {content, start, end}.
     Used by correction apply logic.
     """
-    import re
-
-    sentences = []
-    pattern = r'[^.!?]+[.!?]'
-    for match in re.finditer(pattern, text, re.MULTILINE):
-        content = match.group().strip()
-        start = match.start()
-        end = match.end()
-        sentences.append({
-            "content": content,
-            "start": start,
-            "end": end
-        })
-    return sentences
+    return [
+        {
+            "content": slice_.content,
+            "start": slice_.start_index,
+            "end": slice_.end_index,
+        }
+        for slice_ in get_segmenter().segment(text)
+    ]
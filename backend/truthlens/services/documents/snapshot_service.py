@@ -0,0 +1,80 @@
+"""Everything needed to render a document, read in a fixed number of queries."""
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, prefetch_related_objects
+
+from truthlens.models import Correction, Document
+from truthlens.services.sentences.sentence_service import get_current_sentences
+
+
+ETAG_FIELDS = ["document_id", "revision", "sentences_revision", "analysis_revision", "updated_at"]
+
+
+def snapshot_etag(document: Document) -> str:
+    """
+    Changes with the text (``revision``), with verdicts and corrections
+    (``analysis_revision``) and with the title (``updated_at``).
+    """
+    return (
+        f'"{document.document_id}-{document.revision}-{document.analysis_revision}'
+        f'-{int(document.updated_at.timestamp() * 1_000_000)}"'
+    )
+
+
+def is_current(document: Document, etag: str) -> bool:
+    """True when ``etag`` still describes the document and its sentences need no sync."""
+    return document.sentences_revision == document.revision and etag == snapshot_etag(document)
+
+
+def get_document_snapshot(document_id: int):
+    """
+    The document, its current sentences and their corrections.
+
+    Three queries when the sentences are in sync: the document, its
+    sentences, and the corrections of all of them.
+    """
+    try:
+        document = Document.objects.get(document_id=document_id)
+    except Document.DoesNotExist as exc:
+        raise ValidationError("document not found") from exc
+
+    sentences = get_current_sentences(document)
+    prefetch_related_objects(
+        sentences,
+        Prefetch("correction_set", queryset=Correction.objects.order_by("-created_at", "-correction_id")),
+    )
+    return document, sentences
+
+
+def serialize_snapshot(document: Document, sentences) -> dict:
+    return {
+        "document": {
+            "document_id": document.document_id,
+            "title": document.title,
+            "content": document.content,
+            "user_id": document.user_id_id,
+            "revision": document.revision,
+            "updated_at": document.updated_at,
+        },
+        "sentences": [
+            {
+                "sentence_id": s.sentence_id,
+                "content": s.content,
+                "start_index": s.start_index,
+                "end_index": s.end_index,
+                "flags": s.flags,
+                "confidence": s.confidence_scores,
+                "corrections": [
+                    {
+                        "correction_id": c.correction_id,
+                        "suggested_correction": c.suggested_correction,
+                        "reasoning": c.reasoning,
+                        "sources": c.sources,
+                        "created_at": c.created_at,
+                    }
+                    for c in s.correction_set.all()
+                ],
+            }
+            for s in sentences
+        ],
+    }
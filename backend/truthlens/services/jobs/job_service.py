@@ -0,0 +1,184 @@
+"""Database-backed queue for analysis jobs."""
+
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from truthlens.models import AnalysisJob, Document
+from truthlens.services.analysis.analysis_service import analyze_document
+from truthlens.services.analysis.batch_service import analyze_documents
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_analysis(document_id: int, *, incremental: bool = False) -> AnalysisJob:
+    """Queue an analysis run, reusing an identical job that has not started yet."""
+    if not Document.objects.filter(pk=document_id).exists():
+        raise ValidationError("document not found")
+
+    with transaction.atomic():
+        existing = (
+            AnalysisJob.objects.select_for_update()
+            .filter(
+                document_id=document_id,
+                incremental=incremental,
+                status=AnalysisJob.STATUS_QUEUED,
+            )
+            .first()
+        )
+        if existing:
+            return existing
+
+        return AnalysisJob.objects.create(
+            document_id_id=document_id,
+            incremental=incremental,
+        )
+
+
+def resolve_batch_documents(*, document_ids=None, user_id=None) -> list[int]:
+    """Turn a list of document ids or a user id into the ids a batch should analyze."""
+    if document_ids is None and user_id is None:
+        raise ValidationError("document_ids or user_id is required")
+
+    if document_ids is not None:
+        if not isinstance(document_ids, list) or not document_ids:
+            raise ValidationError("document_ids must be a non-empty list")
+        try:
+            return list(dict.fromkeys(int(document_id) for document_id in document_ids))
+        except (TypeError, ValueError) as exc:
+            raise ValidationError("document_ids must be integers") from exc
+
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError) as exc:
+        raise ValidationError("user_id must be an integer") from exc
+
+    ids = list(
+        Document.objects.filter(user_id=user_id)
+        .order_by("created_at", "document_id")
+        .values_list("document_id", flat=True)
+    )
+    if not ids:
+        raise ValidationError("user has no documents")
+    return ids
+
+
+def enqueue_batch_analysis(document_ids: list[int], *, incremental: bool = False) -> AnalysisJob:
+    """Queue one job that analyzes all the given documents together."""
+    return AnalysisJob.objects.create(
+        document_ids=document_ids,
+        incremental=incremental,
+        progress={"documents_total": len(document_ids), "documents_done": 0},
+    )
+
+
+def get_job(job_id: int) -> AnalysisJob:
+    try:
+        return AnalysisJob.objects.get(pk=job_id)
+    except AnalysisJob.DoesNotExist as exc:
+        raise ValidationError("job not found") from exc
+
+
+def claim_next_job() -> Optional[AnalysisJob]:
+    """Atomically take the oldest queued job.
+
+    ``SKIP LOCKED`` lets any number of worker processes poll the same table
+    without blocking on, or double-claiming, each other's rows.
+    """
+    with transaction.atomic():
+        job = (
+            AnalysisJob.objects.select_for_update(skip_locked=True)
+            .filter(status=AnalysisJob.STATUS_QUEUED)
+            .order_by("created_at", "job_id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = AnalysisJob.STATUS_RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "heartbeat_at", "attempts"])
+
+    return job
+
+
+@contextmanager
+def _heartbeat(job: AnalysisJob):
+    """Refresh ``heartbeat_at`` from a background thread while the block runs."""
+    interval = getattr(settings, "ANALYSIS_JOB_HEARTBEAT_SECONDS", 30)
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.STATUS_RUNNING).update(
+                        heartbeat_at=timezone.now()
+                    )
+                except Exception:
+                    logger.exception("Heartbeat of analysis job %s failed", job.pk)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job: AnalysisJob) -> AnalysisJob:
+    """Execute a claimed job and record its outcome."""
+    try:
+        with _heartbeat(job):
+            if job.is_batch:
+                def record_progress(snapshot: dict) -> None:
+                    AnalysisJob.objects.filter(pk=job.pk).update(progress=snapshot)
+
+                job.result = analyze_documents(
+                    job.document_ids,
+                    incremental=job.incremental,
+                    progress=record_progress,
+                )
+                job.progress = {key: value for key, value in job.result.items() if key != "documents"}
+            else:
+                job.result = analyze_document(job.document_id_id, incremental=job.incremental)
+        job.status = AnalysisJob.STATUS_SUCCEEDED
+        job.error = ""
+    except Exception as exc:
+        logger.exception("Analysis job %s failed", job.job_id)
+        job.status = AnalysisJob.STATUS_FAILED
+        job.error = str(exc)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["result", "progress", "status", "error", "finished_at"])
+    return job
+
+
+def requeue_stale_jobs(*, older_than: timedelta, max_attempts: int) -> int:
+    """Put jobs whose worker stopped sending heartbeats back on the queue (or fail them)."""
+    cutoff = timezone.now() - older_than
+    stale = AnalysisJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=AnalysisJob.STATUS_RUNNING,
+    )
+
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=AnalysisJob.STATUS_FAILED,
+        error="worker did not finish the job",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status=AnalysisJob.STATUS_QUEUED)
+    return failed + requeued
@@ -0,0 +1,174 @@
+"""Hash-based sentence alignment used by sentence sync.
+
+Sentences are reduced to 64-bit fingerprints and aligned with patience diff:
+sentences that occur exactly once on both sides anchor the alignment, the
+longest increasing run of anchors is kept, and the gaps between them are
+aligned recursively. Ranges without unique sentences fall back to the
+rarest shared sentence (the histogram-diff rule). The output uses
+``difflib.SequenceMatcher.get_opcodes()`` semantics.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Sequence, Tuple
+
+
+Opcode = Tuple[str, int, int, int, int]
+
+# Ranges whose rarest shared sentence occurs more often than this are not
+# worth anchoring; they become a single replace block.
+_MAX_HISTOGRAM_OCCURRENCES = 64
+
+
+def fingerprint(text: str) -> int:
+    """Stable 64-bit fingerprint of a sentence."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Longest chain of pairs increasing in both coordinates (pairs sorted by the first)."""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous: List[int] = []
+
+    for position, (_, j) in enumerate(pairs):
+        slot = bisect_left(tails, j)
+        if slot == len(tails):
+            tails.append(j)
+            tail_index.append(position)
+        else:
+            tails[slot] = j
+            tail_index[slot] = position
+        previous.append(tail_index[slot - 1] if slot else -1)
+
+    chain: List[Tuple[int, int]] = []
+    position = tail_index[-1] if tail_index else -1
+    while position != -1:
+        chain.append(pairs[position])
+        position = previous[position]
+    chain.reverse()
+    return chain
+
+
+def _anchors(a: Sequence[int], b: Sequence[int], alo: int, ahi: int, blo: int, bhi: int) -> List[Tuple[int, int]]:
+    count_a = Counter(a[alo:ahi])
+    count_b = Counter(b[blo:bhi])
+
+    first_b: Dict[int, int] = {}
+    for j in range(blo, bhi):
+        first_b.setdefault(b[j], j)
+
+    unique = [
+        (i, first_b[a[i]])
+        for i in range(alo, ahi)
+        if count_a[a[i]] == 1 and count_b.get(a[i]) == 1
+    ]
+    if unique:
+        return _longest_increasing(unique)
+
+    shared = [value for value in count_a if value in count_b]
+    if not shared:
+        return []
+
+    rarest = min(shared, key=lambda value: (count_a[value] + count_b[value], value))
+    if count_a[rarest] + count_b[rarest] > _MAX_HISTOGRAM_OCCURRENCES:
+        return []
+
+    first_a = next(i for i in range(alo, ahi) if a[i] == rarest)
+    return [(first_a, first_b[rarest])]
+
+
+def _matches(a: Sequence[int], b: Sequence[int]) -> List[Tuple[int, int]]:
+    matches: List[Tuple[int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+
+        if alo >= ahi or blo >= bhi:
+            continue
+
+        anchors = _anchors(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            continue
+
+        matches.extend(anchors)
+        bounds = [(alo - 1, blo - 1)] + anchors + [(ahi, bhi)]
+        for (i1, j1), (i2, j2) in zip(bounds, bounds[1:]):
+            if i2 - i1 > 1 or j2 - j1 > 1:
+                stack.append((i1 + 1, i2, j1 + 1, j2))
+
+    matches.sort()
+    return matches
+
+
+def align(old: Sequence[str], new: Sequence[str]) -> List[Opcode]:
+    """Opcodes turning ``old`` into ``new``, like ``SequenceMatcher.get_opcodes()``."""
+    a = [fingerprint(text) for text in old]
+    b = [fingerprint(text) for text in new]
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for mi, mj in _matches(a, b) + [(len(a), len(b))]:
+        if i < mi and j < mj:
+            opcodes.append(("replace", i, mi, j, mj))
+        elif i < mi:
+            opcodes.append(("delete", i, mi, j, j))
+        elif j < mj:
+            opcodes.append(("insert", i, i, j, mj))
+
+        if mi < len(a):
+            if opcodes and opcodes[-1][0] == "equal":
+                tag, i1, _, j1, _ = opcodes.pop()
+                opcodes.append((tag, i1, mi + 1, j1, mj + 1))
+            else:
+                opcodes.append(("equal", mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+
+    return opcodes
+
+
+def pair_near_duplicates(
+    old: Sequence[str],
+    new: Sequence[str],
+    *,
+    threshold: float = 0.8,
+    window: int = 8,
+) -> List[Tuple[int, int]]:
+    """
+    Pair sentences of a replace block that are near-identical, in order.
+
+    Each old sentence is compared with at most ``window`` upcoming new
+    sentences, so the cost stays linear in the block size.
+    """
+    pairs: List[Tuple[int, int]] = []
+    start = 0
+
+    for i, text in enumerate(old):
+        best, best_score = None, threshold
+        for j in range(start, min(len(new), start + window)):
+            matcher = SequenceMatcher(None, text, new[j], autojunk=False)
+            if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+                continue
+            score = matcher.ratio()
+            if score >= best_score:
+                best, best_score = j, score
+
+        if best is not None:
+            pairs.append((i, best))
+            start = best + 1
+
+    return pairs
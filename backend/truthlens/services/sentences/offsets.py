@@ -0,0 +1,165 @@
+"""In-place text edits that keep sentence rows consistent without a full sync.
+
+An edit replaces ``content[start:end]`` with new text. Only the sentences
+touching the edited range, plus one neighbour on each side, are
+re-segmented and reconciled; every sentence after that window keeps its
+row and is shifted by the length delta with a single UPDATE.
+
+This relies on the segmenter deciding each boundary from the sentence
+itself and the start of the next one only, which holds for every
+segmenter in ``segmenter.py``.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from truthlens.models import Document, Sentence
+from truthlens.services.sentences.sentence_service import (
+    SentenceSlice,
+    _extract_sentence_slices,
+    get_current_sentences,
+    reconcile_sentences,
+    sync_document_sentences,
+)
+
+
+class RevisionConflict(ValidationError):
+    """The document changed since the revision the client edited."""
+
+
+@dataclass
+class EditResult:
+    document: Document
+    delta: int
+    # Rows of the re-segmented window, in order (all rows after a full sync).
+    sentences: List[Sentence] = field(default_factory=list)
+    resynced: bool = False
+
+
+def shift_sentences(document: Document, *, from_index: int, delta: int) -> int:
+    """Move every sentence starting at or after ``from_index`` by ``delta`` characters."""
+    if not delta:
+        return 0
+
+    return Sentence.objects.filter(document_id=document, start_index__gte=from_index).update(
+        start_index=F("start_index") + delta,
+        end_index=F("end_index") + delta,
+    )
+
+
+def _save_content(document: Document, content: str, *, synced: bool) -> None:
+    updates = {
+        "content": content,
+        "revision": F("revision") + 1,
+        "updated_at": timezone.now(),
+    }
+    if synced:
+        updates["sentences_revision"] = F("revision") + 1
+
+    Document.objects.filter(pk=document.pk).update(**updates)
+    document.content = content
+    document.refresh_from_db(fields=["revision", "sentences_revision", "updated_at"])
+
+
+def edit_document(
+    document_id: int,
+    *,
+    start: int,
+    end: int,
+    text: str,
+    revision: Optional[int] = None,
+) -> EditResult:
+    """
+    Replace ``content[start:end]`` with ``text`` and update sentences locally.
+
+    Pass the ``revision`` the edit was made against to reject it with
+    ``RevisionConflict`` if the document changed in the meantime. When the
+    window's edges are not clean sentence boundaries the document falls
+    back to a full sync.
+    """
+    with transaction.atomic():
+        try:
+            document = Document.objects.select_for_update().get(pk=document_id)
+        except Document.DoesNotExist as exc:
+            raise ValidationError("document not found") from exc
+
+        if revision is not None and revision != document.revision:
+            raise RevisionConflict(f"document is at revision {document.revision}, not {revision}")
+
+        content = document.content or ""
+        if not 0 <= start <= end <= len(content):
+            raise ValidationError("edit range is outside the document")
+
+        # Offsets must describe the current text before they can be rebased.
+        sentences = get_current_sentences(document)
+
+        new_content = f"{content[:start]}{text}{content[end:]}"
+        delta = len(text) - (end - start)
+
+        # Rows touching the edit, widened by one row on each side, plus an
+        # anchor row after that which must come out of re-segmentation unchanged.
+        first = bisect_left([sentence.end_index for sentence in sentences], start)
+        last = bisect_right([sentence.start_index for sentence in sentences], end)
+        lo = max(first - 1, 0)
+        hi = min(last + 2, len(sentences))
+        window = sentences[lo:hi]
+
+        region_start = sentences[lo - 1].end_index if lo > 0 else 0
+        region_end = sentences[hi - 1].end_index if hi < len(sentences) else len(content)
+
+        slices = [
+            SentenceSlice(
+                content=slice_.content,
+                start_index=slice_.start_index + region_start,
+                end_index=slice_.end_index + region_start,
+            )
+            for slice_ in _extract_sentence_slices(new_content[region_start:region_end + delta])
+        ]
+
+        # The row before the window ends on a boundary whose context the
+        # edit does not touch. If the anchor row is reproduced exactly, the
+        # segmentation agrees with a full pass and nothing after it moves
+        # except by ``delta``.
+        anchor = sentences[hi - 1] if hi < len(sentences) else None
+        clean = anchor is None or (
+            bool(slices)
+            and slices[-1]
+            == SentenceSlice(anchor.content, anchor.start_index + delta, anchor.end_index + delta)
+        )
+        if not clean:
+            _save_content(document, new_content, synced=False)
+            return EditResult(
+                document=document,
+                delta=delta,
+                sentences=sync_document_sentences(document=document),
+                resynced=True,
+            )
+
+        changes = reconcile_sentences(document, window, slices)
+
+        # Rows past the window are untouched apart from their offsets.
+        shift_sentences(document, from_index=region_end, delta=delta)
+        changes.write()
+        _save_content(document, new_content, synced=True)
+
+    return EditResult(document=document, delta=delta, sentences=changes.ordered())
+
+
+def insert_text(document_id: int, offset: int, text: str, **kwargs) -> EditResult:
+    return edit_document(document_id, start=offset, end=offset, text=text, **kwargs)
+
+
+def delete_text(document_id: int, offset: int, length: int, **kwargs) -> EditResult:
+    return edit_document(document_id, start=offset, end=offset + length, text="", **kwargs)
+
+
+def replace_text(document_id: int, start: int, end: int, text: str, **kwargs) -> EditResult:
+    return edit_document(document_id, start=start, end=end, text=text, **kwargs)
@@ -0,0 +1,207 @@
+"""Sentence segmentation.
+
+Every place that splits document text into sentences goes through
+``get_segmenter()``, which returns the segmenter named by the
+``SENTENCE_SEGMENTER`` setting (a dotted path, default
+``RuleBasedSegmenter``). A segmenter returns ``SentenceSlice`` objects with
+stripped content and absolute offsets into the text.
+"""
+
+from __future__ import annotations
+
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@dataclass(frozen=True)
+class SentenceSlice:
+    """Intermediate representation of a sentence extracted from text."""
+
+    content: str
+    start_index: int
+    end_index: int
+
+
+class Segmenter(ABC):
+    """Splits text into sentences."""
+
+    @abstractmethod
+    def segment(self, text: str) -> List[SentenceSlice]:
+        """Sentences of ``text`` in order, with offsets into it."""
+
+    @abstractmethod
+    def ends_sentence(self, text: str) -> bool:
+        """True when a sentence boundary follows ``text`` whatever comes after it."""
+
+
+_WORD = re.compile(r"\w")
+
+
+def _append_slice(slices: List[SentenceSlice], text: str, start: int, end: int) -> None:
+    """Add ``text[start:end]`` stripped of surrounding whitespace, unless it has no words."""
+    snippet = text[start:end]
+    stripped = snippet.strip()
+    if not stripped or not _WORD.search(stripped):
+        return
+
+    leading = len(snippet) - len(snippet.lstrip())
+    slices.append(
+        SentenceSlice(
+            content=stripped,
+            start_index=start + leading,
+            end_index=start + leading + len(stripped),
+        )
+    )
+
+
+class RegexSegmenter(Segmenter):
+    """The original splitter: a sentence ends at every ``.``, ``!`` or ``?``."""
+
+    _pattern = re.compile(r"[^.!?]+[.!?]?")
+
+    def segment(self, text: str) -> List[SentenceSlice]:
+        slices: List[SentenceSlice] = []
+        for match in self._pattern.finditer(text):
+            _append_slice(slices, text, match.start(), match.end())
+        return slices
+
+    def ends_sentence(self, text: str) -> bool:
+        return text[-1:] in (".", "!", "?")
+
+
+# Never end a sentence ("Dr. Smith", "e.g. this").
+TITLE_ABBREVIATIONS = frozenset(
+    """
+    mr mrs ms dr prof rev fr gen sen rep gov pres lt col capt sgt cmdr adm st mt
+    e.g i.e cf vs viz approx ca dept univ assn
+    """.split()
+)
+
+# Do not end a sentence when a number follows ("see fig. 3", "no. 7").
+NUMERIC_ABBREVIATIONS = frozenset("no nos fig figs vol vols pp p ch sec art eq eqs".split())
+
+# End a sentence only when the next word is capitalised ("... etc. The next").
+FINAL_ABBREVIATIONS = frozenset("etc inc ltd co corp jr sr al".split())
+
+_CLOSERS = "\"')]}»”’"
+_OPENERS = "\"'([{«“‘"
+
+
+class RuleBasedSegmenter(Segmenter):
+    """
+    Rule-based splitter driven by one compiled scan.
+
+    The scan finds candidate boundaries: runs of ``.!?`` (plus closing
+    quotes or brackets) followed by whitespace or the end of the text, and
+    line breaks. A line break always ends a sentence; ``!`` and ``?``
+    always do; a period does unless it belongs to a known abbreviation or
+    an initial. Periods not followed by whitespace (decimals, URLs) are
+    never candidates.
+    """
+
+    _candidates = re.compile(r"[.!?]+[" + re.escape(_CLOSERS) + r"]*(?=\s|$)|\n")
+
+    def __init__(
+        self,
+        *,
+        titles: Iterable[str] = TITLE_ABBREVIATIONS,
+        numeric: Iterable[str] = NUMERIC_ABBREVIATIONS,
+        final: Iterable[str] = FINAL_ABBREVIATIONS,
+    ):
+        self.titles: FrozenSet[str] = frozenset(titles)
+        self.numeric: FrozenSet[str] = frozenset(numeric)
+        self.final: FrozenSet[str] = frozenset(final)
+
+    def segment(self, text: str) -> List[SentenceSlice]:
+        slices: List[SentenceSlice] = []
+        start = 0
+
+        for match in self._candidates.finditer(text):
+            if match.group() == "\n":
+                _append_slice(slices, text, start, match.start())
+                start = match.end()
+            elif self._is_boundary(text, match.start(), match.end()):
+                _append_slice(slices, text, start, match.end())
+                start = match.end()
+
+        _append_slice(slices, text, start, len(text))
+        return slices
+
+    def ends_sentence(self, text: str) -> bool:
+        stripped = text.rstrip(_CLOSERS)
+        if not stripped or stripped[-1] not in ".!?":
+            return False
+        if stripped[-1] in "!?":
+            return True
+        # Decided by the next word for these, so not unconditionally final.
+        return self._period_kind(text, len(stripped) - 1) == "final"
+
+    def _period_kind(self, text: str, position: int) -> str:
+        """Classify the period at ``position``: ``final``, ``never``, ``numeric`` or ``capitalised``."""
+        if position > 0 and text[position - 1] == ".":
+            return "capitalised"  # ellipsis
+
+        token_start = position
+        while token_start > 0 and not text[token_start - 1].isspace():
+            token_start -= 1
+        raw = text[token_start:position].lstrip(_OPENERS)
+        token = raw.lower()
+
+        if token in self.titles:
+            return "never"
+        if token in self.numeric:
+            return "numeric"
+        if token in self.final:
+            return "capitalised"
+        if len(raw) == 1 and raw.isupper():
+            return "never"  # initial: "J. Smith"
+        if "." in token and all(len(part) == 1 for part in token.split(".")):
+            return "capitalised"  # acronym: "U.S."
+        return "final"
+
+    def _is_boundary(self, text: str, start: int, end: int) -> bool:
+        punctuation = text[start:end].rstrip(_CLOSERS)
+        if "!" in punctuation or "?" in punctuation:
+            return True
+
+        kind = self._period_kind(text, start + len(punctuation) - 1)
+        if kind == "final":
+            return True
+        if kind == "never":
+            return False
+
+        following = self._next_char(text, end)
+        if following is None:
+            return True
+        if kind == "numeric":
+            return not following.isdigit()
+        return following.isupper()
+
+    @staticmethod
+    def _next_char(text: str, position: int) -> Optional[str]:
+        length = len(text)
+        while position < length and (text[position].isspace() or text[position] in _OPENERS):
+            position += 1
+        return text[position] if position < length else None
+
+
+@lru_cache(maxsize=None)
+def _load(path: str) -> Segmenter:
+    return import_string(path)()
+
+
+def get_segmenter() -> Segmenter:
+    """The segmenter configured by ``SENTENCE_SEGMENTER``."""
+    return _load(
+        getattr(
+            settings,
+            "SENTENCE_SEGMENTER",
+            "truthlens.services.sentences.segmenter.RuleBasedSegmenter",
+        )
+    )
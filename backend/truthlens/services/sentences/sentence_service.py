@@ -2,74 +2,96 @@
 
 from __future__ import annotations
 
-import re
 from dataclasses import dataclass
-from difflib import SequenceMatcher
 from typing import List, Optional
 
 from django.db import transaction
 
 from truthlens.models import Document, Sentence
+from truthlens.services.sentences.alignment import align, pair_near_duplicates
+from truthlens.services.sentences.segmenter import SentenceSlice, get_segmenter
 
 
-# Regex pattern for sentence detection
-_SENTENCE_PATTERN = re.compile(r"[^.!?]+[.!?]?")
+def _extract_sentence_slices(text: str) -> List[SentenceSlice]:
+    """Split raw text into sentence slices with normalised indices."""
+    return get_segmenter().segment(text)
 
 
-@dataclass(frozen=True)
-class SentenceSlice:
-    """Intermediate representation of a sentence extracted from text."""
+def ends_sentence(text: str) -> bool:
+    """True when segmentation always breaks right after ``text``, whatever follows it."""
+    return get_segmenter().ends_sentence(text)
 
-    content: str
-    start_index: int
-    end_index: int
 
+def is_single_sentence(text: str) -> bool:
+    """True when ``text`` segments to exactly itself, so splicing it in cannot merge or split rows."""
+    slices = _extract_sentence_slices(text)
+    return (
+        len(slices) == 1
+        and slices[0].start_index == 0
+        and slices[0].end_index == len(text)
+        and ends_sentence(text)
+    )
 
-def _extract_sentence_slices(text: str) -> List[SentenceSlice]:
-    """Split raw text into sentence slices with normalised indices."""
-    slices: List[SentenceSlice] = []
 
-    for match in _SENTENCE_PATTERN.finditer(text):
-        snippet = text[match.start(): match.end()]
-        stripped = snippet.strip()
+def _mark_synced(document: Document) -> None:
+    if document.sentences_revision != document.revision:
+        Document.objects.filter(pk=document.pk).update(sentences_revision=document.revision)
+        document.sentences_revision = document.revision
 
-        if not stripped:
-            continue
 
-        leading = len(snippet) - len(snippet.lstrip())
-        start = match.start() + leading
-        end = start + len(stripped)
+def get_current_sentences(document: Document, *, flagged_only: bool = False) -> List[Sentence]:
+    """Return the document's sentences, syncing only if its text changed since the last sync."""
+    if document.sentences_revision != document.revision:
+        sentences = sync_document_sentences(document=document)
+        return [sentence for sentence in sentences if sentence.flags] if flagged_only else sentences
 
-        slices.append(
-            SentenceSlice(
-                content=stripped,
-                start_index=start,
-                end_index=end,
-            )
-        )
+    queryset = Sentence.objects.filter(document_id=document)
+    if flagged_only:
+        queryset = queryset.filter(flags=True)
+    return list(queryset.order_by("start_index", "sentence_id"))
 
-    return slices
 
+@dataclass
+class SentenceChanges:
+    """Row changes that turn ``existing`` sentences into a list of new slices."""
 
-def sync_document_sentences(*, document: Document, text: Optional[str] = None) -> List[Sentence]:
-    """Synchronise the Sentence rows for a document with the supplied text."""
+    kept: List[Sentence]
+    changed: List[Sentence]
+    deleted: List[Sentence]
+    created: List[Sentence]
 
-    source_text = text if text is not None else document.content or ""
-    new_slices = _extract_sentence_slices(source_text)
+    def write(self) -> None:
+        """Apply the changes with one statement per kind of change."""
+        if self.deleted:
+            Sentence.objects.filter(
+                pk__in=[sentence.pk for sentence in self.deleted]
+            ).delete()
 
-    # Fast exit when no sentences remain.
-    if not new_slices:
-        with transaction.atomic():
-            Sentence.objects.filter(document_id=document).delete()
-        return []
+        if self.changed:
+            Sentence.objects.bulk_update(
+                self.changed, ["content", "start_index", "end_index", "analyzed_at"]
+            )
 
-    existing = list(
-        Sentence.objects.filter(document_id=document)
-        .order_by("start_index", "sentence_id")
-    )
+        if self.created:
+            Sentence.objects.bulk_create(self.created)
+
+    def ordered(self) -> List[Sentence]:
+        return sorted(
+            self.kept + self.created,
+            key=lambda sentence: (sentence.start_index, sentence.sentence_id),
+        )
 
-    matcher = SequenceMatcher(
-        None,
+
+def reconcile_sentences(
+    document: Document, existing: List[Sentence], new_slices: List[SentenceSlice]
+) -> SentenceChanges:
+    """Work out, in memory, how to turn ``existing`` rows into ``new_slices``.
+
+    Rows on ``equal`` opcodes are kept. Rows whose content changes, and
+    newly created rows, have ``analyzed_at`` cleared so incremental
+    analysis picks them up.
+    """
+    opcodes = align(
         [sentence.content for sentence in existing],
         [slice_.content for slice_ in new_slices],
     )
@@ -78,7 +100,7 @@ def sync_document_sentences(*, document: Document, text: Optional[str] = None) -
     to_create: List[SentenceSlice] = []
     to_update: List[tuple[Sentence, SentenceSlice]] = []
 
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+    for tag, i1, i2, j1, j2 in opcodes:
         if tag == "equal":
             for old_index, new_index in zip(range(i1, i2), range(j1, j2)):
                 to_update.append((existing[old_index], new_slices[new_index]))
@@ -91,8 +113,22 @@ def sync_document_sentences(*, document: Document, text: Optional[str] = None) -
                 for old_sentence, new_slice in zip(old_segment, new_segment):
                     to_update.append((old_sentence, new_slice))
             else:
-                to_delete.extend(old_segment)
-                to_create.extend(new_segment)
+                # Keep rows (and their corrections) for lightly edited sentences.
+                pairs = pair_near_duplicates(
+                    [sentence.content for sentence in old_segment],
+                    [slice_.content for slice_ in new_segment],
+                )
+                paired_old = {old_index for old_index, _ in pairs}
+                paired_new = {new_index for _, new_index in pairs}
+
+                for old_index, new_index in pairs:
+                    to_update.append((old_segment[old_index], new_segment[new_index]))
+                to_delete.extend(
+                    sentence for index, sentence in enumerate(old_segment) if index not in paired_old
+                )
+                to_create.extend(
+                    slice_ for index, slice_ in enumerate(new_segment) if index not in paired_new
+                )
 
         elif tag == "delete":
             to_delete.extend(existing[i1:i2])
@@ -100,45 +136,76 @@ def sync_document_sentences(*, document: Document, text: Optional[str] = None) -
         elif tag == "insert":
             to_create.extend(new_slices[j1:j2])
 
-    # Apply all DB changes inside a transaction
-    with transaction.atomic():
-        if to_delete:
-            Sentence.objects.filter(
-                pk__in=[sentence.pk for sentence in to_delete]
-            ).delete()
+    changed: List[Sentence] = []
+    for sentence, slice_ in to_update:
+        if (
+            sentence.content == slice_.content
+            and sentence.start_index == slice_.start_index
+            and sentence.end_index == slice_.end_index
+        ):
+            continue
 
-        # Update modified rows
-        for sentence, slice_ in to_update:
-            fields_to_update: List[str] = []
-
-            if sentence.content != slice_.content:
-                sentence.content = slice_.content
-                fields_to_update.append("content")
-
-            if sentence.start_index != slice_.start_index:
-                sentence.start_index = slice_.start_index
-                fields_to_update.append("start_index")
-
-            if sentence.end_index != slice_.end_index:
-                sentence.end_index = slice_.end_index
-                fields_to_update.append("end_index")
-
-            if fields_to_update:
-                sentence.save(update_fields=fields_to_update)
-
-        # Create new sentences
-        for slice_ in to_create:
-            Sentence.objects.create(
-                document_id=document,
-                content=slice_.content,
-                start_index=slice_.start_index,
-                end_index=slice_.end_index,
-                flags=False,
-                confidence_scores=0,
-            )
+        if sentence.content != slice_.content:
+            sentence.content = slice_.content
+            sentence.analyzed_at = None
+
+        sentence.start_index = slice_.start_index
+        sentence.end_index = slice_.end_index
+        changed.append(sentence)
+
+    created = [
+        Sentence(
+            document_id=document,
+            content=slice_.content,
+            start_index=slice_.start_index,
+            end_index=slice_.end_index,
+            flags=False,
+            confidence_scores=0,
+        )
+        for slice_ in to_create
+    ]
+
+    return SentenceChanges(
+        kept=[sentence for sentence, _ in to_update],
+        changed=changed,
+        deleted=to_delete,
+        created=created,
+    )
 
-    # Return final ordered list
-    return list(
+
+def sync_document_sentences(*, document: Document, text: Optional[str] = None) -> List[Sentence]:
+    """Synchronise the Sentence rows for a document with the supplied text.
+
+    See ``reconcile_sentences`` for which rows are kept, rewritten or replaced.
+    """
+
+    source_text = text if text is not None else document.content or ""
+    new_slices = _extract_sentence_slices(source_text)
+
+    # Record which revision the rows now reflect, unless syncing other text.
+    mark_revision = source_text == (document.content or "")
+
+    # Fast exit when no sentences remain.
+    if not new_slices:
+        with transaction.atomic():
+            Sentence.objects.filter(document_id=document).delete()
+            if mark_revision:
+                _mark_synced(document)
+        return []
+
+    existing = list(
         Sentence.objects.filter(document_id=document)
         .order_by("start_index", "sentence_id")
     )
+
+    changes = reconcile_sentences(document, existing, new_slices)
+
+    # Apply all DB changes inside a transaction, one statement per kind of change.
+    with transaction.atomic():
+        changes.write()
+
+        if mark_revision:
+            _mark_synced(document)
+
+    # Return final ordered list
+    return changes.ordered()
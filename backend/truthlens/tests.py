@@ -1,3 +1,1641 @@
-from django.test import TestCase
+import json
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import httpx
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from truthlens.ai import metrics
+from truthlens.ai.backend_pool import Backend, BackendPool, BackendUnavailable
+from truthlens.ai.json_stream import SentenceStreamParser, extract_object, extract_sentence_items
+from truthlens.ai.ollama_client import (
+    DEFAULT_MODEL as ANALYSIS_MODEL,
+    ChatResult,
+    OllamaClient,
+    OllamaTimings,
+)
+from truthlens.ai.screener import ClaimScreener
+from truthlens.middleware import QueryBudgetExceeded, query_budget
+from truthlens.models import AnalysisJob, Correction, Document, Sentence, User, VerdictCacheEntry
+from truthlens.services.analysis.analysis_service import (
+    ANALYSIS_PROMPT_VERSION,
+    _PROMPT_TOKENS,
+    _request_analysis,
+    _window_requests,
+    analyze_document,
+    stream_document_analysis,
+)
+from truthlens.services.analysis.batch_service import analyze_documents
+from truthlens.services.analysis.chunking import estimate_tokens, pack_windows
+from truthlens.services.analysis.persist_results import save_analysis_results
+from truthlens.services.analysis.verdict_cache import Verdict, VerdictCache, _HotTier, clear_hot_tier
+from truthlens.services.corrections.correction_services import apply_corrections
+from truthlens.services.documents.document_service import update_document
+from truthlens.services.jobs.job_service import (
+    claim_next_job,
+    enqueue_analysis,
+    requeue_stale_jobs,
+    run_job,
+)
+from truthlens.services.sentences.alignment import align, pair_near_duplicates
+from truthlens.services.sentences.offsets import delete_text, insert_text, replace_text
+from truthlens.services.sentences.segmenter import RuleBasedSegmenter, Segmenter
+from truthlens.services.sentences.sentence_service import (
+    _extract_sentence_slices,
+    sync_document_sentences,
+)
+
+
+def _document_text(count: int, prefix: str = "Claim") -> str:
+    return " ".join(f"{prefix} number {index} is stated here." for index in range(count))
+
+
+def _analysis_for(sentences) -> dict:
+    return {
+        "sentences": [
+            {
+                "sentence": sentence.content,
+                "label": "false",
+                "confidence": 0.8,
+                "suggested_correction": f"Corrected {sentence.content}",
+                "reasoning": "Test verdict.",
+                "sources": ["https://example.com"],
+            }
+            for sentence in sentences
+        ]
+    }
+
+
+class RuleBasedSegmenterTests(TestCase):
+    def _contents(self, text):
+        return [slice_.content for slice_ in RuleBasedSegmenter().segment(text)]
+
+    def test_abbreviations_decimals_and_initials_do_not_split(self):
+        self.assertEqual(
+            self._contents("Dr. Smith measured 7.4 units, e.g. in J. Doe's lab. See fig. 3 next."),
+            ["Dr. Smith measured 7.4 units, e.g. in J. Doe's lab.", "See fig. 3 next."],
+        )
+
+    def test_final_abbreviations_split_before_capitals(self):
+        self.assertEqual(
+            self._contents("Sold by Acme Inc. and others. Tools, etc. The end."),
+            ["Sold by Acme Inc. and others.", "Tools, etc.", "The end."],
+        )
+
+    def test_quotes_and_newlines(self):
+        self.assertEqual(
+            self._contents('She said "It is final." Nobody objected\nA new line'),
+            ['She said "It is final."', "Nobody objected", "A new line"],
+        )
+
+    def test_offsets_point_into_text(self):
+        text = "  First one.  Second one?\n\nThird"
+        for slice_ in RuleBasedSegmenter().segment(text):
+            self.assertEqual(text[slice_.start_index:slice_.end_index], slice_.content)
+
+    def test_segmenters_must_implement_both_methods(self):
+        class SegmentOnly(Segmenter):
+            def segment(self, text):
+                return []
+
+        with self.assertRaises(TypeError):
+            SegmentOnly()
+
+
+DRUG_APPROVED = (
+    "The new cancer drug was approved by regulators in the European Union after a long and careful "
+    "review of all the clinical trial data submitted by the manufacturer."
+)
+LYON_THIRD = (
+    "The city of Lyon is widely considered by geographers and historians to be the third largest city "
+    "in the whole of France by population and economic output."
+)
+ANDROMEDA_VISIBLE = (
+    "On a clear moonless night far from city lights the Andromeda galaxy is clearly visible to the "
+    "naked eye as a faint smudge in the autumn sky."
+)
+
+
+class NearDuplicateVerdictTests(TestCase):
+    """Exact misses reuse a cached sentence that differs only in form, never one with other words."""
+
+    def setUp(self):
+        self.cache = VerdictCache(model="test-model", prompt_version="1")
+        self.cache.put_many({
+            "Water boils at 100 degrees Celsius at sea level.": Verdict("true", 0.9),
+            DRUG_APPROVED: Verdict("true", 0.9),
+            LYON_THIRD: Verdict("true", 0.9),
+            ANDROMEDA_VISIBLE: Verdict("true", 0.9),
+        })
+        clear_hot_tier()
+
+    def tearDown(self):
+        clear_hot_tier()
+
+    def test_rewording_reuses_verdict(self):
+        found = self.cache.get_many(["Water boils at 100 degrees celsius at sea level!"])
+        self.assertEqual([verdict.label for verdict in found.values()], ["true"])
+        self.assertEqual(self.cache.similar_hits, 1)
+
+    def test_one_word_rewording_hits(self):
+        reworded = [
+            LYON_THIRD.replace("to be the third", "to be third"),
+            ANDROMEDA_VISIBLE.replace("is clearly visible", "is really clearly visible"),
+        ]
+        with self.assertNumQueries(3):  # exact lookup, claim lookup, last_used_at
+            found = self.cache.get_many(reworded)
+        self.assertEqual(set(found), set(reworded))
+        self.assertEqual(self.cache.similar_hits, 2)
+
+    def test_changed_number_or_negation_is_not_reused(self):
+        found = self.cache.get_many([
+            "Water boils at 90 degrees Celsius at sea level.",
+            "Water never boils at 100 degrees Celsius at sea level.",
+        ])
+        self.assertEqual(found, {})
+
+    def test_single_word_swaps_are_not_reused(self):
+        # Each of these is a near-identical string that claims something else.
+        swaps = [
+            DRUG_APPROVED.replace("approved", "rejected"),
+            LYON_THIRD.replace("Lyon", "Nice"),
+            ANDROMEDA_VISIBLE.replace("clearly", "barely"),
+        ]
+        found = self.cache.get_many(swaps)
+        self.assertEqual(found, {})
+        self.assertEqual(self.cache.similar_hits, 0)
+
+    @override_settings(VERDICT_CACHE_MATCH_REWORDINGS=False)
+    def test_can_be_turned_off(self):
+        cache = VerdictCache(model="test-model", prompt_version="1")
+        self.assertEqual(cache.get_many([LYON_THIRD.replace("to be the third", "to be third")]), {})
+
+    def test_other_model_is_not_reused(self):
+        other = VerdictCache(model="other-model", prompt_version="1")
+        self.assertEqual(other.get_many(["Water boils at 100 degrees celsius at sea level!"]), {})
+
+
+class VerdictCacheTests(TestCase):
+    """Verdicts expire after the TTL, the hot tier evicts least recently used, cold hits are promoted."""
+
+    def setUp(self):
+        clear_hot_tier()
+        self.cache = VerdictCache(model="test-model", prompt_version="1")
+
+    def tearDown(self):
+        clear_hot_tier()
+
+    def test_hot_tier_lru_and_ttl(self):
+        clock = mock.Mock(monotonic=mock.Mock(return_value=0.0))
+        with mock.patch("truthlens.services.analysis.verdict_cache.time", clock):
+            tier = _HotTier(max_entries=2, ttl_seconds=60)
+            tier.put("a", Verdict("true", 0.9))
+            tier.put("b", Verdict("false", 0.9))
+            self.assertIsNotNone(tier.get("a"))
+            tier.put("c", Verdict("true", 0.5))
+            self.assertEqual([key for key in "abc" if tier.get(key) is not None], ["a", "c"])
+
+            clock.monotonic.return_value = 61.0
+            self.assertIsNone(tier.get("a"))
+
+    def test_cold_hit_is_promoted_to_hot_tier(self):
+        self.cache.put_many({"Paris is the capital of France.": Verdict("true", 0.9)})
+        clear_hot_tier()
+
+        with self.assertNumQueries(2):  # lookup, last_used_at
+            cold = self.cache.get_many(["Paris is the capital of France."])
+        with self.assertNumQueries(0):
+            hot = self.cache.get_many(["Paris  is the capital of France."])
+        self.assertEqual(cold, hot)
+        self.assertEqual(list(hot.values()), [Verdict("true", 0.9)])
+
+    def test_expired_rows_miss_and_are_pruned(self):
+        self.cache.put_many({
+            "Old claim about the moon.": Verdict("false", 0.8),
+            "Fresh claim about the sun.": Verdict("true", 0.8),
+        })
+        clear_hot_tier()
+        VerdictCacheEntry.objects.filter(sentence="Old claim about the moon.").update(
+            created_at=timezone.now() - self.cache.ttl - timedelta(seconds=1)
+        )
+
+        found = self.cache.get_many(["Old claim about the moon.", "Fresh claim about the sun."])
+        self.assertEqual(list(found), ["Fresh claim about the sun."])
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(
+            list(VerdictCacheEntry.objects.values_list("sentence", flat=True)), ["Fresh claim about the sun."]
+        )
+
+    @override_settings(VERDICT_CACHE_MAX_ENTRIES=2)
+    def test_prune_drops_least_recently_used_beyond_cap(self):
+        cache = VerdictCache(model="test-model", prompt_version="1")
+        for index in range(3):
+            cache.put_many({f"Claim {index} is on record.": Verdict("true", 0.9)})
+        clear_hot_tier()
+        for index in range(3):
+            VerdictCacheEntry.objects.filter(sentence=f"Claim {index} is on record.").update(
+                last_used_at=timezone.now() - timedelta(days=3 - index)
+            )
+        cache.get_many(["Claim 0 is on record."])  # the oldest, until this lookup
+
+        self.assertEqual(cache.prune(), 1)
+        self.assertEqual(
+            sorted(VerdictCacheEntry.objects.values_list("sentence", flat=True)),
+            ["Claim 0 is on record.", "Claim 2 is on record."],
+        )
+
+
+class OllamaChatClientTests(TestCase):
+    """Requests use /api/chat with a separate system message and keep the model loaded."""
+
+    def setUp(self):
+        self.requests = []
+
+        def handler(request):
+            payload = json.loads(request.content)
+            self.requests.append((request.url.path, payload))
+            timings = {"total_duration": 3_000_000_000, "load_duration": 1_000_000_000,
+                       "prompt_eval_count": 12, "prompt_eval_duration": 500_000_000,
+                       "eval_count": 4, "eval_duration": 250_000_000}
+            if payload.get("stream"):
+                lines = [{"message": {"content": "Hel"}, "done": False},
+                         {"message": {"content": "lo"}, "done": True, **timings}]
+                return httpx.Response(200, text="\n".join(json.dumps(line) for line in lines))
+            return httpx.Response(200, json={"message": {"role": "assistant", "content": "Hello"}, "done": True, **timings})
+
+        self.client = OllamaClient(
+            url="http://ollama.test/api/generate",
+            keep_alive="10m",
+            transport=httpx.MockTransport(handler),
+        )
+
+    def test_chat_sends_system_message_and_returns_timings(self):
+        result = self.client.chat("Check this.", "test-model", system="Be strict.")
+
+        path, payload = self.requests[0]
+        self.assertEqual(path, "/api/chat")
+        self.assertEqual(payload["keep_alive"], "10m")
+        self.assertEqual(
+            payload["messages"],
+            [{"role": "system", "content": "Be strict."}, {"role": "user", "content": "Check this."}],
+        )
+        self.assertEqual(result.text, "Hello")
+        self.assertEqual((result.timings.load, result.timings.prefill_tokens, result.timings.eval), (1.0, 12, 0.25))
+
+    def test_stream_reports_timings_at_the_end(self):
+        seen = []
+        fragments = list(self.client.stream("Check this.", "test-model", on_timings=seen.append))
+
+        self.assertEqual(fragments, ["Hel", "lo"])
+        self.assertEqual(seen[0].total, 3.0)
+
+    def test_warmup_loads_model_then_prefills_system_prompts(self):
+        self.client.warmup("test-model", systems=["Be strict."])
+
+        self.assertEqual(self.requests[0][1]["messages"], [])
+        self.assertEqual(self.requests[1][1]["messages"][0], {"role": "system", "content": "Be strict."})
+        self.assertEqual(self.requests[1][1]["options"]["num_predict"], 1)
+
+
+class _StubOllamaHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"message": {"content": self.server.reply}, "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _KeepAliveOllamaHandler(_StubOllamaHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        super().do_POST()
+
+
+class BackendPoolTests(TestCase):
+    """Least-outstanding routing, ejection with backoff and fail-fast."""
+
+    def setUp(self):
+        self.now = 0.0
+
+    def _pool(self, *urls, concurrency=2, **kwargs):
+        kwargs.setdefault("acquire_timeout", 0)
+        return BackendPool(
+            [Backend(url=url, max_concurrency=concurrency) for url in urls],
+            clock=lambda: self.now,
+            **kwargs,
+        )
+
+    def _stub_server(self, reply: str) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOllamaHandler)
+        server.reply = reply
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    @staticmethod
+    def _closed_port_url() -> str:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+    def test_least_outstanding_routing_and_slot_limit(self):
+        pool = self._pool("http://a", "http://b")
+        leased = [pool.acquire().url for _ in range(4)]
+
+        self.assertEqual(sorted(leased), ["http://a", "http://a", "http://b", "http://b"])
+        with self.assertRaises(BackendUnavailable):
+            pool.acquire()
+
+    def test_ejection_backoff_and_half_open_probe(self):
+        with self.assertLogs("truthlens.ai.backend_pool", "WARNING"):
+            pool = self._pool("http://a", "http://b", eject_after=2, backoff=10)
+            a = pool.backends[0]
+            for _ in range(2):
+                pool.release(pool.acquire(exclude={"http://b"}), healthy=False)
+
+            self.assertEqual({pool.acquire().url for _ in range(2)}, {"http://b"})
+
+            self.now = 10
+            probe = pool.acquire(exclude={"http://b"})
+            self.assertIs(probe.backend, a)
+            self.assertTrue(probe.probe)
+            with self.assertRaises(BackendUnavailable):
+                pool.acquire(exclude={"http://b"})  # one probe at a time
+
+            pool.release(probe, healthy=False)
+            self.assertEqual(a.ejected_until, 30)  # backoff doubled
+
+            self.now = 30
+            pool.release(pool.acquire(exclude={"http://b"}), healthy=True)
+            self.assertEqual(a.state(self.now), "closed")
+
+    def test_only_the_probe_decides_a_half_open_backend(self):
+        with self.assertLogs("truthlens.ai.backend_pool", "WARNING") as logs:
+            pool = self._pool("http://a", concurrency=4, eject_after=1, backoff=5)
+            a = pool.backends[0]
+            in_flight = [pool.acquire() for _ in range(4)]
+            pool.release(in_flight.pop(), healthy=False)
+            self.assertEqual(a.ejected_until, 5)
+
+            self.now = 5
+            probe = pool.acquire()
+            # Requests sent before the ejection fail late: no extra backoff, no second probe.
+            for lease in in_flight:
+                pool.release(lease, healthy=False)
+            self.assertEqual((a.ejections, a.ejected_until, a.errors), (1, 5, 4))
+            with self.assertRaises(BackendUnavailable):
+                pool.acquire()
+
+            pool.release(probe, healthy=False)
+            self.assertEqual(a.ejected_until, 15)
+            self.assertEqual(len(logs.output), 2)
+
+    def test_all_ejected_fails_fast(self):
+        with self.assertLogs("truthlens.ai.backend_pool", "WARNING"):
+            pool = self._pool("http://a", eject_after=1, acquire_timeout=60)
+            pool.release(pool.acquire(), healthy=False)
+
+            with self.assertRaisesMessage(BackendUnavailable, "ejected"):
+                pool.acquire()
+
+    def test_requests_beyond_the_slots_wait_for_one(self):
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def handler(request):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return httpx.Response(200, json={"message": {"content": "ok"}, "done": True})
+
+        pool = BackendPool.from_settings([{"url": "http://a", "max_concurrency": 2}])
+        self.assertIsNone(pool.acquire_timeout)  # busy backends are waited for, never failed
+        client = OllamaClient(pool=pool, transport=httpx.MockTransport(handler))
+        self.addCleanup(client.close)
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            replies = list(executor.map(lambda index: client.generate(f"prompt {index}", "test-model"), range(6)))
+
+        self.assertEqual(replies, ["ok"] * 6)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(pool.snapshot()[0]["errors"], 0)
+
+    @override_settings(ANALYSIS_CHUNK_TOKENS=1, ANALYSIS_CHUNK_OVERLAP=0, ANALYSIS_MAX_WORKERS=8)
+    def test_analysis_runs_no_more_windows_than_slots(self):
+        clear_hot_tier()
+        self.addCleanup(clear_hot_tier)
+        user = User.objects.create(username="slots", email="slots@example.com", password="x")
+        document = Document.objects.create(user_id=user, title="Doc", content=_document_text(6))
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def chat(prompt, model, system=None):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            sentence = prompt.split("Text to analyze:\n[1] ")[1].split("\n")[0]
+            reply = {"sentences": [{"id": 1, "sentence": sentence, "label": "true", "confidence": 0.9}]}
+            return ChatResult(text=json.dumps(reply), timings=OllamaTimings())
+
+        with mock.patch("truthlens.services.analysis.analysis_service.backend_capacity", return_value=2), \
+                mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", chat):
+            result = analyze_document(document.document_id)
+
+        self.assertEqual(result["usage"]["calls"], 6)
+        self.assertLessEqual(peak[0], 2)
+        self.assertFalse(Sentence.objects.filter(document_id=document, analyzed_at__isnull=True).exists())
+
+    def test_client_fails_over_and_ejects_unreachable_backend(self):
+        with self.assertLogs("truthlens.ai.backend_pool", "WARNING"):
+            dead, alive = self._closed_port_url(), self._stub_server("ok")
+            pool = BackendPool.from_settings([dead, alive])
+            pool.eject_after = 1
+            client = OllamaClient(pool=pool)
+            self.addCleanup(client.close)
+
+            replies = [client.generate(f"prompt {index}", "test-model") for index in range(3)]
+
+            self.assertEqual(replies, ["ok", "ok", "ok"])
+            states = {entry["url"]: entry for entry in pool.snapshot()}
+            self.assertEqual(states[dead]["state"], "open")
+            self.assertEqual(states[alive]["requests"], 3)
+
+            only_dead = OllamaClient(pool=BackendPool.from_settings([dead]))
+            only_dead.pool.eject_after = 1
+            self.addCleanup(only_dead.close)
+            with self.assertRaises(ValidationError):
+                only_dead.generate("first", "test-model")
+            with self.assertRaisesMessage(ValidationError, "ejected"):
+                only_dead.generate("second", "test-model")
+
+
+class OllamaClientReuseTests(TestCase):
+    """One pooled connection serves consecutive calls; identical prompts in flight share a request."""
+
+    def test_consecutive_calls_reuse_one_connection(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveOllamaHandler)
+        server.reply, server.connections = "ok", set()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        client = OllamaClient(url=f"http://127.0.0.1:{server.server_address[1]}")
+        self.addCleanup(client.close)
+        replies = [client.generate(f"prompt {index}", "test-model") for index in range(3)]
+
+        self.assertEqual(replies, ["ok"] * 3)
+        self.assertEqual(len(server.connections), 1)
+
+    def test_identical_prompts_in_flight_are_coalesced(self):
+        requests = []
+        entered, release = threading.Event(), threading.Event()
+
+        def handler(request):
+            requests.append(json.loads(request.content)["messages"][-1]["content"])
+            entered.set()
+            release.wait(5)
+            return httpx.Response(200, json={"message": {"content": "shared"}, "done": True})
+
+        client = OllamaClient(url="http://ollama.test", transport=httpx.MockTransport(handler))
+        self.addCleanup(client.close)
+        results = []
+
+        def call(prompt):
+            results.append(client.chat(prompt, "test-model", system="Be strict.").text)
+
+        first = threading.Thread(target=call, args=("Same prompt.",))
+        first.start()
+        self.assertTrue(entered.wait(5))
+        waiters = [threading.Thread(target=call, args=("Same prompt.",)) for _ in range(3)]
+        for thread in waiters:
+            thread.start()
+        time.sleep(0.1)  # let the waiters find the request in flight
+        release.set()
+        for thread in [first, *waiters]:
+            thread.join(5)
+
+        self.assertEqual(requests, ["Same prompt."])
+        self.assertEqual(results, ["shared"] * 4)
+
+        client.chat("Other prompt.", "test-model", system="Be strict.")
+        self.assertEqual(len(requests), 2)
+
+
+class LLMMetricsTests(TestCase):
+    """Every call feeds the Prometheus registry and the analysis' own usage report."""
+
+    def setUp(self):
+        self.reply = json.dumps({"sentences": [{"id": 1, "sentence": "Water is wet.", "label": "true", "confidence": 0.9}]})
+
+        def handler(request):
+            return httpx.Response(200, json={
+                "model": "metrics-model", "message": {"role": "assistant", "content": self.reply}, "done": True,
+                "prompt_eval_count": 12, "prompt_eval_duration": 500_000_000,
+                "eval_count": 4, "eval_duration": 250_000_000,
+            })
+
+        self.ollama = OllamaClient(url="http://ollama.test", transport=httpx.MockTransport(handler))
+
+    def _chat(self, prompt, model, system=None):
+        return self.ollama.chat(prompt, model, system=system)
+
+    def test_call_is_recorded(self):
+        calls = metrics.LLM_REQUEST_SECONDS.count(model="metrics-model", outcome="ok")
+        tokens = metrics.LLM_COMPLETION_TOKENS.value(model="metrics-model")
+
+        result = self.ollama.chat("Check this.", "metrics-model")
+
+        self.assertEqual(metrics.LLM_REQUEST_SECONDS.count(model="metrics-model", outcome="ok"), calls + 1)
+        self.assertEqual(metrics.LLM_COMPLETION_TOKENS.value(model="metrics-model"), tokens + 4)
+        self.assertGreater(result.bytes_sent, 0)
+        self.assertGreater(result.bytes_received, len(self.reply))
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('truthlens_llm_request_duration_seconds_bucket{model="metrics-model",outcome="ok",le="+Inf"}', body)
+
+    def test_analysis_usage(self):
+        usage = metrics.LLMUsage()
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", self._chat):
+            _request_analysis(["Water is wet."], sentence_ids=[7], model="metrics-model", usage=usage)
+            self.reply = "not json"
+            with self.assertLogs("truthlens.services.analysis.analysis_service", "WARNING"):
+                with self.assertRaises(ValidationError):
+                    _request_analysis(["Water is wet."], model="metrics-model", usage=usage)
+
+        report = usage.report()
+        self.assertEqual((report["calls"], report["models"]), (2, {"metrics-model": 2}))
+        self.assertEqual((report["prompt_tokens"], report["completion_tokens"]), (24, 8))
+        self.assertEqual(report["tokens_per_second"], 16.0)
+        self.assertEqual(report["parse"], {"ok": 1, "partial": 0, "failed": 1})
+
+    def test_match_methods_are_counted(self):
+        user = User.objects.create(username="matching", email="matching@example.com", password="x")
+        document = Document.objects.create(
+            user_id=user, title="Doc", content="Water is wet. Fire is hot. Ice is cold."
+        )
+        wet, hot, cold = sync_document_sentences(document=document)
+        before = {method: metrics.ANALYSIS_ITEMS_MATCHED.value(method=method) for method in ("id", "text", "fuzzy")}
+        unmatched = metrics.ANALYSIS_ITEMS_UNMATCHED.value()
+
+        items = [
+            {"sentence": "Water is wet.", "sentence_id": wet.sentence_id, "label": "true", "confidence": 0.9},
+            {"sentence": "fire is hot", "label": "true", "confidence": 0.9},
+            {"sentence": "Ice is cld.", "label": "true", "confidence": 0.9},
+            {"sentence": "Something else entirely.", "label": "true", "confidence": 0.9},
+        ]
+        with self.assertLogs("truthlens.services.analysis.persist_results", "WARNING"):
+            save_analysis_results(document, {"sentences": items}, sentences=[wet, hot, cold])
+
+        self.assertEqual(
+            {method: metrics.ANALYSIS_ITEMS_MATCHED.value(method=method) - before[method] for method in before},
+            {"id": 1, "text": 1, "fuzzy": 1},
+        )
+        self.assertEqual(metrics.ANALYSIS_ITEMS_UNMATCHED.value(), unmatched + 1)
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('truthlens_analysis_items_matched_total{method="fuzzy"}', body)
+        self.assertIn("truthlens_analysis_items_unmatched_total ", body)
+
+
+class ClaimScreenerTests(TestCase):
+    """Non-claims skip the models; only checkable or doubtful claims reach the large one."""
+
+    def setUp(self):
+        clear_hot_tier()
+        user = User.objects.create(username="screen", email="screen@example.com", password="x")
+        self.document = Document.objects.create(
+            user_id=user,
+            title="Doc",
+            content=(
+                "Hello everyone. Cats are nice animals. "
+                "Mount Everest is the tallest mountain on Earth. Dogs bark at night."
+            ),
+        )
+        self.calls = []
+
+    def tearDown(self):
+        clear_hot_tier()
+
+    def _fake_chat(self, prompt, model, system=None):
+        sentences = prompt.split("Text to analyze:\n")[1].split("\n\nReturn")[0].split("\n")
+        self.calls.append((model, len(sentences)))
+        confidence = {"Cats are nice animals.": 0.9}
+        items = [
+            {
+                "sentence": line.split("] ", 1)[1],
+                "label": "true",
+                "confidence": confidence.get(line.split("] ", 1)[1], 0.5) if model == "small-model" else 0.8,
+            }
+            for line in sentences
+        ]
+        return ChatResult(text=json.dumps({"sentences": items}), timings=OllamaTimings())
+
+    def test_tiers(self):
+        screener = ClaimScreener(small_model="small-model")
+        self.assertEqual(
+            [screener.screen(text).tier for text in ("Thanks!", "Chapter one:", "Cats are nice animals.",
+                                                     "Water boils at 100 degrees in Paris.")],
+            ["skip", "skip", "small", "large"],
+        )
+
+    def test_only_non_claims_are_skipped(self):
+        screener = ClaimScreener(small_model="small-model")
+        for text in ("", "   ", "Thanks!", "Hello everyone.", "Is this true?", "Key findings:"):
+            self.assertEqual(screener.screen(text).tier, "skip", text)
+
+        # Framing words and missing full stops say nothing about the claim behind them.
+        for text in (
+            "Note that vaccines cause autism.",
+            "Remember that smoking cures cancer.",
+            "Smoking cures lung cancer",
+            "Dear readers, Einstein failed math.",
+            "Thanks to vitamin C, colds disappear overnight.",
+            "I think the moon is made of cheese.",
+        ):
+            self.assertNotEqual(screener.screen(text).tier, "skip", text)
+
+    @override_settings(OLLAMA_SCREENER_MODEL="small-model")
+    def test_routing_and_escalation(self):
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", self._fake_chat):
+            result = analyze_document(self.document.document_id)
+
+        self.assertEqual(self.calls, [("small-model", 2), (ANALYSIS_MODEL, 2)])
+        self.assertEqual(
+            {key: result["tiers"][key] for key in ("screened", "skipped", "small", "small_accepted", "escalated", "large")},
+            {"screened": 4, "skipped": 1, "small": 2, "small_accepted": 1, "escalated": 1, "large": 2},
+        )
+        self.assertFalse(
+            Sentence.objects.filter(document_id=self.document, analyzed_at__isnull=True).exists()
+        )
+
+        # Only large-model verdicts are cached under OLLAMA_MODEL.
+        clear_hot_tier()
+        cached = VerdictCache(model=ANALYSIS_MODEL, prompt_version=ANALYSIS_PROMPT_VERSION).get_many(
+            ["Cats are nice animals.", "Dogs bark at night.", "Mount Everest is the tallest mountain on Earth."]
+        )
+        self.assertEqual(set(cached), {"Dogs bark at night.", "Mount Everest is the tallest mountain on Earth."})
+
+
+class StreamAnalysisTests(TestCase):
+    """Verdicts stream as they arrive and are saved together at the end."""
+
+    def setUp(self):
+        clear_hot_tier()
+        user = User.objects.create(username="stream", email="stream@example.com", password="x")
+        self.document = Document.objects.create(user_id=user, title="Doc", content=_document_text(3))
+        self.sentences = sync_document_sentences(document=self.document)
+        save_analysis_results(self.document, _analysis_for(self.sentences), sentences=self.sentences)
+
+    def tearDown(self):
+        clear_hot_tier()
+
+    def _fake_stream(self, prompt, model, system=None, on_result=None):
+        sentences = prompt.split("Text to analyze:\n")[1].split("\n\nReturn")[0].split("\n")
+        items = [{"sentence": line.split("] ", 1)[1], "label": "true", "confidence": 0.9} for line in sentences]
+        reply = json.dumps({"sentences": items})
+        for start in range(0, len(reply), 16):
+            yield reply[start:start + 16]
+
+    def _events(self, body: bytes) -> list[tuple[str, dict]]:
+        events = []
+        for block in body.decode().strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    def test_post_streams_and_saves(self):
+        url = f"/api/documents/{self.document.document_id}/analyze/stream/"
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        with mock.patch("truthlens.services.analysis.analysis_service.stream_ollama", self._fake_stream):
+            response = self.client.post(url)
+            events = self._events(b"".join(response.streaming_content))
+
+        self.assertEqual([event for event, _ in events], ["sentence"] * 3 + ["done"])
+        self.assertEqual(events[-1][1]["analyzed"], 3)
+        self.assertFalse(Sentence.objects.filter(document_id=self.document, flags=True).exists())
+        self.assertFalse(Correction.objects.filter(sentence_id__document_id=self.document).exists())
+
+    def test_disconnect_keeps_previous_results(self):
+        with mock.patch("truthlens.services.analysis.analysis_service.stream_ollama", self._fake_stream):
+            events = stream_document_analysis(self.document.document_id)
+            self.assertEqual(next(events)[0], "sentence")
+            events.close()
+
+        self.assertEqual(Sentence.objects.filter(document_id=self.document, flags=True).count(), 3)
+        self.assertEqual(Correction.objects.filter(sentence_id__document_id=self.document).count(), 3)
+
+
+class AnalysisJobQueueTests(TestCase):
+    """Workers claim jobs once, requeue jobs whose heartbeat stopped and record failures."""
+
+    def setUp(self):
+        user = User.objects.create(username="jobs", email="jobs@example.com", password="x")
+        self.document = Document.objects.create(user_id=user, title="Doc", content=_document_text(2))
+
+    def test_claim(self):
+        first = enqueue_analysis(self.document.document_id)
+        self.assertEqual(enqueue_analysis(self.document.document_id), first)
+
+        job = claim_next_job()
+        self.assertEqual((job.pk, job.status, job.attempts), (first.pk, AnalysisJob.STATUS_RUNNING, 1))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNone(claim_next_job())
+
+    def test_requeue_follows_the_heartbeat(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        alive, dead, exhausted = (
+            AnalysisJob.objects.create(
+                document_id=self.document,
+                status=AnalysisJob.STATUS_RUNNING,
+                started_at=long_ago,
+                heartbeat_at=heartbeat,
+                attempts=attempts,
+            )
+            for heartbeat, attempts in ((timezone.now(), 1), (long_ago, 1), (long_ago, 3))
+        )
+
+        self.assertEqual(requeue_stale_jobs(older_than=timedelta(minutes=10), max_attempts=3), 2)
+        statuses = dict(AnalysisJob.objects.values_list("pk", "status"))
+        self.assertEqual(
+            [statuses[job.pk] for job in (alive, dead, exhausted)],
+            [AnalysisJob.STATUS_RUNNING, AnalysisJob.STATUS_QUEUED, AnalysisJob.STATUS_FAILED],
+        )
+
+    def test_failure_is_recorded_and_logged(self):
+        enqueue_analysis(self.document.document_id)
+        job = claim_next_job()
+        with mock.patch(
+            "truthlens.services.jobs.job_service.analyze_document", side_effect=ValidationError("model down")
+        ), self.assertLogs("truthlens.services.jobs.job_service", "ERROR") as logs:
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.STATUS_FAILED)
+        self.assertIn("model down", job.error)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn("Traceback", logs.output[0])
+
+
+class BatchAnalysisTests(TestCase):
+    """A batch asks the model once per distinct sentence; its endpoint validates the body."""
+
+    URL = "/api/documents/analyze/batch/"
+
+    def setUp(self):
+        clear_hot_tier()
+        self.user = User.objects.create(username="batch", email="batch@example.com", password="x")
+        shared = "Mount Everest is the tallest mountain on Earth."
+        self.documents = [
+            Document.objects.create(user_id=self.user, title=prefix, content=f"{shared} {_document_text(2, prefix)}")
+            for prefix in ("Alpha", "Beta")
+        ]
+        self.asked = []
+
+    def tearDown(self):
+        clear_hot_tier()
+
+    def _fake_chat(self, prompt, model, system=None):
+        sentences = [
+            line.split("] ", 1)[1]
+            for line in prompt.split("Text to analyze:\n")[1].split("\n\nReturn")[0].split("\n")
+        ]
+        self.asked.extend(sentences)
+        items = [{"sentence": sentence, "label": "true", "confidence": 0.8} for sentence in sentences]
+        return ChatResult(text=json.dumps({"sentences": items}), timings=OllamaTimings())
+
+    def test_shared_sentences_are_judged_once(self):
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", self._fake_chat):
+            result = analyze_documents([document.document_id for document in self.documents])
+
+        self.assertEqual(self.asked.count("Mount Everest is the tallest mountain on Earth."), 1)
+        self.assertEqual(len(self.asked), 5)
+        self.assertEqual((result["sentences"], result["unique_sentences"]), (6, 5))
+        self.assertFalse(Sentence.objects.filter(document_id__in=self.documents, analyzed_at__isnull=True).exists())
+
+    def test_endpoint_queues_one_job(self):
+        response = self.client.post(
+            self.URL, {"user_id": self.user.pk, "incremental": "false"}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 202)
+        job = AnalysisJob.objects.get(pk=response.json()["job_id"])
+        self.assertEqual(job.document_ids, [document.document_id for document in self.documents])
+        self.assertFalse(job.incremental)
+
+    def test_endpoint_rejects_bad_input(self):
+        for body in (
+            {"user_id": "abc"},
+            {"user_id": self.user.pk, "incremental": "maybe"},
+            {"document_ids": []},
+            {"document_ids": ["x"]},
+            {},
+        ):
+            response = self.client.post(self.URL, body, content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(AnalysisJob.objects.exists())
+
+
+class WindowPackingTests(TestCase):
+    """Windows hold the whole request, context and prompt included, within the token budget."""
+
+    TEN_TOKENS = "x" * 40
+
+    def _spans(self, windows):
+        return [(window.context_start, window.start, window.end) for window in windows]
+
+    def test_packs_sentences_up_to_the_budget(self):
+        windows = pack_windows([self.TEN_TOKENS] * 7, token_budget=30)
+        self.assertEqual(self._spans(windows), [(0, 0, 3), (3, 3, 6), (6, 6, 7)])
+
+    def test_overlap_and_reserved_tokens_count(self):
+        windows = pack_windows([self.TEN_TOKENS] * 7, token_budget=40, overlap=1, reserved_tokens=5)
+        self.assertEqual(self._spans(windows), [(0, 0, 3), (2, 3, 5), (4, 5, 7)])
+
+    def test_sentence_over_budget_gets_its_own_window(self):
+        sentences = [self.TEN_TOKENS, "y" * 400, self.TEN_TOKENS]
+        self.assertEqual(self._spans(pack_windows(sentences, token_budget=30)), [(0, 0, 1), (1, 1, 2), (2, 2, 3)])
+        windows = pack_windows([self.TEN_TOKENS] * 3, token_budget=10, reserved_tokens=50)
+        self.assertEqual([window.end - window.start for window in windows], [1, 1, 1])
+
+    @override_settings(ANALYSIS_CHUNK_TOKENS=400, ANALYSIS_CHUNK_OVERLAP=2)
+    def test_requests_fit_the_budget(self):
+        rows = [
+            Sentence(sentence_id=index, content=f"Sentence {index} says something about topic {index * 7}.")
+            for index in range(120)
+        ]
+        # An incremental run: every sentence brings unchanged neighbours along as context.
+        pending = [index for index in range(120) if index % 3]
+        requests = _window_requests(rows, pending)
+
+        self.assertGreater(len(requests), 2)
+        self.assertEqual(sum(len(ids) for _, _, ids, _ in requests), len(pending))
+        for members, context, _, _ in requests:
+            used = _PROMPT_TOKENS + sum(estimate_tokens(text) for text in members + context)
+            self.assertLessEqual(used, 400)
+
+
+class WindowRetryTests(TestCase):
+    """Windows that come back garbled are split; sentences a reply leaves out are asked again."""
+
+    def setUp(self):
+        clear_hot_tier()
+        user = User.objects.create(username="retry", email="retry@example.com", password="x")
+        self.document = Document.objects.create(user_id=user, title="Doc", content=_document_text(4))
+        self.calls = []
+
+    def tearDown(self):
+        clear_hot_tier()
+
+    @staticmethod
+    def _asked(prompt: str) -> list[str]:
+        lines = prompt.split("Text to analyze:\n")[1].split("\n\nReturn")[0].split("\n")
+        return [line.split("] ", 1)[1] for line in lines]
+
+    @staticmethod
+    def _reply(sentences: list[str]) -> str:
+        items = [
+            {"id": number, "sentence": sentence, "label": "true", "confidence": 0.9}
+            for number, sentence in enumerate(sentences, start=1)
+        ]
+        return json.dumps({"sentences": items})
+
+    def _analyzed(self) -> int:
+        return Sentence.objects.filter(document_id=self.document, analyzed_at__isnull=False).count()
+
+    def test_missing_ids_are_asked_again(self):
+        def chat(prompt, model, system=None):
+            asked = self._asked(prompt)
+            self.calls.append(len(asked))
+            reply = json.loads(self._reply(asked))
+            if len(asked) > 1:
+                del reply["sentences"][1]
+            return ChatResult(text=json.dumps(reply), timings=OllamaTimings())
+
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", chat):
+            result = analyze_document(self.document.document_id)
+
+        self.assertEqual(self.calls, [4, 1])
+        self.assertEqual(result["matching"]["match_rate"], 1.0)
+        self.assertEqual(self._analyzed(), 4)
+
+    def test_garbled_window_is_split(self):
+        def chat(prompt, model, system=None):
+            asked = self._asked(prompt)
+            self.calls.append(len(asked))
+            text = "not json" if len(asked) > 2 else self._reply(asked)
+            return ChatResult(text=text, timings=OllamaTimings())
+
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", chat), \
+                self.assertLogs("truthlens.services.analysis.analysis_service", "WARNING"):
+            analyze_document(self.document.document_id)
+
+        self.assertEqual(self.calls, [4, 2, 2])
+        self.assertEqual(self._analyzed(), 4)
+
+    @override_settings(ANALYSIS_WINDOW_SPLITS=0)
+    def test_split_depth_is_bounded(self):
+        def chat(prompt, model, system=None):
+            self.calls.append(len(self._asked(prompt)))
+            return ChatResult(text="not json", timings=OllamaTimings())
+
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", chat), \
+                self.assertLogs("truthlens.services.analysis.analysis_service", "WARNING"):
+            with self.assertRaises(ValidationError):
+                analyze_document(self.document.document_id)
+
+        self.assertEqual(self.calls, [4])
+
+    def test_stream_asks_again_for_missing_ids(self):
+        def stream(prompt, model, system=None, on_result=None):
+            asked = self._asked(prompt)
+            self.calls.append(("stream", len(asked)))
+            yield self._reply(asked[:-1])
+
+        def chat(prompt, model, system=None):
+            asked = self._asked(prompt)
+            self.calls.append(("chat", len(asked)))
+            return ChatResult(text=self._reply(asked), timings=OllamaTimings())
+
+        with mock.patch("truthlens.services.analysis.analysis_service.stream_ollama", stream), \
+                mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", chat):
+            events = list(stream_document_analysis(self.document.document_id))
+
+        self.assertEqual(self.calls, [("stream", 4), ("chat", 1)])
+        self.assertEqual([event for event, _ in events], ["sentence"] * 4 + ["done"])
+        self.assertEqual(self._analyzed(), 4)
+
+
+class ReplySalvageTests(TestCase):
+    """Fenced, chatty, truncated or partly invalid replies keep every item that completed."""
+
+    ITEMS = [
+        {"id": 1, "sentence": "Water is wet.", "label": "true", "confidence": 0.9},
+        {"id": 2, "sentence": "The sun is cold.", "label": "false", "confidence": 95,
+         "reasoning": 'Not "cold" {at all}.', "suggested_correction": "The sun is hot."},
+        {"id": 3, "sentence": "Cats can fly.", "label": "false", "confidence": 0.8},
+    ]
+
+    def _reply(self) -> str:
+        return json.dumps({"sentences": self.ITEMS}, indent=2)
+
+    def test_fenced_reply_with_chatter(self):
+        result = extract_sentence_items(f"Sure! Here is the analysis:\n```json\n{self._reply()}\n```\nHope it helps.")
+
+        self.assertTrue(result.complete)
+        self.assertFalse(result.partial)
+        self.assertEqual([item["id"] for item in result.items], [1, 2, 3])
+        self.assertEqual(result.items[1]["reasoning"], 'Not "cold" {at all}.')
+        self.assertEqual(result.items[1]["confidence"], 0.95)
+
+    def test_truncated_reply_keeps_completed_items(self):
+        reply = self._reply()
+        result = extract_sentence_items(reply[:reply.index('"Cats can fly."') + 10])
+
+        self.assertEqual([item["sentence"] for item in result.items], ["Water is wet.", "The sun is cold."])
+        self.assertFalse(result.complete)
+        self.assertTrue(result.partial)
+
+    def test_items_stream_out_as_they_close(self):
+        parser = SentenceStreamParser()
+        reply = self._reply()
+        first_close = reply.index("}") + 1
+
+        self.assertEqual(parser.feed(reply[:first_close - 1]), [])
+        self.assertEqual([item["id"] for item in parser.feed(reply[first_close - 1:first_close])], [1])
+        self.assertEqual([item["id"] for item in parser.feed(reply[first_close:])], [2, 3])
+        self.assertTrue(parser.complete)
+
+    def test_invalid_and_malformed_items_are_reported(self):
+        reply = (
+            '{"sentences": [{"sentence": "Fine.", "label": "TRUE", "confidence": 0.7}, '
+            '{"sentence": "Bad label.", "label": "maybe"}, {"sentence": "Broken", "label": tru}]}'
+        )
+        result = extract_sentence_items(reply)
+
+        self.assertEqual([(item["sentence"], item["label"]) for item in result.items], [("Fine.", "true")])
+        # The broken item, and the reply object around it.
+        self.assertEqual(result.errors, ["invalid label 'maybe'", "2 malformed object(s)"])
+        self.assertTrue(result.partial)
+
+    def test_extract_object_skips_prose(self):
+        self.assertEqual(extract_object('The answer is {"is_flagged": false} as "shown".'), {"is_flagged": False})
+        self.assertIsNone(extract_object("no json here"))
+
+
+class SentenceAlignmentTests(TestCase):
+    """align() yields SequenceMatcher-style opcodes; pair_near_duplicates() keeps edited rows paired."""
+
+    def _apply(self, old, new, opcodes):
+        """Rebuild ``new`` from ``old``, checking the opcodes cover both sides in order."""
+        rebuilt, i, j = [], 0, 0
+        for tag, i1, i2, j1, j2 in opcodes:
+            self.assertEqual((i1, j1), (i, j))
+            if tag == "equal":
+                self.assertEqual(old[i1:i2], new[j1:j2])
+                rebuilt += old[i1:i2]
+            else:
+                rebuilt += new[j1:j2]
+            i, j = i2, j2
+        self.assertEqual((i, j), (len(old), len(new)))
+        return rebuilt
+
+    def test_opcodes(self):
+        self.assertEqual(align([], ["a", "b"]), [("insert", 0, 0, 0, 2)])
+        self.assertEqual(align(["a", "b"], []), [("delete", 0, 2, 0, 0)])
+        self.assertEqual(align(["a", "b"], ["a", "b"]), [("equal", 0, 2, 0, 2)])
+        self.assertEqual(
+            align(["a", "b", "c", "d"], ["a", "b", "x", "d"]),
+            [("equal", 0, 2, 0, 2), ("replace", 2, 3, 2, 3), ("equal", 3, 4, 3, 4)],
+        )
+        # A moved sentence is one insert and one delete; the rest stays matched.
+        self.assertEqual(
+            align(["a", "b", "c"], ["c", "a", "b"]),
+            [("insert", 0, 0, 0, 1), ("equal", 0, 2, 1, 3), ("delete", 2, 3, 3, 3)],
+        )
+        # Repeated sentences (no unique anchor) still align.
+        self.assertEqual(
+            align(["a", "a", "a", "b"], ["a", "a", "b"]),
+            [("equal", 0, 2, 0, 2), ("delete", 2, 3, 2, 2), ("equal", 3, 4, 2, 3)],
+        )
+
+    def test_opcodes_rebuild_random_edits(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            old = [rng.choice("abcdefgh") for _ in range(rng.randint(0, 30))]
+            new = list(old)
+            for _ in range(rng.randint(0, 6)):
+                position = rng.randint(0, len(new))
+                action = rng.choice(("insert", "delete", "replace"))
+                if action == "insert" or not new:
+                    new.insert(position, rng.choice("abcdefghxyz"))
+                elif action == "delete":
+                    del new[min(position, len(new) - 1)]
+                else:
+                    new[min(position, len(new) - 1)] = rng.choice("xyz")
+
+            self.assertEqual(self._apply(old, new, align(old, new)), new)
+
+    def test_pair_near_duplicates(self):
+        old = ["The cat sat on the mat.", "Totally different text here.", "Dogs bark at night loudly."]
+        new = ["The cat sat on a mat.", "Dogs bark at night, loudly.", "Something unrelated."]
+        self.assertEqual(pair_near_duplicates(old, new), [(0, 0), (2, 1)])
+
+        # Pairs keep their order, and candidates lie within the window.
+        swapped = pair_near_duplicates(["B sentence one.", "A sentence two."], ["A sentence two.", "B sentence one."])
+        self.assertEqual(swapped, [(0, 1)])
+        far = ["Unrelated filler line."] * 8 + ["Alpha sentence is here!"]
+        self.assertEqual(pair_near_duplicates(["Alpha sentence is here."], far), [])
+        self.assertEqual(pair_near_duplicates(["Alpha sentence is here."], far, window=9), [(0, 8)])
+
+
+class ItemMatchingTests(TestCase):
+    """Model items reach the right rows even when the echoed text drifts."""
+
+    def setUp(self):
+        user = User.objects.create(username="matcher", email="matcher@example.com", password="x")
+        self.document = Document.objects.create(
+            user_id=user,
+            title="Doc",
+            content="The Eiffel Tower is in Paris. It was built in 1889. It is made of iron. Paris is in France.",
+        )
+        self.sentences = sync_document_sentences(document=self.document)
+
+    def _item(self, sentence: str, **extra) -> dict:
+        return {"sentence": sentence, "label": "false", "confidence": 0.7, **extra}
+
+    def test_ids_text_and_fuzzy_fallbacks(self):
+        eiffel, built, iron, france = self.sentences
+        with self.assertLogs("truthlens.services.analysis.persist_results", "WARNING"):
+            report = save_analysis_results(
+                self.document,
+                {
+                    "sentences": [
+                        self._item("The Eiffel Tower is in Paris.", sentence_id=eiffel.sentence_id),
+                        self._item("it was built in 1889"),
+                        self._item("It is made of irn.", sentence_id=999),
+                        self._item("Paris is a city in France."),
+                    ]
+                },
+                sentences=self.sentences,
+            )
+
+        self.assertEqual(
+            report,
+            {"items": 4, "by_id": 1, "by_text": 1, "by_fuzzy": 1, "unmatched": 1, "match_rate": 0.75, "stale": 0},
+        )
+        flagged = Sentence.objects.filter(document_id=self.document, flags=True)
+        self.assertEqual(set(flagged.values_list("content", flat=True)), {eiffel.content, built.content, iron.content})
+
+    def test_shifted_id_does_not_move_verdict(self):
+        eiffel, built, _, _ = self.sentences
+        report = save_analysis_results(
+            self.document,
+            {"sentences": [self._item("It was built in 1889.", sentence_id=eiffel.sentence_id)]},
+            sentences=self.sentences,
+        )
+
+        self.assertEqual((report["by_id"], report["by_text"]), (0, 1))
+        self.assertEqual(
+            list(Sentence.objects.filter(document_id=self.document, flags=True).values_list("pk", flat=True)),
+            [built.sentence_id],
+        )
+
+
+class StaleAnalysisResultsTests(TestCase):
+    """Verdicts are not written onto rows that changed while the model was answering."""
+
+    def setUp(self):
+        user = User.objects.create(username="stale", email="stale@example.com", password="x")
+        self.document = Document.objects.create(user_id=user, title="Doc", content=_document_text(3))
+        self.sentences = sync_document_sentences(document=self.document)
+
+    def test_rewritten_and_deleted_rows_are_skipped(self):
+        analysis = _analysis_for(self.sentences)
+        rewritten, deleted, kept = self.sentences
+        Sentence.objects.filter(pk=rewritten.pk).update(content="Paris is the capital of France.")
+        Sentence.objects.filter(pk=deleted.pk).delete()
+
+        with self.assertLogs("truthlens.services.analysis.persist_results", "WARNING"):
+            report = save_analysis_results(self.document, analysis, sentences=self.sentences)
+
+        self.assertEqual(report["stale"], 2)
+        rewritten.refresh_from_db()
+        self.assertEqual((rewritten.flags, rewritten.analyzed_at), (False, None))
+        self.assertEqual(
+            list(Correction.objects.values_list("sentence_id", flat=True)),
+            [kept.sentence_id],
+        )
+
+    def test_row_edited_during_the_model_call(self):
+        clear_hot_tier()
+        self.addCleanup(clear_hot_tier)
+        edited = self.sentences[0]
+
+        def chat(prompt, model, system=None):
+            Sentence.objects.filter(pk=edited.pk).update(content="Paris is the capital of France.")
+            lines = prompt.split("Text to analyze:\n")[1].split("\n\nReturn")[0].split("\n")
+            items = [
+                {"sentence": line.split("] ", 1)[1], "label": "false", "confidence": 0.9,
+                 "suggested_correction": line.split("] ", 1)[1]}
+                for line in lines
+            ]
+            return ChatResult(text=json.dumps({"sentences": items}), timings=OllamaTimings())
+
+        with mock.patch("truthlens.services.analysis.analysis_service.chat_ollama", chat), \
+                self.assertLogs("truthlens.services.analysis.persist_results", "WARNING"):
+            result = analyze_document(self.document.document_id)
+
+        self.assertEqual(result["matching"]["stale"], 1)
+        edited.refresh_from_db()
+        self.assertEqual((edited.flags, edited.analyzed_at), (False, None))
+        self.assertFalse(Correction.objects.filter(sentence_id=edited).exists())
+        self.assertEqual(Sentence.objects.filter(document_id=self.document, flags=True).count(), 2)
+
+    def test_document_edited_since_planning_is_skipped(self):
+        analysis = _analysis_for(self.sentences)
+        update_document(self.document.document_id, content="Paris is the capital of France.")
+
+        with self.assertLogs("truthlens.services.analysis.persist_results", "WARNING"):
+            report = save_analysis_results(self.document, analysis, sentences=self.sentences)
+
+        self.assertEqual(report["stale"], 3)
+        self.assertFalse(Sentence.objects.filter(document_id=self.document, analyzed_at__isnull=False).exists())
+        self.assertFalse(Correction.objects.exists())
+
+
+class BulkPersistenceQueryCountTests(TestCase):
+    """Persistence must issue the same number of statements for any document size.
+
+    Sizes stay below SQLite's bound-parameter limit, past which Django splits
+    bulk statements into batches; PostgreSQL has no such split.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="writer", email="writer@example.com", password="x")
+
+    def _document(self, count: int) -> Document:
+        return Document.objects.create(user_id=self.user, title="Doc", content=_document_text(count))
+
+    def test_initial_sync_query_count(self):
+        for count in (3, 100):
+            document = self._document(count)
+            # SELECT existing, then SAVEPOINT / INSERT / mark revision synced / RELEASE.
+            with self.assertNumQueries(5):
+                sentences = sync_document_sentences(document=document)
+            self.assertEqual(len(sentences), count)
+
+    def test_resync_query_count(self):
+        for count in (3, 100):
+            document = self._document(count)
+            sync_document_sentences(document=document)
+
+            edited = _document_text(count, prefix="Edited") + " " + _document_text(count)
+            # SELECT existing, then SAVEPOINT / UPDATE / INSERT / RELEASE.
+            with self.assertNumQueries(5):
+                sentences = sync_document_sentences(document=document, text=edited)
+            self.assertEqual(len(sentences), 2 * count)
+
+    def test_save_analysis_results_query_count(self):
+        for count in (3, 100):
+            document = self._document(count)
+            sentences = sync_document_sentences(document=document)
+
+            # SAVEPOINT / lock document / re-read rows / DELETE corrections /
+            # UPDATE sentences / INSERT corrections / bump analysis revision / RELEASE.
+            with self.assertNumQueries(8):
+                save_analysis_results(document, _analysis_for(sentences), sentences=sentences)
+
+            self.assertEqual(Sentence.objects.filter(document_id=document, flags=True).count(), count)
+            self.assertEqual(Correction.objects.filter(sentence_id__document_id=document).count(), count)
+
+    def test_query_count_does_not_grow_with_document_size(self):
+        counts = []
+        for count in (10, 100):
+            document = self._document(count)
+            with CaptureQueriesContext(connection) as queries:
+                sentences = sync_document_sentences(document=document)
+                save_analysis_results(document, _analysis_for(sentences), sentences=sentences)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class DocumentSnapshotTests(TestCase):
+    """One request returns a document with its sentences and corrections."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="snap", email="snap@example.com", password="x")
+
+    def _analyzed_document(self, count: int) -> Document:
+        document = Document.objects.create(user_id=self.user, title="Doc", content=_document_text(count))
+        sentences = sync_document_sentences(document=document)
+        save_analysis_results(document, _analysis_for(sentences), sentences=sentences)
+        return document
+
+    def _url(self, document: Document) -> str:
+        return f"/api/documents/{document.document_id}/snapshot/"
+
+    def test_query_count_is_constant(self):
+        for count in (3, 100):
+            document = self._analyzed_document(count)
+            # Document, sentences, corrections of all sentences.
+            with self.assertNumQueries(3):
+                response = self.client.get(self._url(document))
+
+            body = response.json()
+            self.assertEqual(len(body["sentences"]), count)
+            self.assertTrue(all(len(sentence["corrections"]) == 1 for sentence in body["sentences"]))
+
+    def test_etag_revalidation(self):
+        document = self._analyzed_document(5)
+        etag = self.client.get(self._url(document))["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self._url(document), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        sentences = list(Sentence.objects.filter(document_id=document).order_by("start_index"))
+        save_analysis_results(document, {"sentences": []}, sentences=sentences)
+        response = self.client.get(self._url(document), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(sum(len(sentence["corrections"]) for sentence in response.json()["sentences"]), 0)
+
+        etag = response["ETag"]
+        update_document(document.document_id, title="Renamed")
+        response = self.client.get(self._url(document), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["document"]["title"], "Renamed")
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Views stay within QUERY_BUDGETS however many sentences a document has."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="budget", email="budget@example.com", password="x")
+        self.document = self._document()
+        self.sentences = list(Sentence.objects.filter(document_id=self.document).order_by("start_index"))
+
+    def _document(self, *, stale: bool = False) -> Document:
+        document = Document.objects.create(user_id=self.user, title="Doc", content=_document_text(60))
+        sentences = sync_document_sentences(document=document)
+        save_analysis_results(document, _analysis_for(sentences), sentences=sentences)
+        if stale:
+            # Change the text behind the rows' back: one sentence gone, one reworded, two added.
+            content = document.content.replace("Claim number 0 is stated here. ", "", 1).replace(
+                "number 5 is stated", "number 5 is claimed", 1
+            ) + " A brand new claim appears here. Another new claim appears here."
+            Document.objects.filter(pk=document.pk).update(content=content, revision=document.revision + 1)
+        return document
+
+    def test_endpoints_within_budget(self):
+        # Every budgeted view, on synced documents and on ones that must resync first.
+        for stale in (False, True):
+            with self.subTest(stale=stale):
+                self._exercise(lambda: self._document(stale=stale).pk)
+
+    def _exercise(self, setup):
+        doc = setup()
+        self.assertEqual(self.client.get("/api/documents/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/documents/{doc}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/documents/{doc}/sentences/").status_code, 200)
+        doc = setup()
+        self.assertEqual(self.client.get(f"/api/documents/{doc}/snapshot/").status_code, 200)
+
+        doc = setup()
+        last = Sentence.objects.filter(document_id=doc).order_by("start_index").last()
+        self.assertEqual(self.client.get(f"/api/sentences/{last.sentence_id}/corrections/").status_code, 200)
+        correction = Correction.objects.get(sentence_id=last)
+        response = self.client.post(f"/api/sentences/{last.sentence_id}/apply/{correction.correction_id}/")
+        self.assertEqual(response.status_code, 200)
+
+        doc = setup()
+        pairs = [
+            {"sentence_id": c.sentence_id_id, "correction_id": c.correction_id}
+            for c in Correction.objects.filter(sentence_id__document_id=doc).order_by("-sentence_id")[:3]
+        ]
+        response = self.client.post(
+            f"/api/documents/{doc}/apply-corrections/", {"corrections": pairs}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        doc = setup()
+        response = self.client.post(
+            f"/api/documents/{doc}/edit/", {"op": "delete", "offset": 0, "length": 31}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        doc = setup()
+        content = "Gone. " + Document.objects.get(pk=doc).content[31:] + " One more claim is added."
+        response = self.client.put(f"/api/documents/{doc}/update/", {"content": content}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(f"/api/documents/{doc}/analyze/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(f"/api/jobs/{response.json()['job_id']}/").status_code, 200)
+
+    def test_over_budget(self):
+        url = f"/api/documents/{self.document.document_id}/"
+        with override_settings(QUERY_BUDGETS={"get_document_api": 0}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "get_document_api"):
+                self.client.get(url)
+
+            with override_settings(QUERY_BUDGET_STRICT=False):
+                with self.assertLogs("truthlens.middleware", "WARNING"):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_repeated_statements_are_reported(self):
+        with self.assertLogs("truthlens.middleware", "WARNING") as logs:
+            with query_budget(2, "per-row loop") as recorder:
+                for sentence in self.sentences[:5]:
+                    Sentence.objects.get(sentence_id=sentence.sentence_id)
+        self.assertEqual(recorder.count, 5)
+        self.assertIn("most repeated (5x)", logs.output[0])
+
+    @override_settings(QUERY_PROFILING_HEADER=True)
+    def test_profile_header(self):
+        response = self.client.get(f"/api/documents/{self.document.document_id}/sentences/", HTTP_X_PROFILE="sql")
+        self.assertEqual(response["X-Query-Count"], "2")
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class SentenceListingRevisionTests(TestCase):
+    """Listing sentences only re-syncs when the document revision moved."""
+
+    def setUp(self):
+        user = User.objects.create(username="reader", email="reader@example.com", password="x")
+        self.document = Document.objects.create(user_id=user, title="Doc", content=_document_text(20))
+        self.url = f"/api/documents/{self.document.document_id}/sentences/"
+
+    def test_unchanged_document_is_read_only(self):
+        self.client.get(self.url)
+
+        # Document row + one ordered SELECT of its sentences.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 20)
+
+    def test_content_update_triggers_resync(self):
+        self.client.get(self.url)
+        update_document(self.document.document_id, content=_document_text(5))
+
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 5)
+
+    def test_title_update_keeps_revision(self):
+        update_document(self.document.document_id, title="Renamed")
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.revision, 1)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class DocumentListPaginationTests(TestCase):
+    """Document listing walks keyset pages without loading content."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="lister", email="lister@example.com", password="x")
+        Document.objects.bulk_create(
+            [Document(user_id=self.user, title=f"Doc {index}", content="x" * 1000) for index in range(7)]
+        )
+
+    def test_pages_cover_every_document_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"user_id": self.user.user_id, "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            body = self.client.get("/api/documents/", params).json()
+            seen.extend(doc["document_id"] for doc in body["results"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(Document.objects.order_by("-created_at", "-document_id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_content_is_not_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/documents/", {"user_id": self.user.user_id})
+        self.assertNotIn("content", queries[-1]["sql"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/documents/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApplyCorrectionsTests(TestCase):
+    """Bulk apply rewrites the text once and rebases offsets without re-diffing."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="editor", email="editor@example.com", password="x")
+
+    def _prepare(self, count: int, replacement: str = "Claim {} is now corrected at length."):
+        document = Document.objects.create(user_id=self.user, title="Doc", content=_document_text(count))
+        sentences = sync_document_sentences(document=document)
+        pairs = []
+        for sentence in sentences[::2]:
+            correction = Correction.objects.create(
+                sentence_id=sentence,
+                suggested_correction=replacement.format(sentence.sentence_id),
+                reasoning="r",
+            )
+            pairs.append((sentence.sentence_id, correction.correction_id))
+        return document, pairs
+
+    def _assert_rows_match_text(self, document):
+        rows = [
+            (s.content, s.start_index, s.end_index)
+            for s in Sentence.objects.filter(document_id=document).order_by("start_index")
+        ]
+        expected = [(s.content, s.start_index, s.end_index) for s in _extract_sentence_slices(document.content)]
+        self.assertEqual(rows, expected)
+
+    def test_offsets_match_resegmented_text(self):
+        document, pairs = self._prepare(20)
+        document = apply_corrections(document.document_id, pairs)
+
+        self._assert_rows_match_text(document)
+        self.assertEqual(document.sentences_revision, document.revision)
+        self.assertFalse(Correction.objects.exists())
+
+    def test_query_count_does_not_grow_with_corrections(self):
+        counts = []
+        for count in (6, 60):
+            document, pairs = self._prepare(count)
+            with CaptureQueriesContext(connection) as queries:
+                apply_corrections(document.document_id, pairs)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_multi_sentence_replacement_resyncs(self):
+        document, pairs = self._prepare(4, replacement="Split {} here. Into two.")
+        document = apply_corrections(document.document_id, pairs)
+
+        self._assert_rows_match_text(document)
+        self.assertEqual(Sentence.objects.filter(document_id=document).count(), 6)
+
+
+class OffsetEditTests(TestCase):
+    """In-place edits keep rows identical to a fresh segmentation without a full sync."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="typist", email="typist@example.com", password="x")
+
+    def _document(self, count: int) -> Document:
+        document = Document.objects.create(user_id=self.user, title="Doc", content=_document_text(count))
+        sync_document_sentences(document=document)
+        return document
+
+    def _assert_rows_match_text(self, document):
+        document.refresh_from_db()
+        rows = [
+            (s.content, s.start_index, s.end_index)
+            for s in Sentence.objects.filter(document_id=document).order_by("start_index")
+        ]
+        expected = [(s.content, s.start_index, s.end_index) for s in _extract_sentence_slices(document.content)]
+        self.assertEqual(rows, expected)
+        self.assertEqual(document.sentences_revision, document.revision)
+
+    def test_edits_keep_rows_consistent(self):
+        document = self._document(10)
+        middle = len(document.content) // 2
+
+        insert_text(document.document_id, middle, " Inserted sentence here.")
+        self._assert_rows_match_text(document)
+
+        delete_text(document.document_id, 5, 30)
+        self._assert_rows_match_text(document)
+
+        replace_text(document.document_id, 0, 4, "Merged without a full stop")
+        self._assert_rows_match_text(document)
+
+    def test_later_rows_are_shifted_not_rewritten(self):
+        document = self._document(10)
+        last = Sentence.objects.filter(document_id=document).order_by("-start_index").first()
+
+        insert_text(document.document_id, 0, "Prefix sentence. ")
+
+        last.refresh_from_db()
+        self.assertEqual(last.content, "Claim number 9 is stated here.")
+        self.assertEqual(last.start_index, len("Prefix sentence. ") + document.content.index(last.content))
+
+    def test_query_count_does_not_grow_with_document_size(self):
+        counts = []
+        for count in (10, 100):
+            document = self._document(count)
+            middle = Sentence.objects.filter(document_id=document).order_by("start_index")[count // 2]
+            with CaptureQueriesContext(connection) as queries:
+                insert_text(document.document_id, middle.start_index, "Extra claim here. ")
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN output is PostgreSQL-specific")
+class HotQueryIndexTests(TestCase):
+    """The hot sentence/correction queries must be served by their composite indexes.
+
+    Test tables are tiny, so sequential scans are disabled to make the
+    planner show which index it would pick on a large table.
+    """
+
+    def setUp(self):
+        user = User.objects.create(username="planner", email="planner@example.com", password="x")
+        self.document = Document.objects.create(user_id=user, title="Doc", content=_document_text(50))
+        self.sentences = sync_document_sentences(document=self.document)
+        save_analysis_results(self.document, _analysis_for(self.sentences[:10]), sentences=self.sentences)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_document_sentences_use_position_index(self):
+        queryset = Sentence.objects.filter(document_id=self.document).order_by("start_index", "sentence_id")
+        self.assertUsesIndex(queryset, "sentence_doc_position_idx")
+
+    def test_flagged_sentences_use_partial_index(self):
+        queryset = Sentence.objects.filter(document_id=self.document, flags=True).order_by("start_index")
+        self.assertUsesIndex(queryset, "sentence_flagged_idx")
+
+    def test_sentence_corrections_use_recent_index(self):
+        queryset = Correction.objects.filter(sentence_id=self.sentences[0]).order_by("-created_at")
+        self.assertUsesIndex(queryset, "correction_sentence_recent_idx")
+
+    def test_user_documents_use_recent_index(self):
+        queryset = Document.objects.filter(user_id=self.document.user_id).order_by("-created_at", "-document_id")
+        self.assertUsesIndex(queryset, "document_user_recent_idx")
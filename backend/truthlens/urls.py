@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
-from truthlens.views import home, health_check
+from truthlens.views import home, health_check, metrics
 
 urlpatterns = [
     path("", home),
     path("health/", health_check),
+    path("metrics", metrics),
 
     # API routes
     path("api/", include("truthlens.api.urls")),
@@ -1,9 +1,15 @@
 from django.http import JsonResponse, HttpResponse
 
+from truthlens.ai import metrics as llm_metrics
+
 def home(request):
     return HttpResponse("<h1>TruthLens Backend is Running 🎉</h1>")
 
 def health_check(request):
     return JsonResponse({
         "status": "healthy",
-    })
\ No newline at end of file
+    })
+
+def metrics(request):
+    """Prometheus scrape endpoint for this process's model call metrics."""
+    return HttpResponse(llm_metrics.render(), content_type=llm_metrics.CONTENT_TYPE)
@@ -31,6 +31,82 @@ DEBUG = True
 
 # Model 
 OLLAMA_MODEL = "gpt-oss:20b"
+# Server root; requests go to /api/chat (a trailing /api/generate is ignored).
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://host.docker.internal:11434")
+# How long Ollama keeps the model loaded after a request ("30m", seconds, or -1 for always).
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Load the model and prefill the system prompts when an analysis worker starts.
+OLLAMA_WARMUP = True
+
+# Ollama servers to spread requests over (comma-separated OLLAMA_URLS, default
+# OLLAMA_URL). Entries may also be {"url": ..., "max_concurrency": ...}.
+OLLAMA_BACKENDS = [url.strip() for url in os.environ.get("OLLAMA_URLS", OLLAMA_URL).split(",") if url.strip()]
+# Requests in flight per backend unless the entry says otherwise.
+OLLAMA_BACKEND_MAX_CONCURRENCY = 2
+# Consecutive failures (transport errors, timeouts, 5xx) before a backend is
+# ejected; the ejection lasts BACKOFF seconds, doubling up to MAX_BACKOFF.
+OLLAMA_BACKEND_EJECT_AFTER = 3
+OLLAMA_BACKEND_BACKOFF_SECONDS = 5
+OLLAMA_BACKEND_MAX_BACKOFF_SECONDS = 300
+# How long a request may wait for a free slot when every backend is busy. None
+# waits until one frees up (each request in flight has OLLAMA_TIMEOUT_SECONDS);
+# only ejected backends fail fast.
+OLLAMA_BACKEND_ACQUIRE_TIMEOUT_SECONDS = None
+
+# Claim screening before analysis (truthlens/ai/screener.py). Only empty text,
+# questions, two-word fragments and "...:" headings get no model call; scores
+# from LARGE_FROM up go straight to OLLAMA_MODEL, the rest to
+# OLLAMA_SCREENER_MODEL (e.g. "llama3.2:3b") when set, keeping its verdict
+# only at SMALL_MIN_CONFIDENCE or above.
+SCREENER_ENABLED = True
+SCREENER_LARGE_FROM = 0.7
+OLLAMA_SCREENER_MODEL = os.environ.get("OLLAMA_SCREENER_MODEL") or None
+SCREENER_SMALL_MIN_CONFIDENCE = 0.85
+
+# Pooled Ollama HTTP client
+OLLAMA_TIMEOUT_SECONDS = 60
+OLLAMA_CONNECT_TIMEOUT_SECONDS = 5
+OLLAMA_MAX_CONNECTIONS = 8
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 8
+OLLAMA_KEEPALIVE_EXPIRY_SECONDS = 60
+
+# Verdict cache (in-process hot tier in front of the VerdictCacheEntry table)
+VERDICT_CACHE_HOT_MAX_ENTRIES = 5000
+VERDICT_CACHE_MAX_ENTRIES = 500000
+VERDICT_CACHE_TTL_SECONDS = 60 * 60 * 24 * 30
+VERDICT_CACHE_PRUNE_EVERY = 1000
+# On an exact cache miss, reuse the verdict of a cached sentence with the same
+# content words (differing only in case, punctuation and filler words).
+VERDICT_CACHE_MATCH_REWORDINGS = True
+
+# Chunked analysis: estimated tokens per request, sentences of overlap, parallel
+# requests (both worker counts are capped at the backend pool's total slots)
+ANALYSIS_CHUNK_TOKENS = 1500
+ANALYSIS_CHUNK_OVERLAP = 2
+ANALYSIS_MAX_WORKERS = 4
+# A window whose reply cannot be parsed is retried as two halves, this many
+# levels deep; sentences a reply leaves out are asked again once.
+ANALYSIS_WINDOW_SPLITS = 2
+# Concurrent Ollama requests for batch runs (POST /api/documents/analyze/batch/)
+ANALYSIS_BATCH_MAX_WORKERS = 8
+
+# Analysis job worker (python manage.py run_analysis_worker)
+ANALYSIS_WORKER_POLL_SECONDS = 1.0
+# A running job whose heartbeat is older than this is requeued (checked every
+# ANALYSIS_JOB_REQUEUE_SECONDS by every worker).
+ANALYSIS_JOB_STALE_SECONDS = 600
+ANALYSIS_JOB_HEARTBEAT_SECONDS = 30
+ANALYSIS_JOB_REQUEUE_SECONDS = 60
+ANALYSIS_JOB_MAX_ATTEMPTS = 3
+# Port for each worker's Prometheus metrics (run_analysis_worker --metrics-port); off when None.
+ANALYSIS_WORKER_METRICS_PORT = None
+
+# Dotted path of the sentence segmenter (see services/sentences/segmenter.py)
+SENTENCE_SEGMENTER = "truthlens.services.sentences.segmenter.RuleBasedSegmenter"
+
+# Keyset pagination of GET /api/documents/
+DOCUMENT_LIST_DEFAULT_LIMIT = 50
+DOCUMENT_LIST_MAX_LIMIT = 200
 
 
 ALLOWED_HOSTS = [
@@ -64,8 +140,41 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "truthlens.middleware.QueryProfilingMiddleware",
 ]
 
+# Query accounting (truthlens/middleware.py). QUERY_PROFILING logs every
+# request's SQL count, time and repeated statements; QUERY_PROFILING_HEADER
+# lets an "X-Profile: sql|cprofile|pyinstrument" header turn it on per request.
+QUERY_PROFILING = False
+QUERY_PROFILING_HEADER = DEBUG
+QUERY_DUPLICATE_THRESHOLD = 3
+QUERY_PROFILING_DIR = None
+
+# Most queries each view may run; going over logs a warning, or raises when
+# QUERY_BUDGET_STRICT is on (the query budget tests turn it on). Each budget
+# is the view's worst case, which QueryBudgetTests exercises: a view that
+# touches sentences may find the text changed since the last sync, and the
+# resync replaces its read of the rows with up to 7 queries (rows, rows to
+# delete, their corrections, delete both, bulk update, bulk create, mark
+# synced). Savepoints are not counted.
+QUERY_BUDGETS = {
+    "list_documents_api": 1,
+    "get_document_api": 1,
+    "get_sentence_corrections": 1,
+    "get_analysis_job_api": 1,
+    "analyze_document_api": 3,
+    # Document, sentences (and corrections), or a resync in place of the sentences.
+    "get_document_sentences": 9,
+    "get_document_snapshot_api": 9,
+    # The edit itself plus the resync of the edited text, or of a stale one first.
+    "update_document_api": 10,
+    "edit_document_api": 15,
+    "apply_correction": 18,
+    "apply_corrections_api": 15,
+}
+QUERY_BUDGET_STRICT = False
+
 ROOT_URLCONF = "truthlens.urls"
 
 TEMPLATES = [
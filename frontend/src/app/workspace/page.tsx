@@ -225,6 +225,8 @@ export default function WorkspacePage() {
   const { user, ready } = useAuth();
 
   const [documents, setDocuments] = useState<DocumentSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [selectedId, setSelectedId] = useState<SelectedKey>(null);
   const [detail, setDetail] = useState<DocumentDetail | null>(null);
   const [formState, setFormState] = useState({ ...EMPTY_FORM });
@@ -367,8 +369,9 @@ export default function WorkspacePage() {
       }
 
       try {
-        const docs = await listDocuments(user.user_id);
+        const { results: docs, next_cursor } = await listDocuments(user.user_id);
         setDocuments(docs);
+        setNextCursor(next_cursor);
         setDocumentPreviews((previous) => {
           const valid = new Set(docs.map((doc) => doc.document_id));
           let changed = false;
@@ -396,10 +399,8 @@ export default function WorkspacePage() {
             }
 
             if (typeof previous === "number") {
-              if (docs.some((doc) => doc.document_id === previous)) {
-                return previous;
-              }
-              return docs.length ? docs[0].document_id : null;
+              // It may sit on a page not loaded yet; opening it reports a deleted document.
+              return previous;
             }
 
             return previous;
@@ -417,6 +418,27 @@ export default function WorkspacePage() {
     [user],
   );
 
+  const loadMoreDocuments = useCallback(async () => {
+    if (!user || !nextCursor) {
+      return;
+    }
+
+    setIsLoadingMore(true);
+    try {
+      const { results, next_cursor } = await listDocuments(user.user_id, nextCursor);
+      setDocuments((previous) => {
+        const seen = new Set(previous.map((doc) => doc.document_id));
+        return [...previous, ...results.filter((doc) => !seen.has(doc.document_id))];
+      });
+      setNextCursor(next_cursor);
+    } catch (error) {
+      console.error(error);
+      toast.error(error instanceof Error ? error.message : "Unable to load documents");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  }, [user, nextCursor]);
+
   useEffect(() => {
     if (ready && user) {
       refreshDocuments(undefined, true).catch((error) => {
@@ -655,6 +677,20 @@ export default function WorkspacePage() {
               No saved drafts yet. Start a new document to see it appear here.
             </div>
           )}
+
+          {!isListLoading && nextCursor ? (
+            <div className="col-span-full flex justify-center">
+              <Button type="button" variant="outline" onClick={loadMoreDocuments} disabled={isLoadingMore}>
+                {isLoadingMore ? (
+                  <>
+                    <Loader2 className="mr-2 size-4 animate-spin" /> Loading…
+                  </>
+                ) : (
+                  "Load more documents"
+                )}
+              </Button>
+            </div>
+          ) : null}
         </div>
       </div>
     );
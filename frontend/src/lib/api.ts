@@ -63,16 +63,41 @@ export type CorrectionDetail = {
   created_at: string;
 };
 
+export type SnapshotSentence = SentenceSummary & {
+  corrections: CorrectionDetail[];
+};
+
+export type DocumentSnapshot = {
+  document: DocumentDetail & { revision: number };
+  sentences: SnapshotSentence[];
+};
+
 export type AnalysisResponse = {
   status: string;
   analysis: unknown;
 };
 
+export type AnalysisJob = {
+  job_id: number;
+  document_id: number;
+  status: "queued" | "running" | "succeeded" | "failed";
+  incremental: boolean;
+  analysis: unknown;
+  error: string | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+};
+
 export type ApplyCorrectionResponse = {
   document_id: number;
   content: string;
 };
 
+export type ApplyCorrectionsResponse = ApplyCorrectionResponse & {
+  applied: number;
+};
+
 function normalizeBaseUrl(raw?: string | null): string | null {
   if (!raw) {
     return null;
@@ -212,8 +237,18 @@ export async function deleteUserAccount(userId: number): Promise<void> {
   });
 }
 
-export async function listDocuments(userId: number): Promise<DocumentSummary[]> {
-  return request<DocumentSummary[]>(`/documents/?user_id=${userId}`);
+export type DocumentPage = {
+  results: DocumentSummary[];
+  next_cursor: string | null;
+};
+
+export async function listDocuments(
+  userId: number,
+  cursor: string | null = null,
+  limit = 50,
+): Promise<DocumentPage> {
+  const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+  return request<DocumentPage>(`/documents/?user_id=${userId}&limit=${limit}${query}`);
 }
 
 export async function getDocument(documentId: number): Promise<DocumentDetail> {
@@ -257,6 +292,14 @@ export async function listDocumentSentences(documentId: number): Promise<Sentenc
   return request<SentenceSummary[]>(`/documents/${documentId}/sentences/`);
 }
 
+// Document, sentences and corrections in one request. The browser cache
+// revalidates it with the ETag, so unchanged documents cost a 304.
+export async function getDocumentSnapshot(documentId: number): Promise<DocumentSnapshot> {
+  return request<DocumentSnapshot>(`/documents/${documentId}/snapshot/`, {
+    cache: "no-cache",
+  });
+}
+
 export async function listSentenceCorrections(sentenceId: number): Promise<CorrectionDetail[]> {
   return request<CorrectionDetail[]>(`/sentences/${sentenceId}/corrections/`);
 }
@@ -267,8 +310,38 @@ export async function applySentenceCorrection(sentenceId: number, correctionId:
   });
 }
 
+export async function applyDocumentCorrections(
+  documentId: number,
+  corrections: { sentence_id: number; correction_id: number }[],
+): Promise<ApplyCorrectionsResponse> {
+  return request<ApplyCorrectionsResponse>(`/documents/${documentId}/apply-corrections/`, {
+    method: "POST",
+    body: JSON.stringify({ corrections }),
+  });
+}
+
+const ANALYSIS_POLL_INTERVAL_MS = 1000;
+
+export async function getAnalysisJob(jobId: number): Promise<AnalysisJob> {
+  return request<AnalysisJob>(`/jobs/${jobId}/`, {
+    cache: "no-store",
+  });
+}
+
 export async function runDocumentAnalysis(documentId: number): Promise<AnalysisResponse> {
-  return request<AnalysisResponse>(`/documents/${documentId}/analyze/`, {
+  const { job_id } = await request<{ job_id: number; status: string }>(`/documents/${documentId}/analyze/`, {
     method: "POST",
   });
+
+  // Analysis runs on a background worker; poll until it settles.
+  for (;;) {
+    const job = await getAnalysisJob(job_id);
+    if (job.status === "succeeded") {
+      return { status: "ok", analysis: job.analysis };
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Analysis failed");
+    }
+    await new Promise((resolve) => setTimeout(resolve, ANALYSIS_POLL_INTERVAL_MS));
+  }
 }